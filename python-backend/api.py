@@ -1,8 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError, model_validator
+from typing import Optional, List, Dict, Any, Tuple
 from uuid import uuid4
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import asyncio
+import hashlib
+import json
+import threading
 import time
 import logging
 
@@ -15,24 +22,72 @@ from main import (
     injury_support_agent,
     escalation_agent,
     create_initial_context,
+    UserSessionContext,
 )
+from provider import get_openai_client
+from store import StateConflictError, create_conversation_store, deserialize_state, fold_transcript, serialize_state
+from batch import BATCH_CONCURRENCY, BATCH_MAX_ITEMS, batch_rate_limits, run_batch
+from scheduler import CHECKIN_WORKER_ENABLED, checkin_store, create_checkin_worker, current_conversation
+from concurrency import ConversationBusyError, conversation_locks, turn_coalescer
+from compaction import compact_input_items
+from guardrail_cache import verdict_cache
+from handoffs import handoff_events, handoff_registry
+from fast_path import FastPathResult, route_intent
+from onboarding import OnboardingProfile, run_onboarding
+from progress_store import progress_store
+from usage import (
+    BUDGET_FALLBACK_MODEL,
+    BUDGET_TRANSCRIPT_TOKENS,
+    UsageHooks,
+    UsageLedger,
+    add_conversation_usage,
+    current_turn,
+    over_budget,
+    start_turn,
+)
+from telemetry import CHAT_TURNS, HTTP_SECONDS, LOCK_WAIT_SECONDS, configure_tracing, metrics, metrics_processor
 
 from agents import (
     Runner,
+    RunConfig,
     ItemHelpers,
     MessageOutputItem,
     HandoffOutputItem,
     ToolCallItem,
     ToolCallOutputItem,
     InputGuardrailTripwireTriggered,
-    Handoff,
+    RawResponsesStreamEvent,
+    RunItemStreamEvent,
+    custom_span,
+    get_current_trace,
+    trace,
 )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Span export target is chosen by TRACE_EXPORT (openai, file, otlp, none); see telemetry.py.
+configure_tracing()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Under gunicorn the master has already warmed up before forking; otherwise
+    # warm up in the background so /health answers while it runs
+    warming = asyncio.create_task(_warm_up_in_background()) if not _warm.is_set() else None
+    # Each worker process polls for due check-ins; store claims keep them from firing twice
+    worker = create_checkin_worker(checkin_store, _checkin_turns) if CHECKIN_WORKER_ENABLED else None
+    if worker is not None:
+        worker.start()
+    try:
+        yield
+    finally:
+        if worker is not None:
+            await worker.stop()
+        if warming is not None:
+            await warming
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration (adjust as needed for deployment)
 app.add_middleware(
@@ -43,10 +98,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # For /chat/stream this is time to response headers, not to the last frame
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - started, request.method, getattr(route, "path", "unmatched"), str(response.status_code)
+    )
+    return response
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of this worker's counters and histograms."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": time.time()}
 
+@app.get("/ready")
+async def readiness_check():
+    """503 until warmup() has finished in this worker; route traffic on this rather than /health."""
+    if not _warm.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "timestamp": time.time()}
+
+@app.get("/progress/{conversation_id}")
+async def progress_range(
+    conversation_id: str, start: Optional[int] = None, end: Optional[int] = None, kind: Optional[str] = None
+):
+    return [r.to_dict() for r in progress_store.range(conversation_id, start, end, kind)]
+
+@app.get("/checkins/{conversation_id}")
+async def conversation_checkins(conversation_id: str):
+    return [c.to_dict() for c in checkin_store.for_conversation(conversation_id)]
+
+@app.get("/progress/{conversation_id}/summary")
+async def progress_summary(conversation_id: str, kind: str = "progress"):
+    return progress_store.summary(conversation_id, kind)
+
+@app.get("/usage")
+async def usage_summary():
+    """Token and cost totals by agent, model and UTC day, across every worker sharing the store."""
+    return usage_ledger.summary()
+
+@app.get("/usage/{conversation_id}")
+async def conversation_usage(conversation_id: str):
+    state = conversation_store.get(conversation_id)
+    if state is None:
+        return JSONResponse(status_code=404, content={"error": "Conversation not found."})
+    return state.get("usage", {})
+
+@app.get("/transcript/{conversation_id}")
+async def conversation_transcript(conversation_id: str, start: int = 0, limit: int = 100):
+    """A page of the full transcript log, including turns compacted out of the replayed window."""
+    state = conversation_store.get(conversation_id)
+    if state is None:
+        return JSONResponse(status_code=404, content={"error": "Conversation not found."})
+    length = state.get("transcript", {}).get("length", 0)
+    items = conversation_store.read_transcript(conversation_id, start, min(start + limit, length))
+    return {"conversation_id": conversation_id, "start": start, "length": length, "items": items}
+
+@app.get("/guardrails/cache")
+async def guardrail_cache_stats():
+    return verdict_cache.stats()
+
 # =========================
 # Models
 # =========================
@@ -54,6 +172,21 @@ async def health_check():
 class ChatRequest(BaseModel):
     conversation_id: Optional[str] = None
     message: str
+    # The agent graph is static; clients fetch it once (here or from GET /agents)
+    include_agents: bool = False
+    # Context version the client already holds; responses then carry only a delta
+    context_version: Optional[int] = None
+    full_context: bool = False
+    # Append a "timing" event with this turn's per-stage breakdown
+    include_timings: bool = False
+    # Fill the profile in one local turn instead of the onboarding dialogue; message may then be empty
+    onboarding: Optional[OnboardingProfile] = None
+
+    @model_validator(mode="after")
+    def _onboarding_message(self) -> "ChatRequest":
+        if self.onboarding is not None and not self.message.strip():
+            self.message = self.onboarding.to_message()
+        return self
 
 class MessageResponse(BaseModel):
     content: str
@@ -80,32 +213,26 @@ class ChatResponse(BaseModel):
     current_agent: str
     messages: List[MessageResponse]
     events: List[AgentEvent]
-    context: Dict[str, Any]
-    agents: List[Dict[str, Any]]
+    # Full snapshot, sent for new conversations, on request or on a version mismatch
+    context: Optional[Dict[str, Any]] = None
+    # Otherwise only changed fields and newly appended log entries are sent
+    context_delta: Dict[str, Any] = {}
+    context_appends: Dict[str, List[Any]] = {}
+    context_version: int = 0
+    agents: List[Dict[str, Any]] = []
+    agents_version: str = ""
     guardrails: List[GuardrailCheck] = []
+    # Token counts and estimated cost for this turn and the conversation so far
+    usage: Dict[str, Any] = {}
 
 # =========================
-# In-memory store for conversation state
+# Conversation state store
 # =========================
 
-class ConversationStore:
-    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        pass
-
-    def save(self, conversation_id: str, state: Dict[str, Any]):
-        pass
-
-class InMemoryConversationStore(ConversationStore):
-    _conversations: Dict[str, Dict[str, Any]] = {}
-
-    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        return self._conversations.get(conversation_id)
-
-    def save(self, conversation_id: str, state: Dict[str, Any]):
-        self._conversations[conversation_id] = state
-
-# TODO: when deploying this app in scale, switch to your own production-ready implementation
-conversation_store = InMemoryConversationStore()
+# Backend is chosen by CONVERSATION_STORE (memory, sqlite, redis); see store.py.
+conversation_store = create_conversation_store()
+# Usage aggregates live in the same store, so /usage agrees across workers
+usage_ledger = UsageLedger(conversation_store)
 
 # =========================
 # Helpers
@@ -151,217 +278,694 @@ def _build_agents_list() -> List[Dict[str, Any]]:
         make_agent_dict(escalation_agent),
     ]
 
+@lru_cache(maxsize=None)
+def _agents_metadata() -> Tuple[List[Dict[str, Any]], bytes, str]:
+    """Agent graph metadata, its serialized JSON and a version hash, computed once.
+
+    The graph is fixed at import time, so this never needs invalidating.
+    """
+    agents = _build_agents_list()
+    body = json.dumps(agents, separators=(",", ":")).encode("utf-8")
+    return agents, body, hashlib.sha256(body).hexdigest()[:16]
+
+def _agents_for(req: ChatRequest) -> List[Dict[str, Any]]:
+    """Full agent list only when the client asks for it."""
+    return _agents_metadata()[0] if req.include_agents else []
+
+@app.get("/agents")
+async def agents_endpoint(request: Request):
+    """Serve the pre-serialized agent graph with an ETag so clients can cache it."""
+    _, body, version = _agents_metadata()
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+REFUSAL_MESSAGE = "Sorry, I can only answer questions related to health, fitness, and wellness topics."
+
+def _handoff_events(item: HandoffOutputItem) -> List[AgentEvent]:
+    """Events for the route this handoff's hook published, falling back to the registry."""
+    source, target = item.source_agent.name, item.target_agent.name
+    route = handoff_events.pop(source, target) or handoff_registry.route(source, target)
+    events = [AgentEvent(
+        id=uuid4().hex,
+        type="handoff",
+        agent=route.source,
+        content=f"{route.source} -> {route.target}",
+        metadata={
+            "source_agent": route.source,
+            "target_agent": route.target
+        },
+    )]
+    if route.callback:
+        events.append(AgentEvent(
+            id=uuid4().hex,
+            type="tool_call",
+            agent=route.target,
+            content=route.callback
+        ))
+    return events
+
+def _events_for_item(item) -> Tuple[List[MessageResponse], List[AgentEvent]]:
+    """Convert a single run item into chat messages and UI events."""
+    messages: List[MessageResponse] = []
+    events: List[AgentEvent] = []
+
+    if isinstance(item, MessageOutputItem):
+        text = ItemHelpers.text_message_output(item)
+        messages.append(MessageResponse(content=text, agent=item.agent.name))
+        events.append(AgentEvent(
+            id=uuid4().hex,
+            type="message",
+            agent=item.agent.name,
+            content=text
+        ))
+
+    elif isinstance(item, HandoffOutputItem):
+        events.extend(_handoff_events(item))
+
+    elif isinstance(item, ToolCallItem):
+        tool_name = getattr(item.raw_item, "name", None)
+        raw_args = getattr(item.raw_item, "arguments", None)
+        tool_args = raw_args
+        if isinstance(raw_args, str):
+            try:
+                tool_args = json.loads(raw_args)
+            except Exception:
+                pass
+
+        events.append(AgentEvent(
+            id=uuid4().hex,
+            type="tool_call",
+            agent=item.agent.name,
+            content=tool_name or "",
+            metadata={"tool_args": tool_args},
+        ))
+
+        if tool_name == "display_workout_selector":
+            messages.append(MessageResponse(
+                content="DISPLAY_WORKOUT_SELECTOR",
+                agent=item.agent.name,
+            ))
+
+    elif isinstance(item, ToolCallOutputItem):
+        events.append(AgentEvent(
+            id=uuid4().hex,
+            type="tool_output",
+            agent=item.agent.name,
+            content=str(item.output),
+            metadata={"tool_result": item.output},
+        ))
+
+    return messages, events
+
+def _context_update_event(changes: Dict[str, Any], appends: Dict[str, List[Any]], agent_name: str) -> Optional[AgentEvent]:
+    """Build a context_update event for the fields that changed during a run."""
+    if not changes and not appends:
+        return None
+    return AgentEvent(
+        id=uuid4().hex,
+        type="context_update",
+        agent=agent_name,
+        content="",
+        metadata={"changes": changes, "appended": appends},
+    )
+
+def _context_fields(
+    req: ChatRequest,
+    ctx: UserSessionContext,
+    base_version: Optional[int],
+    changes: Optional[Dict[str, Any]] = None,
+    appends: Optional[Dict[str, List[Any]]] = None,
+) -> Dict[str, Any]:
+    """Context payload: a delta when the client holds base_version, else a full snapshot."""
+    if req.full_context or base_version is None or req.context_version != base_version:
+        return {"context": ctx.model_dump(), "context_version": ctx.version}
+    return {
+        "context_delta": changes or {},
+        "context_appends": appends or {},
+        "context_version": ctx.version,
+    }
+
+def _passed_guardrail_checks(agent, message: str, reasoning: str = "") -> List[GuardrailCheck]:
+    """Report every input guardrail of the agent as passed."""
+    return [
+        GuardrailCheck(
+            id=uuid4().hex,
+            name=_get_guardrail_name(g),
+            input=message,
+            reasoning=reasoning,
+            passed=True,
+            timestamp=time.time() * 1000,
+        )
+        for g in getattr(agent, "input_guardrails", [])
+    ]
+
+def _tripped_guardrail_checks(agent, message: str, e: InputGuardrailTripwireTriggered) -> List[GuardrailCheck]:
+    """Report guardrail results after a tripwire fired."""
+    failed = e.guardrail_result.guardrail
+    gr_output = e.guardrail_result.output.output_info
+    gr_reasoning = getattr(gr_output, "reasoning", "")
+    gr_timestamp = time.time() * 1000
+    return [
+        GuardrailCheck(
+            id=uuid4().hex,
+            name=_get_guardrail_name(g),
+            input=message,
+            reasoning=(gr_reasoning if g == failed else ""),
+            passed=(g != failed),
+            timestamp=gr_timestamp,
+        )
+        for g in agent.input_guardrails
+    ]
+
+def _load_conversation(req: ChatRequest) -> Tuple[str, Dict[str, Any], bool]:
+    """Initialize or retrieve conversation state for a request."""
+    state = conversation_store.get(req.conversation_id) if req.conversation_id else None
+    is_new = state is None
+    if is_new:
+        ctx = create_initial_context()
+        state = {
+            "input_items": [],
+            "context": ctx,
+            "current_agent": main_planner_agent.name,
+        }
+    conversation_id = uuid4().hex if is_new else req.conversation_id
+    # Lets tools (e.g. checkin_scheduler_tool) act on the conversation they run in
+    current_conversation.set(conversation_id)
+    return conversation_id, state, is_new
+
+def _save_conversation(conversation_id: str, state: Dict[str, Any]) -> None:
+    """Save state only if nobody else saved this conversation since it was loaded."""
+    conversation_store.save(conversation_id, state, expected_revision=state.get("revision", 0))
+    # Only now is the turn committed; a rolled-back or conflicting turn never reaches the history or schedule
+    progress_store.extend(conversation_id, state["context"].take_progress())
+    checkin_store.apply(conversation_id, state["context"].take_checkins())
+
+def _turn_key(req: ChatRequest) -> Optional[Tuple[str, str, Optional[int]]]:
+    """Identity of a turn for coalescing duplicate submits; new conversations are never coalesced."""
+    if not req.conversation_id:
+        return None
+    return req.conversation_id, req.message.strip(), req.context_version
+
+def _timing_events(req: ChatRequest, agent_name: str, started: float) -> List[AgentEvent]:
+    """Per-stage milliseconds for the current turn, when the client asked for them."""
+    current = get_current_trace() if req.include_timings else None
+    if current is None:
+        return []
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    return [AgentEvent(
+        id=uuid4().hex,
+        type="timing",
+        agent=agent_name,
+        content=f"{total_ms} ms",
+        metadata={"total_ms": total_ms, "stages_ms": metrics_processor.turn_timings(current.trace_id)},
+    )]
+
+def _concurrency_error(e: Exception) -> Optional[JSONResponse]:
+    if isinstance(e, ConversationBusyError):
+        return JSONResponse(status_code=429, content={"error": str(e)})
+    if isinstance(e, StateConflictError):
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    return None
+
+def _begin_turn(state: Dict[str, Any], message: str) -> None:
+    """Append the user message and compact the transcript to the token budget.
+
+    Conversations over their token budget are compacted harder.
+    """
+    state["input_items"].append({"content": message, "role": "user"})
+    if over_budget(state):
+        compacted = compact_input_items(state["input_items"], state["context"], token_budget=BUDGET_TRANSCRIPT_TOKENS)
+    else:
+        compacted = compact_input_items(state["input_items"], state["context"])
+    fold_transcript(state, compacted)
+
+def _run_options(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Runner keyword arguments for a turn: usage hooks, plus the fallback model when over budget."""
+    if over_budget(state):
+        return {"run_config": RunConfig(model=BUDGET_FALLBACK_MODEL), "hooks": UsageHooks(BUDGET_FALLBACK_MODEL)}
+    return {"hooks": UsageHooks()}
+
+def _finish_usage(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold the current turn's usage into the ledger and the conversation; returns the response's usage field."""
+    turn_usage = current_turn()
+    usage_ledger.record(turn_usage)
+    return {"turn": turn_usage.to_dict(), "conversation": dict(add_conversation_usage(state, turn_usage))}
+
+FAST_PATH_GUARDRAIL_REASONING = "Skipped: handled locally by the deterministic fast path."
+
+def _fast_path_events(fast: FastPathResult) -> Tuple[List[MessageResponse], List[AgentEvent]]:
+    """Build the messages and events for a turn served by the fast path."""
+    messages = [MessageResponse(content=fast.reply, agent=fast.agent)]
+    events = []
+    for step in fast.steps:
+        events.append(AgentEvent(
+            id=uuid4().hex,
+            type="tool_call",
+            agent=fast.agent,
+            content=step.tool_name,
+            metadata={"tool_args": step.arguments, "fast_path": True},
+        ))
+        events.append(AgentEvent(
+            id=uuid4().hex,
+            type="tool_output",
+            agent=fast.agent,
+            content=step.output,
+            metadata={"tool_result": step.output, "fast_path": True},
+        ))
+    events.append(AgentEvent(
+        id=uuid4().hex,
+        type="message",
+        agent=fast.agent,
+        content=fast.reply,
+    ))
+    return messages, events
+
+def _local_turn(req: ChatRequest, state: Dict[str, Any]) -> Optional[FastPathResult]:
+    """A turn served without the model: an onboarding profile, or a fast-path intent."""
+    if req.onboarding is not None:
+        return run_onboarding(req.onboarding, state)
+    return route_intent(req.message, state)
+
 # =========================
 # Main Chat Endpoint
 # =========================
 
-from fastapi.responses import JSONResponse
-import logging
-from uuid import uuid4
-import time
-
-logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(req: ChatRequest):
+    """Run one turn. Turns for a conversation are serialized and identical
+    in-flight submits share a single run."""
     try:
-        # Initialize or retrieve conversation state
-        is_new = not req.conversation_id or conversation_store.get(req.conversation_id) is None
-        if is_new:
-            conversation_id: str = uuid4().hex
-            ctx = create_initial_context()
-            current_agent_name = main_planner_agent.name
-            state: Dict[str, Any] = {
-                "input_items": [],
-                "context": ctx,
-                "current_agent": current_agent_name,
-            }
-
-            if req.message.strip() == "":
-                conversation_store.save(conversation_id, state)
-                return ChatResponse(
-                    conversation_id=conversation_id,
-                    current_agent=current_agent_name,
-                    messages=[],
-                    events=[],
-                    context=ctx.model_dump(),
-                    agents=_build_agents_list(),
-                    guardrails=[],
-                )
-        else:
-            conversation_id = req.conversation_id
-            state = conversation_store.get(conversation_id)
-            if not state:
-                raise ValueError("Conversation state not found.")
+        return await turn_coalescer.run(_turn_key(req), lambda: _locked_chat_turn(req))
+    except Exception as e:
+        error = _concurrency_error(e)
+        CHAT_TURNS.inc("rejected" if error is not None else "error")
+        if error is not None:
+            return error
+        logger.exception("Unhandled error in /chat endpoint")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+async def _locked_chat_turn(req: ChatRequest) -> ChatResponse:
+    # One trace per turn so our own stages and the agent run share a timeline
+    with trace("Chat turn", group_id=req.conversation_id):
+        started = time.perf_counter()
+        start_turn()
+        handoff_events.start_turn()
+        async with conversation_locks.hold(req.conversation_id):
+            LOCK_WAIT_SECONDS.observe(time.perf_counter() - started)
+            return await _chat_turn(req, started)
+
+async def _chat_turn(req: ChatRequest, started: float) -> ChatResponse:
+    base_version: Optional[int] = None
+    try:
+        with custom_span("load_conversation"):
+            conversation_id, state, is_new = _load_conversation(req)
+        if is_new and req.message.strip() == "":
+            state["context"].commit()
+            _save_conversation(conversation_id, state)
+            return ChatResponse(
+                conversation_id=conversation_id,
+                current_agent=state["current_agent"],
+                messages=[],
+                events=[],
+                **_context_fields(req, state["context"], None),
+                agents=_agents_for(req),
+                agents_version=_agents_metadata()[2],
+                guardrails=[],
+            )
 
         agent_name = state.get("current_agent")
         if not agent_name:
             raise ValueError("Current agent not found in state.")
 
         current_agent = _get_agent_by_name(agent_name)
-        state["input_items"].append({"content": req.message, "role": "user"})
-        old_context = state["context"].model_dump().copy()
-        guardrail_checks: List[GuardrailCheck] = []
-
-        # === Run Agent Logic ===
-        result = await Runner.run(current_agent, state["input_items"], context=state["context"])
-
-        messages: List[MessageResponse] = []
-        events: List[AgentEvent] = []
-
-        for item in result.new_items:
-            if isinstance(item, MessageOutputItem):
-                text = ItemHelpers.text_message_output(item)
-                messages.append(MessageResponse(content=text, agent=item.agent.name))
-                events.append(AgentEvent(
-                    id=uuid4().hex,
-                    type="message",
-                    agent=item.agent.name,
-                    content=text
-                ))
-
-            elif isinstance(item, HandoffOutputItem):
-                events.append(AgentEvent(
-                    id=uuid4().hex,
-                    type="handoff",
-                    agent=item.source_agent.name,
-                    content=f"{item.source_agent.name} -> {item.target_agent.name}",
-                    metadata={
-                        "source_agent": item.source_agent.name,
-                        "target_agent": item.target_agent.name
-                    },
-                ))
-
-                from_agent = item.source_agent
-                to_agent = item.target_agent
-
-                ho = next(
-                    (h for h in getattr(from_agent, "handoffs", [])
-                     if isinstance(h, Handoff) and getattr(h, "agent_name", None) == to_agent.name),
-                    None,
-                )
-                if ho:
-                    fn = ho.on_invoke_handoff
-                    fv = fn.__code__.co_freevars
-                    cl = fn.__closure__ or []
-                    if "on_handoff" in fv:
-                        idx = fv.index("on_handoff")
-                        if idx < len(cl) and cl[idx].cell_contents:
-                            cb = cl[idx].cell_contents
-                            cb_name = getattr(cb, "__name__", repr(cb))
-                            events.append(AgentEvent(
-                                id=uuid4().hex,
-                                type="tool_call",
-                                agent=to_agent.name,
-                                content=cb_name
-                            ))
-
-                current_agent = item.target_agent
-
-            elif isinstance(item, ToolCallItem):
-                tool_name = getattr(item.raw_item, "name", None)
-                raw_args = getattr(item.raw_item, "arguments", None)
-                tool_args = raw_args
-                if isinstance(raw_args, str):
-                    try:
-                        import json
-                        tool_args = json.loads(raw_args)
-                    except Exception:
-                        pass
-
-                events.append(AgentEvent(
-                    id=uuid4().hex,
-                    type="tool_call",
-                    agent=item.agent.name,
-                    content=tool_name or "",
-                    metadata={"tool_args": tool_args},
-                ))
-
-                if tool_name == "display_workout_selector":
-                    messages.append(MessageResponse(
-                        content="DISPLAY_WORKOUT_SELECTOR",
-                        agent=item.agent.name,
-                    ))
-
-            elif isinstance(item, ToolCallOutputItem):
-                events.append(AgentEvent(
-                    id=uuid4().hex,
-                    type="tool_output",
-                    agent=item.agent.name,
-                    content=str(item.output),
-                    metadata={"tool_result": item.output},
-                ))
-
-        new_context = state["context"].dict()
-        changes = {k: new_context[k] for k in new_context if old_context.get(k) != new_context[k]}
-        if changes:
-            events.append(AgentEvent(
-                id=uuid4().hex,
-                type="context_update",
-                agent=current_agent.name,
-                content="",
-                metadata={"changes": changes},
-            ))
+        base_version = None if is_new else state["context"].version
+        with custom_span("compact_transcript"):
+            _begin_turn(state, req.message)
+
+        with custom_span("fast_path"):
+            fast = _local_turn(req, state)
+        guardrail_reasoning = ""
+        if fast is not None:
+            # === Deterministic fast path, no model call ===
+            messages, events = _fast_path_events(fast)
+            state["input_items"].extend(fast.input_items())
+            guardrail_reasoning = FAST_PATH_GUARDRAIL_REASONING
+            CHAT_TURNS.inc("fast_path")
+        else:
+            # === Run Agent Logic ===
+            result = await Runner.run(
+                current_agent, state["input_items"], context=state["context"], **_run_options(state)
+            )
+
+            messages = []
+            events = []
+
+            with custom_span("postprocess"):
+                for item in result.new_items:
+                    item_messages, item_events = _events_for_item(item)
+                    messages.extend(item_messages)
+                    events.extend(item_events)
+                    if isinstance(item, HandoffOutputItem):
+                        current_agent = item.target_agent
+
+                state["input_items"] = result.to_input_list()
+            CHAT_TURNS.inc("model")
+
+        changes, appends = state["context"].commit()
+        update = _context_update_event(changes, appends, current_agent.name)
+        if update:
+            events.append(update)
 
-        state["input_items"] = result.to_input_list()
         state["current_agent"] = current_agent.name
-        conversation_store.save(conversation_id, state)
-
-        final_guardrails: List[GuardrailCheck] = []
-        for g in getattr(current_agent, "input_guardrails", []):
-            name = _get_guardrail_name(g)
-            final_guardrails.append(GuardrailCheck(
-                id=uuid4().hex,
-                name=name,
-                input=req.message,
-                reasoning="",
-                passed=True,
-                timestamp=time.time() * 1000,
-            ))
+        usage = _finish_usage(state)
+        with custom_span("save_conversation"):
+            _save_conversation(conversation_id, state)
+        events.extend(_timing_events(req, current_agent.name, started))
 
         return ChatResponse(
             conversation_id=conversation_id,
             current_agent=current_agent.name,
             messages=messages,
             events=events,
-            context=state["context"].dict(),
-            agents=_build_agents_list(),
-            guardrails=final_guardrails,
+            **_context_fields(req, state["context"], base_version, changes, appends),
+            agents=_agents_for(req),
+            agents_version=_agents_metadata()[2],
+            guardrails=_passed_guardrail_checks(current_agent, req.message, guardrail_reasoning),
+            usage=usage,
         )
 
     except InputGuardrailTripwireTriggered as e:
-        failed = e.guardrail_result.guardrail
-        gr_output = e.guardrail_result.output.output_info
-        gr_reasoning = getattr(gr_output, "reasoning", "")
-        gr_input = req.message
-        gr_timestamp = time.time() * 1000
         current_agent = _get_agent_by_name(state["current_agent"])
+        # Undo anything tools changed while the tripped guardrail was running
+        state["context"].rollback()
+        state["input_items"].append({"role": "assistant", "content": REFUSAL_MESSAGE})
+        usage = _finish_usage(state)
+        with custom_span("save_conversation"):
+            _save_conversation(conversation_id, state)
+        CHAT_TURNS.inc("guardrail_tripped")
 
-        guardrail_checks = []
-        for g in current_agent.input_guardrails:
-            guardrail_checks.append(GuardrailCheck(
-                id=uuid4().hex,
-                name=_get_guardrail_name(g),
-                input=gr_input,
-                reasoning=(gr_reasoning if g == failed else ""),
-                passed=(g != failed),
-                timestamp=gr_timestamp,
-            ))
+        return ChatResponse(
+            conversation_id=conversation_id,
+            current_agent=current_agent.name,
+            messages=[MessageResponse(content=REFUSAL_MESSAGE, agent=current_agent.name)],
+            events=_timing_events(req, current_agent.name, started),
+            **_context_fields(req, state["context"], base_version),
+            agents=_agents_for(req),
+            agents_version=_agents_metadata()[2],
+            guardrails=_tripped_guardrail_checks(current_agent, req.message, e),
+            usage=usage,
+        )
 
-        refusal = "Sorry, I can only answer questions related to health, fitness, and wellness topics."
-        state["input_items"].append({"role": "assistant", "content": refusal})
+# =========================
+# Streaming Chat Endpoint
+# =========================
 
-        return ChatResponse(
+def _sse(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _no_events():
+    return
+    yield
+
+async def _stream_turn(req: ChatRequest, outcome: Dict[str, Any], started: float):
+    """Run one streamed turn, recording the final response or error in ``outcome``."""
+    with custom_span("load_conversation"):
+        conversation_id, state, is_new = _load_conversation(req)
+    if not state.get("current_agent"):
+        raise ValueError("Current agent not found in state.")
+
+    current_agent = _get_agent_by_name(state["current_agent"])
+    yield _sse("conversation", {"conversation_id": conversation_id, "current_agent": current_agent.name})
+
+    if is_new and req.message.strip() == "":
+        state["context"].commit()
+        _save_conversation(conversation_id, state)
+        done = ChatResponse(
             conversation_id=conversation_id,
             current_agent=current_agent.name,
-            messages=[MessageResponse(content=refusal, agent=current_agent.name)],
+            messages=[],
             events=[],
-            context=state["context"].model_dump(),
-            agents=_build_agents_list(),
-            guardrails=guardrail_checks,
+            **_context_fields(req, state["context"], None),
+            agents=_agents_for(req),
+            agents_version=_agents_metadata()[2],
+            guardrails=[],
         )
+        outcome["done"] = done
+        yield _sse("done", done.model_dump())
+        return
+
+    base_version = None if is_new else state["context"].version
+    with custom_span("compact_transcript"):
+        _begin_turn(state, req.message)
+    messages: List[MessageResponse] = []
+    events: List[AgentEvent] = []
+
+    with custom_span("fast_path"):
+        fast = _local_turn(req, state)
+    if fast is not None:
+        messages, events = _fast_path_events(fast)
+        for event in events:
+            yield _sse(event.type, event.model_dump())
+        state["input_items"].extend(fast.input_items())
+
+    try:
+        result = None
+        if fast is None:
+            result = Runner.run_streamed(
+                current_agent, state["input_items"], context=state["context"], **_run_options(state)
+            )
+        # Guardrails run in parallel with the model, so its output is held back until
+        # every input guardrail has passed; a refused turn shows nothing but the refusal
+        pending_guardrails = len(current_agent.input_guardrails) if result is not None else 0
+        held: List[str] = []
+        async for ev in (result.stream_events() if result is not None else _no_events()):
+            frames: List[str] = []
+            if isinstance(ev, RawResponsesStreamEvent):
+                if getattr(ev.data, "type", None) == "response.output_text.delta":
+                    frames.append(_sse("message_delta", {"agent": result.current_agent.name, "delta": ev.data.delta}))
+            elif isinstance(ev, RunItemStreamEvent):
+                item_messages, item_events = _events_for_item(ev.item)
+                messages.extend(item_messages)
+                events.extend(item_events)
+                frames.extend(_sse(event.type, event.model_dump()) for event in item_events)
+                if isinstance(ev.item, HandoffOutputItem):
+                    current_agent = ev.item.target_agent
+            if len(result.input_guardrail_results) < pending_guardrails:
+                held.extend(frames)
+                continue
+            if held:
+                frames, held = held + frames, []
+            for frame in frames:
+                yield frame
+        # The stream only ends once the guardrails have finished
+        for frame in held:
+            yield frame
+
+    except InputGuardrailTripwireTriggered as e:
+        current_agent = _get_agent_by_name(state["current_agent"])
+        state["context"].rollback()
+        state["input_items"].append({"role": "assistant", "content": REFUSAL_MESSAGE})
+        usage = _finish_usage(state)
+        with custom_span("save_conversation"):
+            _save_conversation(conversation_id, state)
+        CHAT_TURNS.inc("guardrail_tripped")
+        checks = _tripped_guardrail_checks(current_agent, req.message, e)
+        for check in checks:
+            yield _sse("guardrail", check.model_dump())
+        timings = _timing_events(req, current_agent.name, started)
+        for event in timings:
+            yield _sse(event.type, event.model_dump())
+        done = ChatResponse(
+            conversation_id=conversation_id,
+            current_agent=current_agent.name,
+            messages=[MessageResponse(content=REFUSAL_MESSAGE, agent=current_agent.name)],
+            events=timings,
+            **_context_fields(req, state["context"], base_version),
+            agents=_agents_for(req),
+            agents_version=_agents_metadata()[2],
+            guardrails=checks,
+            usage=usage,
+        )
+        outcome["done"] = done
+        yield _sse("done", done.model_dump())
+        return
 
     except Exception as e:
-        logger.exception("Unhandled error in /chat endpoint")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        logger.exception("Unhandled error in /chat/stream endpoint")
+        CHAT_TURNS.inc("error")
+        outcome["error"] = e
+        yield _sse("error", {"error": str(e)})
+        return
+
+    changes, appends = state["context"].commit()
+    update = _context_update_event(changes, appends, current_agent.name)
+    if update:
+        events.append(update)
+        yield _sse(update.type, update.model_dump())
+
+    if result is not None:
+        state["input_items"] = result.to_input_list()
+    state["current_agent"] = current_agent.name
+    usage = _finish_usage(state)
+    with custom_span("save_conversation"):
+        _save_conversation(conversation_id, state)
+    CHAT_TURNS.inc("fast_path" if fast is not None else "model")
+
+    checks = _passed_guardrail_checks(
+        current_agent, req.message, FAST_PATH_GUARDRAIL_REASONING if fast is not None else ""
+    )
+    for check in checks:
+        yield _sse("guardrail", check.model_dump())
+    for event in _timing_events(req, current_agent.name, started):
+        events.append(event)
+        yield _sse(event.type, event.model_dump())
+
+    done = ChatResponse(
+        conversation_id=conversation_id,
+        current_agent=current_agent.name,
+        messages=messages,
+        events=events,
+        **_context_fields(req, state["context"], base_version, changes, appends),
+        agents=_agents_for(req),
+        agents_version=_agents_metadata()[2],
+        guardrails=checks,
+        usage=usage,
+    )
+    outcome["done"] = done
+    yield _sse("done", done.model_dump())
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """Stream agent events as Server-Sent Events while the run progresses.
+
+    Emits a ``conversation`` frame first, then ``message_delta`` frames for
+    text tokens and the same event types as ``/chat`` (message, handoff,
+    tool_call, tool_output, context_update, guardrail) as they happen, and
+    finally a ``done`` frame carrying the full ``ChatResponse`` once state
+    has been persisted. A duplicate of a turn that is still running only
+    receives the ``conversation`` and ``done`` frames of that run.
+    """
+    key = _turn_key(req)
+
+    async def event_stream():
+        pending = turn_coalescer.pending(key)
+        if pending is not None:
+            try:
+                done = await asyncio.shield(pending)
+            except Exception as e:
+                yield _sse("error", {"error": str(e)})
+                return
+            yield _sse("conversation", {"conversation_id": done.conversation_id, "current_agent": done.current_agent})
+            yield _sse("done", done.model_dump())
+            return
+
+        turn_coalescer.start(key)
+        outcome: Dict[str, Any] = {}
+        try:
+            with trace("Chat turn", group_id=req.conversation_id):
+                started = time.perf_counter()
+                start_turn()
+                handoff_events.start_turn()
+                async with conversation_locks.hold(req.conversation_id):
+                    LOCK_WAIT_SECONDS.observe(time.perf_counter() - started)
+                    async for frame in _stream_turn(req, outcome, started):
+                        yield frame
+        except Exception as e:
+            outcome["error"] = e
+            error = _concurrency_error(e)
+            CHAT_TURNS.inc("rejected" if error is not None else "error")
+            if error is None:
+                logger.exception("Unhandled error in /chat/stream endpoint")
+            yield _sse("error", {"error": str(e), "status": error.status_code if error is not None else 500})
+        finally:
+            if "done" not in outcome and "error" not in outcome:
+                outcome["error"] = RuntimeError("Stream closed before the turn finished.")
+            turn_coalescer.finish(key, outcome.get("done"), outcome.get("error"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# =========================
+# Batch Chat Endpoint
+# =========================
+
+class BatchRequest(BaseModel):
+    # Chat request bodies; each is validated on its own so one bad item doesn't sink the batch
+    items: List[Dict[str, Any]]
+    concurrency: Optional[int] = None
+
+async def batch_turn(item: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Run one batch item through the /chat endpoint logic; returns (status, body)."""
+    try:
+        req = ChatRequest.model_validate(item)
+    except ValidationError as e:
+        return 422, {"conversation_id": item.get("conversation_id"), "error": str(e)}
+    response = await chat_endpoint(req)
+    if isinstance(response, JSONResponse):
+        return response.status_code, {"conversation_id": req.conversation_id, **json.loads(response.body)}
+    return 200, {"conversation_id": response.conversation_id, "response": response.model_dump()}
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(body: BatchRequest):
+    """Run many turns with bounded concurrency and stream one JSON line per item as it finishes.
+
+    Lines carry the item's ``index``, its ``status`` (as /chat would have
+    answered) and either the chat ``response`` or an ``error``. Items for the
+    same conversation run in order.
+    """
+    if len(body.items) > BATCH_MAX_ITEMS:
+        return JSONResponse(status_code=413, content={"error": f"At most {BATCH_MAX_ITEMS} items per batch."})
+    concurrency = min(body.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+
+    async def lines():
+        async for result in run_batch(body.items, batch_turn, concurrency, batch_rate_limits):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def _checkin_turn(item: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    # /chat starts a fresh conversation for an unknown id; a check-in must not
+    if conversation_store.get(item["conversation_id"]) is None:
+        return 404, {"conversation_id": item["conversation_id"], "error": "Conversation not found."}
+    return await batch_turn(item)
+
+def _checkin_turns(items: List[Dict[str, Any]]):
+    return run_batch(items, _checkin_turn, BATCH_CONCURRENCY, batch_rate_limits)
+
+# =========================
+# Warmup
+# =========================
+
+# Set once warmup() has run in this process (or in the gunicorn master before forking)
+_warm = threading.Event()
+
+def warmup() -> None:
+    """Build lazily created objects up front.
+
+    gunicorn calls this in the master process before forking (see
+    gunicorn.conf.py), so workers share the results copy-on-write instead of
+    each paying for them on its first request. Otherwise the app's lifespan
+    runs it in a thread after startup. /ready answers 200 once it is done.
+    """
+    # The OpenAI client and its HTTP stack (see provider.py)
+    get_openai_client()
+    _agents_metadata()
+    app.openapi()
+    state = {"current_agent": main_planner_agent.name, "context": create_initial_context(), "input_items": []}
+    deserialize_state(serialize_state(state))
+    ChatResponse(conversation_id="", current_agent="", messages=[], events=[]).model_dump_json()
+    _warm.set()
+
+async def _warm_up_in_background() -> None:
+    try:
+        await asyncio.to_thread(warmup)
+    except Exception:
+        logger.exception("Warmup failed; /ready stays at 503")
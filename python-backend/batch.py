@@ -0,0 +1,184 @@
+"""Run many chat turns with bounded concurrency and stream the results as JSONL.
+
+Used by ``POST /chat/batch`` and as a CLI, run from python-backend/:
+
+    python batch.py checkins.jsonl --concurrency 16 > results.jsonl
+    python batch.py checkins.jsonl --url http://localhost:8000
+
+Each input line is a chat request body, e.g.
+``{"conversation_id": "abc", "message": "weekly progress summary"}``.
+Without ``--url`` the turns run in this process against the configured
+conversation store (use a shared store such as sqlite or redis).
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# =========================
+# Rate limiting
+# =========================
+
+class RateLimiter:
+    """Token bucket: ``rate`` acquisitions per second with bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class ProviderRateLimits:
+    """One token bucket per model provider; providers without a limit are not throttled."""
+
+    def __init__(self, rates: Dict[str, float]):
+        self._limiters = {name: RateLimiter(rate) for name, rate in rates.items() if rate > 0}
+
+    async def acquire(self, provider: str) -> None:
+        limiter = self._limiters.get(provider)
+        if limiter is not None:
+            await limiter.acquire()
+
+# =========================
+# Scheduler
+# =========================
+
+# Every agent currently runs on the shared OpenAI client (see provider.py)
+DEFAULT_PROVIDER = "openai"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Tuple[int, Dict[str, Any]]]]
+
+def _groups(items: Sequence[Dict[str, Any]]) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    """Group items by conversation, keeping input order; new conversations each get their own group."""
+    groups: "OrderedDict[Any, List[Tuple[int, Dict[str, Any]]]]" = OrderedDict()
+    for index, item in enumerate(items):
+        key = item.get("conversation_id") or ("new", index)
+        groups.setdefault(key, []).append((index, item))
+    return list(groups.values())
+
+async def run_batch(
+    items: Sequence[Dict[str, Any]],
+    handler: Handler,
+    concurrency: int = 8,
+    limits: Optional[ProviderRateLimits] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``handler`` over ``items`` and yield one result per item as it completes.
+
+    At most ``concurrency`` turns run at once. Turns for the same
+    conversation run one after another in input order, so they never contend
+    for its lock. ``handler`` returns ``(status, body)``.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for group in _groups(items):
+        pending.put_nowait(group)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        while True:
+            try:
+                group = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            for index, item in group:
+                if limits is not None:
+                    await limits.acquire(DEFAULT_PROVIDER)
+                try:
+                    status, body = await handler(item)
+                except Exception as e:
+                    status, body = 500, {"error": str(e)}
+                await results.put({"index": index, "status": status, **body})
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+# =========================
+# Configuration
+# =========================
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+
+def create_rate_limits() -> ProviderRateLimits:
+    """Per-provider turn rates (per second) from BATCH_RATE_LIMITS, e.g. ``{"openai": 5}``."""
+    return ProviderRateLimits(json.loads(os.getenv("BATCH_RATE_LIMITS", "{}")))
+
+batch_rate_limits = create_rate_limits()
+
+# =========================
+# CLI
+# =========================
+
+def _read_items(path: str) -> List[Dict[str, Any]]:
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+async def _run_remote(url: str, items: List[Dict[str, Any]], concurrency: int, timeout: float) -> int:
+    import httpx
+
+    failed = 0
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        body = {"items": items, "concurrency": concurrency}
+        async with client.stream("POST", "/chat/batch", json=body) as response:
+            if response.status_code != 200:
+                await response.aread()
+                print(response.text, file=sys.stderr)
+                return len(items)
+            async for line in response.aiter_lines():
+                if line:
+                    print(line, flush=True)
+                    failed += json.loads(line).get("status") != 200
+    return failed
+
+async def _run_local(items: List[Dict[str, Any]], concurrency: int) -> int:
+    from api import batch_turn
+
+    failed = 0
+    async for result in run_batch(items, batch_turn, concurrency, batch_rate_limits):
+        print(json.dumps(result, default=str), flush=True)
+        failed += result["status"] != 200
+    return failed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of chat requests, or - for stdin")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="turns run at once")
+    parser.add_argument("--url", help="send the batch to a running server instead of running it here")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="overall request timeout with --url, seconds")
+    args = parser.parse_args()
+
+    items = _read_items(args.input)
+    started = time.perf_counter()
+    if args.url:
+        failed = asyncio.run(_run_remote(args.url, items, args.concurrency, args.timeout))
+    else:
+        failed = asyncio.run(_run_local(items, args.concurrency))
+    elapsed = time.perf_counter() - started
+    print(f"{len(items)} turns, {failed} failed, {elapsed:.1f}s", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
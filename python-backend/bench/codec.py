@@ -0,0 +1,103 @@
+"""Compare conversation state encodings on synthetic conversations.
+
+Run from python-backend/:
+
+    python -m bench.codec
+    python -m bench.codec --turns 4 20 100 --repeat 200
+
+For each transcript length it reports encode/decode time and size for the
+context's model_dump_json, the legacy JSON blob and store.serialize_state,
+plus how long a lazy load that never touches ``input_items`` takes.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import json
+import os
+import time
+import zlib
+from typing import Any, Callable, Dict, List
+
+# Importing main builds the agents' clients; no requests are made
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from main import UserSessionContext, main_planner_agent, plan_rules
+from store import deserialize_state, serialize_state
+
+def _state(turns: int) -> Dict[str, Any]:
+    context = UserSessionContext(name="Sam", uid=123456789)
+    context.goal = plan_rules.parse_goal("lose 5kg in 2 months")
+    context.diet_preferences = "vegetarian"
+    context.meal_plan = plan_rules.meal_plan("vegetarian")[1]
+    context.workout_plan = plan_rules.workout_plan("beginner", "knee")
+    context.injury_notes = "knee pain when running"
+    context.handoff_logs = [f"Handed off to Nutrition Expert Agent at turn {i}" for i in range(0, turns, 5)]
+    context.progress_logs = [
+        {"ts": 1_700_000_000 + i * 86400, "kind": "progress", "value": 80.0 - i * 0.1, "note": "weekly weigh-in"}
+        for i in range(min(turns, 20))
+    ]
+    items: List[Dict[str, Any]] = []
+    for i in range(turns):
+        items.append({"role": "user", "content": f"Turn {i}: can you adjust my plan, my knee hurts a bit after runs?"})
+        if i % 3 == 0:
+            items.append({"type": "function_call", "call_id": f"call_{i:024d}", "name": "meal_planner_tool",
+                          "arguments": json.dumps({"dietary_preferences": "vegetarian"}), "id": f"fc_{i:040d}",
+                          "status": "completed"})
+            items.append({"type": "function_call_output", "call_id": f"call_{i:024d}",
+                          "output": json.dumps(context.meal_plan)})
+        items.append({"id": f"msg_{i:040d}", "type": "message", "role": "assistant", "status": "completed",
+                      "content": [{"type": "output_text", "text": f"Here is your updated plan for turn {i}. "
+                                   "Keep sessions low impact and stretch afterwards.", "annotations": [], "logprobs": []}]})
+    return {
+        "current_agent": main_planner_agent.name,
+        "context": context,
+        "input_items": items,
+        "usage": {"requests": turns, "input_tokens": 900 * turns, "output_tokens": 120 * turns,
+                  "cached_tokens": 600 * turns, "cost_usd": 0.0004 * turns},
+    }
+
+def _legacy(state: Dict[str, Any]) -> bytes:
+    payload = {
+        "current_agent": state["current_agent"],
+        "context": state["context"].model_dump(exclude_defaults=True),
+        "input_items": state["input_items"],
+        "usage": state["usage"],
+    }
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return b"z" + zlib.compress(raw, 1) if len(raw) > 1024 else b"j" + raw
+
+def _timeit(fn: Callable[[], Any], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[4, 20, 100], help="transcript lengths to test")
+    parser.add_argument("--repeat", type=int, default=500, help="iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'turns':>5} {'encoding':<22} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for turns in args.turns:
+        state = _state(turns)
+        context = state["context"]
+        dumped = context.model_dump_json()
+        legacy = _legacy(state)
+        blob = serialize_state(state)
+        lazy = deserialize_state(blob)
+        rows = [
+            ("model_dump_json (ctx)", len(dumped), _timeit(context.model_dump_json, args.repeat),
+             _timeit(lambda: UserSessionContext.model_validate_json(dumped), args.repeat)),
+            ("legacy json", len(legacy), _timeit(lambda: _legacy(state), args.repeat),
+             _timeit(lambda: deserialize_state(legacy), args.repeat)),
+            ("codec", len(blob), _timeit(lambda: serialize_state(state), args.repeat),
+             _timeit(lambda: deserialize_state(blob)["input_items"], args.repeat)),
+            ("codec, items untouched", len(blob), _timeit(lambda: serialize_state(lazy), args.repeat),
+             _timeit(lambda: deserialize_state(blob), args.repeat)),
+        ]
+        for name, size, encode_us, decode_us in rows:
+            print(f"{turns:>5} {name:<22} {size:>8} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+if __name__ == "__main__":
+    main()
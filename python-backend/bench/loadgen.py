@@ -0,0 +1,307 @@
+"""Replay multi-turn chat scripts against /chat at N concurrent users.
+
+Run from python-backend/:
+
+    python -m bench.loadgen --users 50 --latency 0.3
+    python -m bench.loadgen --users 20 --stream
+    python -m bench.loadgen --url http://localhost:8000 --users 10
+
+Without ``--url`` the API is served in-process on a free local port with
+every agent pointed at ``bench.fake_model.FakeModel``, so no OpenAI calls
+are made. Per-stage timings come from the Agents SDK trace spans.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+from agents import TracingProcessor
+
+# =========================
+# Scripts
+# =========================
+
+SCRIPTS: Dict[str, List[str]] = {
+    "onboarding_meal_injury": [
+        "hi",
+        "I'm Sam",
+        "I want to lose 5kg in 2 months",
+        "I'm vegetarian, can you make me a meal plan?",
+        "my knee hurts when I run",
+        "thanks",
+    ],
+    "goal_progress": [
+        "hello",
+        "my name is Alex",
+        "I want to gain 3kg in 3 months",
+        "schedule weekly check-ins",
+        "log 72kg",
+        "can you suggest a workout?",
+    ],
+    "escalation": [
+        "hey",
+        "I'm Priya",
+        "I want to lose 8kg in 4 months",
+        "I'd like to talk to a human trainer",
+        "ok thanks",
+    ],
+}
+
+# =========================
+# Stage timings
+# =========================
+
+def _parse_ts(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def _stage_name(span: Any) -> str:
+    data = span.span_data
+    name = getattr(data, "name", None)
+    return f"{data.type}:{name}" if name else data.type
+
+class StageTimer(TracingProcessor):
+    """Trace processor that records span durations by stage instead of exporting them."""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+
+    def on_trace_start(self, trace: Any) -> None:
+        pass
+
+    def on_trace_end(self, trace: Any) -> None:
+        pass
+
+    def on_span_start(self, span: Any) -> None:
+        pass
+
+    def on_span_end(self, span: Any) -> None:
+        start, end = _parse_ts(span.started_at), _parse_ts(span.ended_at)
+        if start is not None and end is not None:
+            self.durations[_stage_name(span)].append(end - start)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "count": len(values),
+                "mean_ms": statistics.fmean(values) * 1000,
+                "p95_ms": _percentile(values, 95) * 1000,
+                "total_s": sum(values),
+            }
+            for stage, values in sorted(self.durations.items())
+        }
+
+# =========================
+# Measurements
+# =========================
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": _percentile(values, 50) * 1000,
+        "p95_ms": _percentile(values, 95) * 1000,
+        "p99_ms": _percentile(values, 99) * 1000,
+        "max_ms": max(values, default=0.0) * 1000,
+    }
+
+def rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (Linux only)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+class Results:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors: List[str] = []
+        self.turns = 0
+
+# =========================
+# Load generator
+# =========================
+
+async def _turn(client: httpx.AsyncClient, body: Dict[str, Any], stream: bool, results: Results) -> Optional[str]:
+    """Send one message and return the conversation id."""
+    started = time.perf_counter()
+    conversation_id = body.get("conversation_id")
+    if not stream:
+        response = await client.post("/chat", json=body)
+        if response.status_code != 200:
+            results.errors.append(f"{response.status_code}: {response.text[:200]}")
+            return conversation_id
+        conversation_id = response.json()["conversation_id"]
+    else:
+        first_token = None
+        event = None
+        async with client.stream("POST", "/chat/stream", json=body) as response:
+            if response.status_code != 200:
+                await response.aread()
+                results.errors.append(f"{response.status_code}: {response.text[:200]}")
+                return conversation_id
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                    if first_token is None and event in ("message_delta", "message"):
+                        first_token = time.perf_counter()
+                elif line.startswith("data: ") and event == "conversation":
+                    conversation_id = json.loads(line[6:])["conversation_id"]
+                elif line.startswith("data: ") and event == "error":
+                    results.errors.append(line[6:200])
+        if first_token is not None:
+            results.ttfts.append(first_token - started)
+    results.latencies.append(time.perf_counter() - started)
+    results.turns += 1
+    return conversation_id
+
+async def _user(client: httpx.AsyncClient, script: List[str], iterations: int, stream: bool, results: Results):
+    for _ in range(iterations):
+        conversation_id = None
+        for message in script:
+            body: Dict[str, Any] = {"conversation_id": conversation_id, "message": message}
+            conversation_id = await _turn(client, body, stream, results)
+
+async def run_load(base_url: str, users: int, iterations: int, stream: bool, timeout: float) -> Dict[str, Any]:
+    results = Results()
+    scripts = list(SCRIPTS.values())
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        await asyncio.gather(
+            *(_user(client, scripts[i % len(scripts)], iterations, stream, results) for i in range(users))
+        )
+    elapsed = time.perf_counter() - started
+    rss_after = rss_mb()
+    report: Dict[str, Any] = {
+        "users": users,
+        "turns": results.turns,
+        "errors": len(results.errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": results.turns / elapsed if elapsed else 0.0,
+        "latency": _summary(results.latencies),
+    }
+    if stream:
+        report["ttft"] = _summary(results.ttfts)
+    if rss_before is not None and rss_after is not None:
+        report["rss_mb"] = {"before": rss_before, "after": rss_after, "growth": rss_after - rss_before}
+    if results.errors:
+        report["first_errors"] = results.errors[:5]
+    return report
+
+# =========================
+# In-process server
+# =========================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def run_local(args: argparse.Namespace) -> Dict[str, Any]:
+    import uvicorn
+    from agents import add_trace_processor
+
+    from bench.fake_model import FakeModel, install_fake_model
+
+    model = FakeModel(latency=args.latency, jitter=args.jitter, token_latency=args.token_latency)
+    install_fake_model(model)
+    # Keep traces in-process; the stage timer is added next to the /metrics processor
+    os.environ.setdefault("TRACE_EXPORT", "none")
+    from api import app
+
+    timer = StageTimer()
+    add_trace_processor(timer)
+
+    # Keep per-request access logs out of the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        report = await run_load(f"http://127.0.0.1:{port}", args.users, args.iterations, args.stream, args.timeout)
+    finally:
+        server.should_exit = True
+        await serve
+    report["model_calls"] = model.calls
+    report["stages"] = timer.report()
+    return report
+
+# =========================
+# CLI
+# =========================
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"users={report['users']} turns={report['turns']} errors={report['errors']} "
+          f"elapsed={report['elapsed_s']:.2f}s throughput={report['throughput_rps']:.1f} turns/s")
+    for key in ("latency", "ttft"):
+        if key in report:
+            s = report[key]
+            print(f"{key:8} p50={s['p50_ms']:.0f}ms p95={s['p95_ms']:.0f}ms p99={s['p99_ms']:.0f}ms max={s['max_ms']:.0f}ms")
+    if "rss_mb" in report:
+        r = report["rss_mb"]
+        print(f"rss      {r['before']:.1f}MB -> {r['after']:.1f}MB (+{r['growth']:.1f}MB)")
+    if "model_calls" in report:
+        print(f"model calls {report['model_calls']}")
+    if report.get("stages"):
+        print(f"{'stage':48} {'count':>6} {'mean':>9} {'p95':>9} {'total':>9}")
+        for stage, s in report["stages"].items():
+            print(f"{stage[:48]:48} {s['count']:6d} {s['mean_ms']:7.1f}ms {s['p95_ms']:7.1f}ms {s['total_s']:8.2f}s")
+    for error in report.get("first_errors", []):
+        print(f"error: {error}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=1, help="scripts replayed per user")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and report time to first token")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model latency per call, seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="fake model latency jitter, fraction")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake model delay per streamed word")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout, seconds")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        report = asyncio.run(run_load(args.url, args.users, args.iterations, args.stream, args.timeout))
+    else:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+        report = asyncio.run(run_local(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Report where backend startup time goes.
+
+Run from python-backend/:
+
+    python -m bench.startup
+    python -m bench.startup --top 30 --json
+
+Imports ``api`` in a fresh interpreter under ``-X importtime`` and times
+each phase: importing third-party packages, importing our modules (which
+builds the agents and stores), and warmup(). Modules are then ranked by
+cumulative and self import time, and grouped by top-level package.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+_PHASES = """
+import json, sys, time
+started = time.perf_counter()
+import agents, fastapi, openai
+sdk = time.perf_counter()
+import api
+imported = time.perf_counter()
+api.warmup()
+warm = time.perf_counter()
+print(json.dumps({"third_party_imports": sdk - started, "app_import": imported - sdk, "warmup": warm - imported}))
+"""
+
+def _local_modules() -> set:
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return {name[:-3] for name in os.listdir(here) if name.endswith(".py")}
+
+def profile() -> Dict[str, Any]:
+    env = {**os.environ, "TRACE_EXPORT": "none", "CHECKIN_WORKER_ENABLED": "0"}
+    # Building the client needs a key; nothing is sent
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PHASES], capture_output=True, text=True, env=env, check=True
+    )
+    modules: List[Dict[str, Any]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    local = _local_modules()
+    packages: Dict[str, float] = defaultdict(float)
+    for m in modules:
+        top = m["module"].split(".")[0]
+        packages["(ours) " + top if top in local else top] += m["self_ms"]
+    phases = {k: round(v * 1000, 1) for k, v in json.loads(proc.stdout.strip().splitlines()[-1]).items()}
+    return {"phases_ms": phases, "modules": modules, "packages_ms": dict(packages)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = profile()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("phase                      ms")
+    for phase, ms in report["phases_ms"].items():
+        print(f"{phase:<22} {ms:>7.1f}")
+    print(f"{'total':<22} {sum(report['phases_ms'].values()):>7.1f}")
+    print(f"\n{'package (self time)':<40} {'ms':>8}")
+    for name, ms in sorted(report["packages_ms"].items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<40} {ms:>8.1f}")
+    print(f"\n{'module (cumulative)':<56} {'cum ms':>8} {'self ms':>8}")
+    for m in sorted(report["modules"], key=lambda m: -m["cumulative_ms"])[:args.top]:
+        print(f"{m['module']:<56} {m['cumulative_ms']:>8.1f} {m['self_ms']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations as _annotations
+
+import re
+from typing import Optional, Tuple
+
+# =========================
+# KEYWORDS
+# =========================
+
+GREETINGS = (
+    "hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening",
+    "hy", "hii", "helo", "hey there",
+)
+
+ONBOARDING_PHRASES = (
+    "my name is", "i am", "call me", "it's", "im", "i’m",
+)
+
+ACKNOWLEDGEMENTS = (
+    "thanks", "thank you", "thx", "ty", "ok", "okay", "cool", "great", "got it",
+    "sounds good", "bye", "goodbye", "see you", "yes", "no", "sure",
+)
+
+# Terms that settle relevance on their own
+HEALTH_KEYWORDS = (
+    "health", "healthy", "fitness", "wellness",
+    "diet", "meal", "meals", "calorie", "calories", "protein", "carbs",
+    "nutrition", "vegetarian", "vegan", "keto", "low-carb", "diabetic", "diabetes",
+    "workout", "workouts", "cardio",
+    "muscle", "stretching", "yoga", "injury", "injured", "ankle",
+    "hydration",
+)
+
+# Everyday words that only suggest health ("run a script", "back up my laptop",
+# "the weight of my docker image", "exercise caution"); two of them, or one
+# with a quantity like "5km", are needed
+AMBIGUOUS_HEALTH_KEYWORDS = (
+    "fit", "eat", "eating", "food", "training", "run", "running", "strength", "stretch", "walk", "walking",
+    "steps", "pain", "hurts", "back", "sore", "sleep", "stress", "water", "doctor", "coach", "trainer",
+    "progress", "goal", "lose", "losing", "bulk", "pounds", "5k", "10k",
+    "weight", "kg", "kgs", "lbs", "exercise", "exercises", "gym", "knee", "shoulder", "marathon",
+)
+
+# Requests a specialist agent usually takes over
+HANDOFF_KEYWORDS = (
+    "injury", "injured", "pain", "hurts", "hurt", "sore", "sprain", "swollen", "physio",
+    "trainer", "coach", "human", "real person", "diabetic", "diabetes", "allergy", "allergic",
+    "pregnant", "pregnancy", "medication", "blood pressure", "cholesterol",
+)
+
+# Requests that usually end in a tool call
+TOOL_KEYWORDS = (
+    "meal plan", "diet plan", "workout plan", "plan", "workout", "routine", "schedule",
+    "check-in", "check in", "checkin", "remind", "summary", "summarize", "trend", "recommend",
+    "suggest",
+)
+
+OFF_TOPIC_KEYWORDS = (
+    "bitcoin", "crypto", "stock", "stocks", "javascript", "python", "sql", "programming",
+    "election", "president", "capital of", "lyrics", "movie", "movies", "football score",
+    "write a poem", "write an essay", "write a story", "translate",
+)
+
+# =========================
+# COMPILED PATTERNS
+# =========================
+
+def _alternation(phrases) -> str:
+    # Longest first so "hey there" wins over "hey".
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+_GREETING_RE = re.compile(rf"^(?:{_alternation(GREETINGS)})\b")
+_ONBOARDING_RE = re.compile(rf"^(?:{_alternation(ONBOARDING_PHRASES)})\b")
+_ACK_RE = re.compile(rf"^(?:{_alternation(ACKNOWLEDGEMENTS)})[\s!.,]*$")
+_HEALTH_RE = re.compile(rf"\b(?:{_alternation(HEALTH_KEYWORDS)})\b")
+_HEALTH_HINT_RE = re.compile(
+    rf"\b(?:{_alternation(AMBIGUOUS_HEALTH_KEYWORDS)})\b|\d+(?:\.\d+)?\s*(?:kg|kgs|lbs|km|miles)\b"
+)
+_OFF_TOPIC_RE = re.compile(rf"\b(?:{_alternation(OFF_TOPIC_KEYWORDS)})\b")
+_HANDOFF_RE = re.compile(rf"\b(?:{_alternation(HANDOFF_KEYWORDS)})\b")
+_TOOL_RE = re.compile(rf"\b(?:{_alternation(TOOL_KEYWORDS)})\b")
+
+_GOAL_VERB_RE = re.compile(
+    r"\b(?:lose|gain|drop|build|bulk|cut|tone|run|reach|get to|improve|increase|reduce|goal|target|aim)\b"
+)
+_GOAL_SHAPE_RE = re.compile(r"\d|\b(?:month|months|week|weeks|day|days|year|years)\b")
+
+# =========================
+# CLASSIFIERS
+# =========================
+
+def normalize(message: str) -> str:
+    return " ".join(message.strip().lower().split())
+
+def is_greeting(message: str) -> bool:
+    return bool(_GREETING_RE.match(normalize(message)))
+
+def classify_relevance(message: str) -> Optional[Tuple[bool, str]]:
+    """Settle obvious health-relevance cases locally.
+
+    Returns ``(is_relevant, reasoning)`` when the message is clearly a
+    greeting, onboarding reply, acknowledgement, health question or off-topic
+    request, and ``None`` when the model has to decide.
+    """
+    text = normalize(message)
+    if not text:
+        return True, "Empty message, always allowed."
+    if _GREETING_RE.match(text) or _ONBOARDING_RE.match(text):
+        return True, "Greeting or onboarding message, always allowed."
+    if _ACK_RE.match(text):
+        return True, "Conversational acknowledgement, always allowed."
+    health = _HEALTH_RE.search(text)
+    hints = sorted(set(_HEALTH_HINT_RE.findall(text)))
+    off_topic = _OFF_TOPIC_RE.search(text)
+    if health and not off_topic:
+        return True, f"Mentions health topic '{health.group(0)}'."
+    if len(hints) >= 2 and not off_topic:
+        return True, f"Mentions health topics {', '.join(repr(h) for h in hints)}."
+    if off_topic and not health:
+        return False, f"Mentions unrelated topic '{off_topic.group(0)}'."
+    return None
+
+def looks_like_goal(message: str) -> bool:
+    """True when the message plausibly states a goal worth validating."""
+    text = normalize(message)
+    return bool(_GOAL_VERB_RE.search(text) and _GOAL_SHAPE_RE.search(text))
+
+# Messages longer than this, or asking several questions, go to the strong model
+COMPLEX_MESSAGE_WORDS = 40
+
+def classify_complexity(message: str) -> Tuple[bool, str]:
+    """Decide whether a message needs the agent's strong model.
+
+    Returns ``(needs_strong_model, reason)``. Long or multi-part messages,
+    goals, and requests likely to call a tool or hand off to a specialist
+    need the strong model; greetings, acknowledgements and short chit-chat
+    do not.
+    """
+    text = normalize(message)
+    if not text or _GREETING_RE.match(text) or _ACK_RE.match(text):
+        return False, "greeting or acknowledgement"
+    handoff = _HANDOFF_RE.search(text)
+    if handoff:
+        return True, f"specialist handoff likely ('{handoff.group(0)}')"
+    tool = _TOOL_RE.search(text)
+    if tool:
+        return True, f"tool call likely ('{tool.group(0)}')"
+    if looks_like_goal(text):
+        return True, "goal statement"
+    if len(text.split()) > COMPLEX_MESSAGE_WORDS or text.count("?") > 1:
+        return True, "long or multi-part message"
+    return False, "short message, no tool or handoff expected"
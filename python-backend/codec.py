@@ -0,0 +1,168 @@
+from __future__ import annotations as _annotations
+
+import json
+import struct
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pydantic_core
+
+try:
+    import msgpack
+except ImportError:  # optional: pip install msgpack
+    msgpack = None
+
+# =========================
+# Format
+# =========================
+#
+# A blob is a 4-byte header followed by length-prefixed sections:
+#
+#   b"S" | format version | dictionary id | flags
+#   (section id: u8, flags: u8, length: u32) + body, repeated
+#
+# Sections are encoded independently, so a reader can decode the metadata
+# and context without touching the (much larger) transcript. Each body is
+# msgpack when available, else compact JSON. Bodies are deflated against a
+# preset dictionary of the keys and values every conversation repeats
+# (item keys, roles, agent names), which shrinks small blobs that plain
+# zlib can't help. Dictionaries are append-only: a new one gets a new id and
+# old ids stay decodable.
+
+MAGIC = b"S"
+FORMAT_VERSION = 1
+
+SECTION_META = 0
+SECTION_CONTEXT = 1
+SECTION_ITEMS = 2
+
+_FLAG_MSGPACK = 0x01
+_FLAG_DEFLATE = 0x02
+
+# Sections smaller than this are stored as-is
+DEFLATE_THRESHOLD = 64
+
+_DICTIONARIES: Dict[int, bytes] = {
+    1: json.dumps([
+        "Health & Wellness Planner", "Nutrition Expert Agent", "Injury Support Agent", "Escalation Agent",
+        "transfer_to_health___wellness_planner", "transfer_to_nutrition_expert_agent",
+        "transfer_to_injury_support_agent", "transfer_to_escalation_agent",
+        "goal_analyzer_tool", "meal_planner_tool", "workout_recommender_tool", "checkin_scheduler_tool",
+        "progress_tracker_tool", "progress_summary_tool", "set_user_name",
+        {"role": "user", "content": ""}, {"role": "assistant", "content": ""}, {"role": "system", "content": ""},
+        {"id": "msg_", "type": "message", "role": "assistant", "status": "completed",
+         "content": [{"type": "output_text", "text": "", "annotations": [], "logprobs": []}]},
+        {"type": "function_call", "call_id": "call_", "name": "", "arguments": "{}", "id": "fc_", "status": "completed"},
+        {"type": "function_call_output", "call_id": "call_", "output": ""},
+        {"ts": 0, "kind": "progress", "value": 0.0, "note": ""}, "checkin_scheduled",
+        {"objective": "weight loss", "quantity": 5.0, "metric": "kg", "duration": "2 months", "priority": "high"},
+        "muscle gain", "cardio fitness", "general fitness",
+        {"type": "", "frequency": "3 times per week", "duration": "45 minutes", "notes": "", "exercises": [], "avoid": []},
+        "Handed off to ", "Day 1: ", "Day 2: ", "Day 3: ", "Day 4: ", "Day 5: ", "Day 6: ", "Day 7: ",
+        {"current_agent": "", "usage": {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0,
+                                        "cost_usd": 0.0}, "schema": 1},
+        {"name": "", "uid": 0, "goal": {}, "diet_preferences": "", "workout_plan": {}, "meal_plan": [],
+         "injury_notes": "", "handoff_logs": [], "progress_logs": [], "version": 0},
+    ], separators=(",", ":")).encode("utf-8"),
+}
+DICTIONARY_ID = max(_DICTIONARIES)
+
+# =========================
+# Values
+# =========================
+
+def _dumps(value: Any, use_msgpack: bool) -> bytes:
+    if use_msgpack:
+        return msgpack.packb(value, use_bin_type=True, default=str)
+    # Same bytes as json.dumps(..., separators=(",", ":")), several times faster
+    return pydantic_core.to_json(value, fallback=str)
+
+def _loads(body: bytes, use_msgpack: bool) -> Any:
+    if use_msgpack:
+        if msgpack is None:
+            raise RuntimeError("This conversation state was written with msgpack; pip install msgpack to read it")
+        return msgpack.unpackb(body, raw=False)
+    return pydantic_core.from_json(body)
+
+def _deflate(raw: bytes, zdict: bytes) -> bytes:
+    compressor = zlib.compressobj(1, zdict=zdict)
+    return compressor.compress(raw) + compressor.flush()
+
+def _inflate(body: bytes, zdict: bytes) -> bytes:
+    decompressor = zlib.decompressobj(zdict=zdict)
+    return decompressor.decompress(body) + decompressor.flush()
+
+_SECTION = struct.Struct("<BBI")
+
+def encode_section(section_id: int, value: Any) -> bytes:
+    """One framed section; reuse the result to re-save a section that didn't change."""
+    flags = _FLAG_MSGPACK if msgpack is not None else 0
+    body = _dumps(value, msgpack is not None)
+    if len(body) > DEFLATE_THRESHOLD:
+        body = _deflate(body, _DICTIONARIES[DICTIONARY_ID])
+        flags |= _FLAG_DEFLATE
+    return _SECTION.pack(section_id, flags, len(body)) + body
+
+def encode(sections: Dict[int, Any], raw_sections: Optional[Dict[int, bytes]] = None) -> bytes:
+    """Build a blob from section values, plus already framed sections (from encode_section/split)."""
+    parts = [MAGIC, bytes((FORMAT_VERSION, DICTIONARY_ID, 0))]
+    for section_id, value in sections.items():
+        parts.append(encode_section(section_id, value))
+    for framed in (raw_sections or {}).values():
+        parts.append(framed)
+    return b"".join(parts)
+
+def is_encoded(data: bytes) -> bool:
+    return data[:1] == MAGIC
+
+def split(data: bytes) -> Tuple[int, Dict[int, bytes]]:
+    """Framed sections of a blob by id, without decoding any of them; returns (dictionary id, sections)."""
+    if data[:1] != MAGIC:
+        raise ValueError(f"Not an encoded conversation state: {data[:1]!r}")
+    version, dictionary_id = data[1], data[2]
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Conversation state format {version} is newer than this code ({FORMAT_VERSION})")
+    if dictionary_id not in _DICTIONARIES:
+        raise ValueError(f"Unknown conversation state dictionary {dictionary_id}")
+    sections: Dict[int, bytes] = {}
+    offset = 4
+    while offset < len(data):
+        section_id, _, length = _SECTION.unpack_from(data, offset)
+        end = offset + _SECTION.size + length
+        sections[section_id] = data[offset:end]
+        offset = end
+    return dictionary_id, sections
+
+def decode_section(framed: bytes, dictionary_id: int) -> Any:
+    _, flags, length = _SECTION.unpack_from(framed)
+    body = framed[_SECTION.size:_SECTION.size + length]
+    if flags & _FLAG_DEFLATE:
+        body = _inflate(body, _DICTIONARIES[dictionary_id])
+    return _loads(body, bool(flags & _FLAG_MSGPACK))
+
+# =========================
+# Schema migrations
+# =========================
+
+# Version of the meta/context payload layout; bump it together with a migration
+SCHEMA_VERSION = 1
+
+_MIGRATIONS: Dict[int, Callable[[Dict[str, Any], Dict[str, Any]], None]] = {}
+
+def migration(from_version: int):
+    """Register a function that upgrades (meta, context) payloads from ``from_version`` to the next one in place."""
+
+    def decorator(fn: Callable[[Dict[str, Any], Dict[str, Any]], None]):
+        _MIGRATIONS[from_version] = fn
+        return fn
+
+    return decorator
+
+def migrate(meta: Dict[str, Any], context: Dict[str, Any]) -> None:
+    version = meta.get("schema", 1)
+    while version < SCHEMA_VERSION:
+        if version not in _MIGRATIONS:
+            raise ValueError(f"No migration from conversation schema {version}")
+        _MIGRATIONS[version](meta, context)
+        version += 1
+    meta["schema"] = version
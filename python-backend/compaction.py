@@ -0,0 +1,152 @@
+from __future__ import annotations as _annotations
+
+import json
+import os
+from typing import Any, Dict, List
+
+from main import UserSessionContext
+
+# =========================
+# CONFIG
+# =========================
+
+# Approximate prompt-token budget for the replayed transcript.
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", 6000))
+# Most recent user turns that are always kept verbatim.
+TRANSCRIPT_KEEP_TURNS = int(os.getenv("TRANSCRIPT_KEEP_TURNS", 4))
+
+SUMMARY_MARKER = "[Conversation summary]"
+# How many folded user requests are quoted in the summary, and how much of each.
+MAX_SUMMARY_REQUESTS = 8
+MAX_REQUEST_CHARS = 160
+
+# =========================
+# HELPERS
+# =========================
+
+def estimate_tokens(item: Any) -> int:
+    """Cheap token estimate (~4 characters per token) for an input item."""
+    if isinstance(item, str):
+        return len(item) // 4 + 1
+    return len(json.dumps(item, default=str, separators=(",", ":"))) // 4 + 1
+
+def _is_user_message(item: Any) -> bool:
+    return (
+        isinstance(item, dict)
+        and item.get("role") == "user"
+        and item.get("type", "message") == "message"
+    )
+
+def _is_summary(item: Any) -> bool:
+    return (
+        isinstance(item, dict)
+        and item.get("role") == "system"
+        and isinstance(item.get("content"), str)
+        and item["content"].startswith(SUMMARY_MARKER)
+    )
+
+def _text_of(item: Dict[str, Any]) -> str:
+    content = item.get("content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+    return str(content)
+
+def _split_turns(items: List[Any]) -> List[List[Any]]:
+    """Group items into turns, each starting at a user message."""
+    turns: List[List[Any]] = []
+    for item in items:
+        if _is_user_message(item) or not turns:
+            turns.append([item])
+        else:
+            turns[-1].append(item)
+    return turns
+
+def _context_summary(ctx: UserSessionContext) -> List[str]:
+    """Describe the structured session state instead of replaying the raw text that set it."""
+    lines = []
+    if ctx.name:
+        lines.append(f"User name: {ctx.name}")
+    if ctx.goal:
+        lines.append(
+            f"Goal: {ctx.goal.get('objective', 'unknown')} - {ctx.goal.get('quantity', 0)} "
+            f"{ctx.goal.get('metric', 'units')} in {ctx.goal.get('duration', 'unknown time')}"
+        )
+    if ctx.diet_preferences:
+        lines.append(f"Dietary preferences: {ctx.diet_preferences}")
+    if ctx.meal_plan:
+        lines.append(f"Meal plan: {len(ctx.meal_plan)} days already generated")
+    if ctx.workout_plan:
+        lines.append(
+            f"Workout plan: {ctx.workout_plan.get('type', 'unknown')} - "
+            f"{ctx.workout_plan.get('frequency', 'unknown frequency')}"
+        )
+    if ctx.injury_notes:
+        lines.append(f"Injury notes: {ctx.injury_notes}")
+    if ctx.progress_logs:
+        lines.append(f"Progress entries logged: {len(ctx.progress_logs)}")
+    return lines
+
+def _summarize(folded: List[Any], ctx: UserSessionContext) -> Dict[str, Any]:
+    """Fold older items into a single summary message."""
+    requests: List[str] = []
+    tools: List[str] = []
+    for item in folded:
+        if _is_summary(item):
+            # Carry forward earlier requests and tools instead of nesting summaries.
+            for line in item["content"].splitlines():
+                if line.startswith("- "):
+                    requests.append(line[2:])
+                elif line.startswith("Tools already used: "):
+                    tools.extend(line[len("Tools already used: "):].split(", "))
+        elif _is_user_message(item):
+            text = " ".join(_text_of(item).split())
+            if text:
+                requests.append(text[:MAX_REQUEST_CHARS])
+        elif isinstance(item, dict) and item.get("type") == "function_call":
+            name = item.get("name")
+            if name and name not in tools:
+                tools.append(name)
+
+    lines = [SUMMARY_MARKER]
+    lines.extend(_context_summary(ctx))
+    if tools:
+        lines.append(f"Tools already used: {', '.join(tools)}")
+    if requests:
+        lines.append("Earlier user requests:")
+        lines.extend(f"- {r}" for r in requests[-MAX_SUMMARY_REQUESTS:])
+    return {"role": "system", "content": "\n".join(lines)}
+
+# =========================
+# COMPACTION
+# =========================
+
+def compact_input_items(
+    items: List[Any],
+    ctx: UserSessionContext,
+    token_budget: int = TRANSCRIPT_TOKEN_BUDGET,
+    keep_turns: int = TRANSCRIPT_KEEP_TURNS,
+) -> List[Any]:
+    """Keep recent turns verbatim and fold older ones into a summary item.
+
+    Returns ``items`` unchanged while it fits in ``token_budget``. Otherwise
+    the oldest turns are folded (never splitting a tool call from its output)
+    until the remainder fits or only ``keep_turns`` turns are left.
+    """
+    if sum(estimate_tokens(i) for i in items) <= token_budget:
+        return items
+
+    turns = _split_turns(items)
+    costs = [sum(estimate_tokens(i) for i in turn) for turn in turns]
+    total = sum(costs)
+    cut = 0
+    while cut < len(turns) - keep_turns and total > token_budget:
+        total -= costs[cut]
+        cut += 1
+    if cut == 0:
+        return items
+
+    folded = [item for turn in turns[:cut] for item in turn]
+    recent = [item for turn in turns[cut:] for item in turn]
+    return [_summarize(folded, ctx)] + recent
@@ -0,0 +1,135 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+
+# =========================
+# Per-conversation locks
+# =========================
+
+class ConversationBusyError(Exception):
+    """Raised when a conversation's wait queue is full or the wait timed out."""
+
+class ConversationLocks:
+    """One asyncio lock per conversation with a bounded wait queue.
+
+    Turns for the same conversation run one at a time inside a worker; at
+    most ``max_waiters`` more requests may queue behind the running turn and
+    each waits at most ``wait_timeout`` seconds. Locks are dropped as soon as
+    nobody holds or waits on them.
+    """
+
+    def __init__(self, max_waiters: int = 4, wait_timeout: Optional[float] = 60.0):
+        self.max_waiters = max_waiters
+        self.wait_timeout = wait_timeout
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, conversation_id: Optional[str]) -> AsyncIterator[None]:
+        """Hold the conversation's lock; a ``None`` id (new conversation) never waits."""
+        if conversation_id is None:
+            yield
+            return
+        users = self._users.get(conversation_id, 0)
+        if users > self.max_waiters:
+            raise ConversationBusyError(f"Conversation {conversation_id} has too many pending requests")
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        self._users[conversation_id] = users + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise ConversationBusyError(
+                    f"Timed out waiting for conversation {conversation_id}"
+                ) from None
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            remaining = self._users[conversation_id] - 1
+            if remaining:
+                self._users[conversation_id] = remaining
+            else:
+                del self._users[conversation_id]
+                del self._locks[conversation_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+# =========================
+# Request coalescing
+# =========================
+
+class TurnCoalescer:
+    """Share one in-flight result between identical concurrent requests.
+
+    The first request for a key registers a future and does the work; a
+    duplicate (e.g. a double submit or a client retry) awaits that future
+    instead of running the turn again. A ``None`` key is never coalesced.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def pending(self, key: Optional[Hashable]) -> Optional[asyncio.Future]:
+        if key is None or not self.enabled:
+            return None
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def start(self, key: Optional[Hashable]) -> None:
+        if key is not None and self.enabled:
+            self._inflight[key] = asyncio.get_running_loop().create_future()
+
+    def finish(self, key: Optional[Hashable], result: Any = None, error: Optional[BaseException] = None) -> None:
+        future = self._inflight.pop(key, None) if key is not None else None
+        if future is None or future.done():
+            return
+        if error is not None and not isinstance(error, Exception):
+            # Cancelled; attached duplicates are cancelled too
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+            # Nobody may be attached; don't log "exception was never retrieved"
+            future.exception()
+        else:
+            future.set_result(result)
+
+    async def run(self, key: Optional[Hashable], work: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the in-flight result for ``key`` or run ``work`` and publish its result."""
+        pending = self.pending(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        self.start(key)
+        try:
+            result = await work()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "coalesced": self.coalesced}
+
+# =========================
+# Configuration
+# =========================
+
+def create_conversation_locks() -> ConversationLocks:
+    """Build per-conversation locks from CONVERSATION_LOCK_MAX_WAITERS and CONVERSATION_LOCK_TIMEOUT."""
+    return ConversationLocks(
+        max_waiters=int(os.getenv("CONVERSATION_LOCK_MAX_WAITERS", 4)),
+        wait_timeout=float(os.getenv("CONVERSATION_LOCK_TIMEOUT", 60)) or None,
+    )
+
+conversation_locks = create_conversation_locks()
+turn_coalescer = TurnCoalescer(enabled=os.getenv("CHAT_COALESCE_ENABLED", "1") != "0")
@@ -0,0 +1,178 @@
+from __future__ import annotations as _annotations
+
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from classifier import is_greeting, normalize
+from main import (
+    GOAL_PROMPT,
+    WELCOME_PROMPT,
+    UserSessionContext,
+    analyze_goal,
+    main_planner_agent,
+    schedule_checkin,
+    set_name,
+    track_progress,
+)
+
+# Set FAST_PATH_ENABLED=0 to always go through the model.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") != "0"
+
+# =========================
+# INTENT PATTERNS
+# =========================
+
+_CHECKIN_RE = re.compile(
+    r"^(?:please )?(?:schedule|set up|book|add|plan)\b.{0,30}\b(?:check-?ins?|progress checks?)\b[\s.!]*$"
+)
+_PROGRESS_RE = re.compile(
+    r"^(?:please )?(?:log|record|track)\b(?: my)?(?: weight| progress)?(?: (?:of|at|as))?\s*"
+    r"(\d+(?:\.\d+)?)\s*(kg|kgs|lbs|pounds|km|miles|steps)[\s.!]*$"
+    r"|^i (?:weigh|weighed)(?: in at)?\s+(\d+(?:\.\d+)?)\s*(kg|kgs|lbs|pounds)(?: today| this week)?[\s.!]*$"
+)
+_NAME_RE = re.compile(r"^(?:my name is|my name's|call me)\s+([a-z][a-z'\-]{0,30}(?: [a-z][a-z'\-]{0,30})?)[\s.!]*$")
+# Words that can follow "call me" without being a name
+_NOT_NAMES = frozenset({
+    "no", "nope", "yes", "yeah", "yep", "ok", "okay", "sure", "thanks", "thank", "why", "what", "who", "how",
+    "not", "never", "later", "maybe", "nothing", "none", "skip", "pass", "idk", "whatever", "nah", "stop",
+})
+# The whole message must be the user's own goal; anything else in it (a
+# second request, someone else's goal, a past result) needs the model
+_GOAL_RE = re.compile(
+    r"^(?:i(?: really)? (?:want|need|plan|intend|aim|hope|would like)|i['’]d(?: really)? like"
+    r"|i(?:['’]m| am)(?: really)? (?:going|trying|planning|aiming|hoping)) to (?:lose|gain|drop|build|run) \d+(?:\.\d+)?\s*(?:kg|kgs|pounds|lbs|km|miles) "
+    r"(?:in|within|over) (?:the next )?\d+\s*(?:month|week|day)s?[\s.!]*$"
+)
+# Questions and negations ("is it safe to lose...", "I don't want to lose...") aren't commitments
+_NOT_A_COMMITMENT_RE = re.compile(
+    r"\?"
+    r"|\b(?:not|never|no|cannot|(?:do|does|did|is|are|was|wo|ca|could|should|would)n['’]?t)\b"
+    r"|\b(?:how|what|why|when|where|which|who|whether)\b"
+    r"|^(?:is|are|am|can|could|should|would|will|do|does|did)\b"
+)
+
+# =========================
+# ROUTER
+# =========================
+
+@dataclass
+class ToolStep:
+    """One tool call made locally, as the model would have made it."""
+    tool_name: str
+    arguments: Dict[str, Any]
+    output: str
+
+@dataclass
+class FastPathResult:
+    """Outcome of a turn handled without calling the model: tool calls, if any, then a reply."""
+    reply: str
+    agent: str
+    steps: List[ToolStep] = field(default_factory=list)
+
+    def input_items(self) -> List[Dict[str, Any]]:
+        """Synthetic tool-call, tool-output and reply items for the transcript."""
+        items: List[Dict[str, Any]] = []
+        for step in self.steps:
+            call_id = f"call_fp_{uuid4().hex[:24]}"
+            items.append({
+                "type": "function_call",
+                "call_id": call_id,
+                "name": step.tool_name,
+                "arguments": json.dumps(step.arguments),
+            })
+            items.append({"type": "function_call_output", "call_id": call_id, "output": step.output})
+        items.append({"role": "assistant", "content": self.reply})
+        return items
+
+def _title(name: str) -> str:
+    return " ".join(part.capitalize() for part in name.split())
+
+def _goal_reply(ctx: UserSessionContext) -> str:
+    goal = ctx.goal or {}
+    reply = (
+        f"Great{', ' + ctx.name if ctx.name else ''}! I've set your goal: "
+        f"{goal.get('objective')} - {goal.get('quantity', 0):g} {goal.get('metric')} in {goal.get('duration')}. "
+        "Would you like a meal plan or a workout plan to get started?"
+    )
+    if not ctx.name:
+        reply += " And what should I call you?"
+    return reply
+
+def _name_reply(ctx: UserSessionContext) -> str:
+    if ctx.goal:
+        return f"Nice to meet you, {ctx.name}! How can I help you with your goal today?"
+    return f"Nice to meet you, {ctx.name}! {GOAL_PROMPT}"
+
+def route_intent(message: str, state: Dict[str, Any]) -> Optional[FastPathResult]:
+    """Handle high-confidence deterministic tool intents and onboarding greetings locally.
+
+    Returns ``None`` whenever the message is not an unambiguous match, in
+    which case the caller falls back to the model.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    ctx: UserSessionContext = state["context"]
+    agent_name: str = state["current_agent"]
+    text = normalize(message)
+    on_planner = agent_name == main_planner_agent.name
+    # Anything below writes to the context, so hedged text goes to the model
+    committal = not _NOT_A_COMMITMENT_RE.search(text)
+
+    # progress_tracker_tool is available on every agent
+    match = _PROGRESS_RE.match(text) if committal else None
+    if match:
+        value = float(match.group(1) or match.group(3))
+        unit = match.group(2) or match.group(4) or ""
+        update = f"{'Weight' if unit in ('kg', 'kgs', 'lbs', 'pounds') else 'Progress'} {value:g}{unit}".strip()
+        output = track_progress(ctx, update, value)
+        return FastPathResult(
+            reply=f"Logged {value:g}{' ' + unit if unit else ''} - nice work keeping track! Keep it up.",
+            agent=agent_name,
+            steps=[ToolStep("progress_tracker_tool", {"progress_update": update, "metric_value": value}, output)],
+        )
+
+    if not on_planner:
+        return None
+
+    # The planner's scripted onboarding questions
+    if is_greeting(message) and not ctx.name:
+        return FastPathResult(reply=WELCOME_PROMPT, agent=agent_name)
+    if is_greeting(message) and not ctx.goal:
+        return FastPathResult(reply=f"Hi {ctx.name}! {GOAL_PROMPT}", agent=agent_name)
+
+    if not committal:
+        return None
+
+    if _CHECKIN_RE.match(text):
+        output = schedule_checkin(ctx)
+        return FastPathResult(
+            reply=f"{output}. I'll check in on your progress every week.",
+            agent=agent_name,
+            steps=[ToolStep("checkin_scheduler_tool", {}, output)],
+        )
+
+    if _GOAL_RE.match(text):
+        output = analyze_goal(ctx, message)
+        return FastPathResult(
+            reply=_goal_reply(ctx),
+            agent=agent_name,
+            steps=[ToolStep("goal_analyzer_tool", {"user_goal": message}, output)],
+        )
+
+    # Only an explicit "my name is"/"call me"; a bare one-word reply ("Running",
+    # "Pizza") can't be told apart from a name without the model
+    match = _NAME_RE.match(text)
+    name = _title(match.group(1)) if match else None
+    if name and not is_greeting(name) and not _NOT_NAMES.intersection(name.lower().split()):
+        output = set_name(ctx, name)
+        return FastPathResult(
+            reply=_name_reply(ctx),
+            agent=agent_name,
+            steps=[ToolStep("set_user_name", {"name": name}, output)],
+        )
+
+    return None
@@ -0,0 +1,289 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from classifier import normalize
+
+try:
+    import numpy as np
+except ImportError:  # optional: pip install numpy
+    np = None
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[str], Awaitable[Sequence[float]]]
+
+# =========================
+# CACHE
+# =========================
+
+def cache_key(message: str) -> str:
+    """Normalize message text so trivial variations share a verdict."""
+    return normalize(message).strip(" .!?,;:")
+
+def _unit(vector: Sequence[float]) -> Any:
+    """The vector scaled to length 1, so cosine similarity is a dot product."""
+    if np is not None:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else array
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+def _nearest(rows: List[Tuple[str, Sequence[float]]], vector: Sequence[float]) -> Tuple[Optional[str], float]:
+    best_text, best_score = None, 0.0
+    for text, row in rows:
+        score = sum(x * y for x, y in zip(row, vector))
+        if score > best_score:
+            best_text, best_score = text, score
+    return best_text, best_score
+
+class _VectorIndex:
+    """Unit-length embeddings of one verdict kind's cached messages.
+
+    With numpy the rows share one preallocated float32 matrix and a probe is
+    a single matrix-vector product. Without it they are plain lists that
+    VerdictCache scans in a worker thread.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots: Dict[str, int] = {}
+        self._texts: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._rows: Any = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, text: str, vector: Any) -> None:
+        if np is not None and self._rows is not None and self._rows.shape[1] != len(vector):
+            # A different embedding model; the old vectors can't be compared
+            self.__init__(self.capacity)
+        slot = self._slots.get(text)
+        if slot is None:
+            slot = self._free.pop() if self._free else len(self._texts)
+            if slot == len(self._texts):
+                self._texts.append(text)
+            else:
+                self._texts[slot] = text
+            self._slots[text] = slot
+        if np is not None:
+            if self._rows is None:
+                self._rows = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            self._rows[slot] = vector
+        else:
+            if self._rows is None:
+                self._rows = []
+            if slot == len(self._rows):
+                self._rows.append(vector)
+            else:
+                self._rows[slot] = vector
+
+    def remove(self, text: str) -> None:
+        slot = self._slots.pop(text, None)
+        if slot is None:
+            return
+        self._texts[slot] = None
+        self._free.append(slot)
+        # A zero row scores 0 and can never clear the threshold
+        self._rows[slot] = 0 if np is not None else None
+
+    def nearest(self, vector: Any) -> Tuple[Optional[str], float]:
+        """Most similar cached message and its score (numpy only)."""
+        if not self._slots:
+            return None, 0.0
+        scores = self._rows[:len(self._texts)] @ vector
+        best = int(np.argmax(scores))
+        return self._texts[best], float(scores[best])
+
+    def rows(self) -> List[Tuple[str, Sequence[float]]]:
+        """Snapshot of (message, vector) pairs for a scan outside the lock."""
+        return [(text, row) for text, row in zip(self._texts, self._rows or ()) if text is not None]
+
+class VerdictCache:
+    """LRU + TTL cache of guardrail verdicts keyed on normalized message text.
+
+    Exact matches are looked up first. When an ``embedder`` is configured a
+    second, smaller tier returns the verdict of the most similar cached
+    message above ``similarity_threshold``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl_seconds: Optional[float] = 6 * 3600,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.95,
+        max_semantic_entries: int = 2_000,
+        enabled: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_semantic_entries = max_semantic_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, BaseModel]]" = OrderedDict()
+        # LRU order of the keys with an embedding; the vectors live in the per-kind indexes
+        self._embedded: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._indexes: Dict[str, _VectorIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    async def _embed(self, text: str) -> Optional[Any]:
+        try:
+            return _unit(await self.embedder(text))
+        except Exception:
+            logger.warning("Guardrail cache embedding failed; using exact matches only", exc_info=True)
+            return None
+
+    def _expired(self, saved_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - saved_at > self.ttl_seconds
+
+    def _drop_vector(self, key: Tuple[str, str]) -> None:
+        # Caller holds the lock
+        if key in self._embedded:
+            del self._embedded[key]
+            self._indexes[key[0]].remove(key[1])
+
+    def _get_exact(self, key: Tuple[str, str]) -> Optional[BaseModel]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            saved_at, verdict = entry
+            if self._expired(saved_at):
+                del self._entries[key]
+                self._drop_vector(key)
+                return None
+            self._entries.move_to_end(key)
+            return verdict
+
+    async def _nearest(self, kind: str, vector: Any) -> Tuple[Optional[str], float]:
+        with self._lock:
+            index = self._indexes.get(kind)
+            if index is None:
+                return None, 0.0
+            if np is not None:
+                return index.nearest(vector)
+            rows = index.rows()
+        # The pure-Python scan is slow enough at full size to stall the event loop
+        return await asyncio.to_thread(_nearest, rows, vector)
+
+    async def get(self, kind: str, message: str) -> Tuple[Optional[BaseModel], Optional[Any]]:
+        """Return a cached verdict of the given kind for the message, if any.
+
+        The second value is the message's embedding when the similarity tier
+        computed one; pass it back to put() so a miss costs one embedding call.
+        """
+        if not self.enabled:
+            return None, None
+        key = (kind, cache_key(message))
+        verdict = self._get_exact(key)
+        if verdict is not None:
+            self.hits += 1
+            return verdict, None
+
+        vector = await self._embed(key[1]) if self.embedder is not None else None
+        if vector is not None:
+            best_text, best_score = await self._nearest(kind, vector)
+            if best_text is not None and best_score >= self.similarity_threshold:
+                verdict = self._get_exact((kind, best_text))
+                if verdict is not None:
+                    self.semantic_hits += 1
+                    return verdict, vector
+
+        self.misses += 1
+        return None, vector
+
+    async def put(self, kind: str, message: str, verdict: BaseModel, vector: Optional[Any] = None) -> None:
+        """Cache a verdict for the message, reusing the embedding get() returned."""
+        if not self.enabled:
+            return
+        key = (kind, cache_key(message))
+        if vector is None and self.embedder is not None:
+            vector = await self._embed(key[1])
+        with self._lock:
+            self._entries[key] = (time.time(), verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._drop_vector(old_key)
+            if vector is not None:
+                if key not in self._embedded and len(self._embedded) >= self.max_semantic_entries:
+                    self._drop_vector(next(iter(self._embedded)))
+                index = self._indexes.get(kind)
+                if index is None:
+                    index = self._indexes[kind] = _VectorIndex(self.max_semantic_entries)
+                index.add(key[1], vector)
+                self._embedded[key] = None
+                self._embedded.move_to_end(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._embedded.clear()
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "semantic_size": len(self._embedded),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+# =========================
+# CONFIGURATION
+# =========================
+
+def openai_embedder(model: str = "text-embedding-3-small") -> Embedder:
+    """Embed messages with the OpenAI embeddings API over the shared client."""
+
+    async def embed(text: str) -> List[float]:
+        from provider import get_openai_client
+
+        client = get_openai_client()
+        if client is None:
+            raise RuntimeError("OpenAI client is not configured")
+        response = await client.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
+
+    return embed
+
+def create_verdict_cache() -> VerdictCache:
+    """Build the guardrail verdict cache from environment variables.
+
+    GUARDRAIL_CACHE_ENABLED: set to ``0`` to bypass the cache.
+    GUARDRAIL_CACHE_SIZE / GUARDRAIL_CACHE_TTL_SECONDS: LRU bound and TTL.
+    GUARDRAIL_CACHE_EMBEDDINGS: set to ``1`` to enable the similarity tier.
+    GUARDRAIL_CACHE_SIMILARITY: cosine threshold for the similarity tier.
+    """
+    embedder = None
+    if os.getenv("GUARDRAIL_CACHE_EMBEDDINGS", "0") == "1":
+        embedder = openai_embedder(os.getenv("GUARDRAIL_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"))
+    return VerdictCache(
+        max_entries=int(os.getenv("GUARDRAIL_CACHE_SIZE", 10_000)),
+        ttl_seconds=float(os.getenv("GUARDRAIL_CACHE_TTL_SECONDS", 6 * 3600)) or None,
+        embedder=embedder,
+        similarity_threshold=float(os.getenv("GUARDRAIL_CACHE_SIMILARITY", 0.95)),
+        enabled=os.getenv("GUARDRAIL_CACHE_ENABLED", "1") != "0",
+    )
+
+verdict_cache = create_verdict_cache()
@@ -0,0 +1,46 @@
+"""Gunicorn settings for serving api:app with a pool of uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py api:app
+
+WEB_CONCURRENCY: number of worker processes (default: one per CPU core).
+PORT: listen port (default 8000).
+WORKER_TIMEOUT: seconds before a silent worker is restarted (default 120).
+MAX_REQUESTS: recycle a worker after this many requests (0 disables).
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# Import the app (agents, tools, regexes, stores) once in the master, then fork
+preload_app = True
+
+# Worker processes share nothing in memory, so conversations, progress
+# history and scheduled check-ins must live in a store every worker can reach.
+if workers > 1:
+    os.environ.setdefault("CONVERSATION_STORE", "sqlite")
+    os.environ.setdefault("PROGRESS_STORE", "sqlite")
+    os.environ.setdefault("CHECKIN_STORE", "sqlite")
+    for var in ("CONVERSATION_STORE", "PROGRESS_STORE", "CHECKIN_STORE"):
+        if os.environ[var] == "memory":
+            raise RuntimeError(
+                f"{var}=memory is process-local and cannot be used with {workers} workers; "
+                "use sqlite or redis, or set WEB_CONCURRENCY=1"
+            )
+
+def when_ready(server):
+    from api import warmup
+
+    warmup()
+    # Keep everything built so far out of the collector so forked workers
+    # don't touch (and copy) those pages during GC
+    gc.freeze()
+    server.log.info("Warmed up; starting %s workers", workers)
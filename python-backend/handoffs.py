@@ -0,0 +1,102 @@
+from __future__ import annotations as _annotations
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agents import Agent, Handoff, RunContextWrapper, handoff
+
+from telemetry import metrics, traced_hook
+
+HANDOFFS = metrics.counter("agent_handoffs_total", "Handoffs between agents.", labels=("source", "target"))
+
+# =========================
+# Registry
+# =========================
+
+@dataclass(frozen=True)
+class HandoffRoute:
+    """One registered handoff and the name of the hook that runs with it."""
+    source: str
+    target: str
+    callback: Optional[str] = None
+
+class HandoffRegistry:
+    """Handoffs keyed by (source, target) agent names, filled in once at import.
+
+    Building every handoff through register() means the hook knows which
+    route fired and can publish it, so nothing has to look back into the
+    Handoff objects to work out what ran.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], HandoffRoute] = {}
+
+    def register(
+        self,
+        source: Agent[Any],
+        target: Agent[Any],
+        on_handoff: Optional[Callable[[RunContextWrapper[Any]], Awaitable[None]]] = None,
+    ) -> Handoff:
+        route = HandoffRoute(source.name, target.name, on_handoff.__name__ if on_handoff else None)
+        self._routes[(route.source, route.target)] = route
+        callback = traced_hook(on_handoff) if on_handoff else None
+
+        async def on_invoke(context: RunContextWrapper[Any]) -> None:
+            if callback is not None:
+                await callback(context)
+            handoff_events.publish(route)
+
+        return handoff(agent=target, on_handoff=on_invoke)
+
+    def route(self, source: str, target: str) -> HandoffRoute:
+        return self._routes.get((source, target)) or HandoffRoute(source, target)
+
+def create_handoff_registry() -> HandoffRegistry:
+    return HandoffRegistry()
+
+handoff_registry = create_handoff_registry()
+
+# =========================
+# Events
+# =========================
+
+class HandoffEvents:
+    """Routes published by handoff hooks during the current turn.
+
+    Hooks run inside the agent run (a separate task when streaming), so the
+    queue is a list held in a ContextVar: the run's copied context shares the
+    same list. Subscribers see every route, in or out of a turn.
+    """
+
+    def __init__(self):
+        self._queue: ContextVar[Optional[List[HandoffRoute]]] = ContextVar("handoff_events", default=None)
+        self._subscribers: List[Callable[[HandoffRoute], None]] = []
+
+    def start_turn(self) -> None:
+        self._queue.set([])
+
+    def subscribe(self, fn: Callable[[HandoffRoute], None]) -> None:
+        self._subscribers.append(fn)
+
+    def publish(self, route: HandoffRoute) -> None:
+        for fn in self._subscribers:
+            fn(route)
+        queue = self._queue.get()
+        if queue is not None:
+            queue.append(route)
+
+    def pop(self, source: str, target: str) -> Optional[HandoffRoute]:
+        """Take the oldest published route from ``source`` to ``target``.
+
+        A non-streamed run returns all its items at once, after every hook
+        has fired, so each handoff item must take only its own route.
+        """
+        queue = self._queue.get()
+        for i, route in enumerate(queue or ()):
+            if route.source == source and route.target == target:
+                return queue.pop(i)
+        return None
+
+handoff_events = HandoffEvents()
+handoff_events.subscribe(lambda route: HANDOFFS.inc(route.source, route.target))
@@ -1,10 +1,13 @@
 from __future__ import annotations as _annotations
 
 import random
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+import copy
+import functools
 import string
+import time
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional, Sequence, Tuple
 import json
 from datetime import datetime, timedelta
 
@@ -14,13 +17,21 @@ from agents import (
     Runner,
     TResponseInputItem,
     function_tool,
-    handoff,
     GuardrailFunctionOutput,
     input_guardrail,
-    set_default_openai_api
 )
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 
+from classifier import classify_relevance, is_greeting, looks_like_goal
+from guardrail_cache import verdict_cache
+from handoffs import handoff_registry
+from progress_store import PROGRESS_WINDOW, ProgressRecord, progress_store
+from provider import configure_openai
+from routing import configure_routing
+from rules import plan_rules
+from scheduler import Checkin, CheckinChange, checkin_store, current_conversation
+from usage import usage_hooks
+
 import os
 
 # =========================
@@ -28,8 +39,6 @@ import os
 # =========================
 load_dotenv()
 
-set_default_openai_api(api=os.getenv("OPENAI_API_KEY"))
-
 class UserSessionContext(BaseModel):
     name: str | None = None
     uid: int | None = None
@@ -39,7 +48,117 @@ class UserSessionContext(BaseModel):
     meal_plan: Optional[List[str]] = None
     injury_notes: Optional[str] = None
     handoff_logs: List[str] = []
-    progress_logs: List[Dict[str, str]] = []
+    # Ring buffer of the latest PROGRESS_WINDOW entries; full history lives in progress_store
+    progress_logs: List[Dict[str, Any]] = []
+    # Bumped every time a turn commits changes; clients use it to request deltas
+    version: int = 0
+
+    # field -> value before its first assignment since the last commit
+    _dirty: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    # log field -> length before its first append since the last commit
+    _appended: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # field -> number of writes on this instance; keys memoized renders
+    _revisions: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # render key -> (revisions of the fields it read, rendered text)
+    _rendered: Dict[str, Tuple[Tuple[int, ...], str]] = PrivateAttr(default_factory=dict)
+    # Progress records made this turn, written to progress_store once the turn is saved
+    _pending_progress: List[ProgressRecord] = PrivateAttr(default_factory=list)
+    # Check-in changes made this turn, applied to checkin_store once the turn is saved
+    _pending_checkins: List[CheckinChange] = PrivateAttr(default_factory=list)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in type(self).model_fields:
+            self._touch(name)
+            if name != "version" and name not in self._dirty:
+                original = copy.deepcopy(getattr(self, name))
+                if name in self._appended:
+                    original = original[:self._appended[name]]
+                self._dirty[name] = original
+        super().__setattr__(name, value)
+
+    def _touch(self, field: str) -> None:
+        # Read private attributes straight from pydantic's storage; attribute access goes through a slow __getattr__
+        revisions = self.__pydantic_private__["_revisions"]
+        revisions[field] = revisions.get(field, 0) + 1
+
+    def _append(self, field: str, item: Any) -> None:
+        items = getattr(self, field)
+        self._appended.setdefault(field, len(items))
+        self._touch(field)
+        items.append(item)
+
+    def memoized(self, key: str, fields: Sequence[str], render: Callable[..., str], *args: Any) -> str:
+        """Return ``render(*args)``, reusing the previous result while none of ``fields`` changed."""
+        private = self.__pydantic_private__
+        revisions, rendered = private["_revisions"], private["_rendered"]
+        stamp = tuple([revisions.get(field, 0) for field in fields])
+        cached = rendered.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        text = render(*args)
+        rendered[key] = (stamp, text)
+        return text
+
+    def log_handoff(self, message: str) -> None:
+        self._append("handoff_logs", message)
+
+    def record_progress(self, record: ProgressRecord) -> None:
+        """Add a record to the recent window and queue it for progress_store."""
+        self._pending_progress.append(record)
+        self.log_progress(record.to_dict())
+
+    def take_progress(self) -> List[ProgressRecord]:
+        """Queued progress records, emptying the queue."""
+        pending, self._pending_progress = self._pending_progress, []
+        return pending
+
+    def queue_checkin(self, change: CheckinChange) -> None:
+        self._pending_checkins.append(change)
+
+    def take_checkins(self) -> List[CheckinChange]:
+        """Queued check-in changes, emptying the queue."""
+        pending, self._pending_checkins = self._pending_checkins, []
+        return pending
+
+    def log_progress(self, entry: Dict[str, Any]) -> None:
+        if len(self.progress_logs) >= PROGRESS_WINDOW:
+            self.progress_logs = (self.progress_logs + [entry])[-PROGRESS_WINDOW:]
+        else:
+            self._append("progress_logs", entry)
+
+    def commit(self) -> Tuple[Dict[str, Any], Dict[str, List[Any]]]:
+        """Return (changed fields, appended log entries) since the last commit.
+
+        Bumps ``version`` when anything changed and resets change tracking.
+        """
+        changes = {
+            name: getattr(self, name)
+            for name, original in self._dirty.items()
+            if getattr(self, name) != original
+        }
+        appends = {
+            name: getattr(self, name)[start:]
+            for name, start in self._appended.items()
+            if name not in changes and len(getattr(self, name)) > start
+        }
+        self._dirty.clear()
+        self._appended.clear()
+        if changes or appends:
+            self.version += 1
+        return changes, appends
+
+    def rollback(self) -> None:
+        """Undo every change made since the last commit."""
+        self._pending_progress.clear()
+        self._pending_checkins.clear()
+        for name, start in self._appended.items():
+            del getattr(self, name)[start:]
+            self._touch(name)
+        for name, original in self._dirty.items():
+            super().__setattr__(name, original)
+            self._touch(name)
+        self._dirty.clear()
+        self._appended.clear()
 
 def create_initial_context() -> UserSessionContext:
     ctx = UserSessionContext()
@@ -60,6 +179,25 @@ class GoalStructure(BaseModel):
 
     model_config = ConfigDict(extra='forbid')
 
+def analyze_goal(ctx: UserSessionContext, user_goal: str) -> str:
+    """Parse a free-text goal into the structured goal stored on the context."""
+    goal_data = plan_rules.parse_goal(user_goal)
+    ctx.goal = goal_data
+    return f"Goal analyzed and structured: {json.dumps(goal_data, indent=2)}"
+
+def plan_meals(ctx: UserSessionContext, dietary_preferences: str) -> str:
+    """Pick a 7-day meal plan from the catalog and store it on the context."""
+    ctx.diet_preferences = dietary_preferences
+    summary, meal_plan = plan_rules.meal_plan(dietary_preferences, ctx.injury_notes or "")
+    ctx.meal_plan = meal_plan
+    return f"{summary}:\n" + "\n".join(meal_plan)
+
+def recommend_workout(ctx: UserSessionContext, experience_level: str) -> str:
+    """Pick a workout plan from the catalog, honouring injury notes, and store it on the context."""
+    workout_plan = plan_rules.workout_plan(experience_level, ctx.injury_notes or "", ctx.diet_preferences or "")
+    ctx.workout_plan = workout_plan
+    return f"Workout plan for {experience_level} level:\n{json.dumps(workout_plan, indent=2)}"
+
 @function_tool(
     name_override="goal_analyzer_tool",
     description_override="Analyze user health goals and convert them into structured format."
@@ -68,47 +206,7 @@ async def goal_analyzer_tool(
     context: RunContextWrapper[UserSessionContext], 
     user_goal: str
 ) -> str:
-    # Analyze the user's actual goal input
-    goal_lower = user_goal.lower()
-    
-    # Extract goal components from user input
-    if "lose" in goal_lower or "weight loss" in goal_lower:
-        objective = "weight loss"
-    elif "gain" in goal_lower or "muscle" in goal_lower:
-        objective = "muscle gain"
-    elif "run" in goal_lower or "cardio" in goal_lower:
-        objective = "cardio fitness"
-    else:
-        objective = "general fitness"
-    
-    # Extract quantity and metric
-    import re
-    quantity_match = re.search(r'(\d+(?:\.\d+)?)\s*(kg|pounds|lbs|km|miles)', goal_lower)
-    if quantity_match:
-        quantity = float(quantity_match.group(1))
-        metric = quantity_match.group(2)
-    else:
-        quantity = 5.0
-        metric = "kg"
-    
-    # Extract duration
-    duration_match = re.search(r'(\d+)\s*(month|week|day)s?', goal_lower)
-    if duration_match:
-        duration_num = int(duration_match.group(1))
-        duration_unit = duration_match.group(2)
-        duration = f"{duration_num} {duration_unit}{'s' if duration_num > 1 else ''}"
-    else:
-        duration = "2 months"
-    
-    goal_data = {
-        "objective": objective,
-        "quantity": quantity,
-        "metric": metric, 
-        "duration": duration,
-        "priority": "high"
-    }
-    context.context.goal = goal_data
-    return f"Goal analyzed and structured: {json.dumps(goal_data, indent=2)}"
+    return analyze_goal(context.context, user_goal)
 
 @function_tool(
     name_override="meal_planner_tool",
@@ -118,63 +216,7 @@ async def meal_planner_tool(
     context: RunContextWrapper[UserSessionContext],
     dietary_preferences: str
 ) -> str:
-    context.context.diet_preferences = dietary_preferences
-    
-    # Create personalized meal plans based on dietary preferences
-    dietary_lower = dietary_preferences.lower()
-    
-    if "diabetic" in dietary_lower or "diabetes" in dietary_lower:
-        meal_plan = [
-            "Day 1: Steel-cut oatmeal with berries and almonds (low glycemic)",
-            "Day 2: Grilled chicken breast with quinoa and steamed broccoli",
-            "Day 3: Baked salmon with roasted vegetables and brown rice",
-            "Day 4: Lentil soup with whole grain bread and mixed greens",
-            "Day 5: Greek yogurt with honey and low-sugar granola",
-            "Day 6: Turkey and avocado sandwich on whole grain bread",
-            "Day 7: Vegetable stir-fry with brown rice and tofu"
-        ]
-        context.context.meal_plan = meal_plan
-        return f"7-day diabetic-friendly meal plan generated:\n" + "\n".join(meal_plan)
-    
-    elif "vegetarian" in dietary_lower:
-        meal_plan = [
-            "Day 1: Oatmeal with berries, nuts, and chia seeds",
-            "Day 2: Quinoa salad with chickpeas, vegetables, and tahini dressing",
-            "Day 3: Lentil curry with brown rice and steamed vegetables",
-            "Day 4: Vegetable soup with whole grain bread and mixed greens",
-            "Day 5: Greek yogurt with honey, granola, and fresh fruit",
-            "Day 6: Hummus and avocado sandwich on whole grain bread",
-            "Day 7: Vegetable stir-fry with tofu and brown rice"
-        ]
-        context.context.meal_plan = meal_plan
-        return f"7-day vegetarian meal plan generated:\n" + "\n".join(meal_plan)
-    
-    elif "keto" in dietary_lower or "low-carb" in dietary_lower:
-        meal_plan = [
-            "Day 1: Scrambled eggs with avocado and spinach",
-            "Day 2: Grilled chicken with cauliflower rice and broccoli",
-            "Day 3: Baked salmon with roasted asparagus",
-            "Day 4: Beef stir-fry with zucchini noodles",
-            "Day 5: Greek yogurt with berries and nuts",
-            "Day 6: Turkey and cheese roll-ups with cucumber",
-            "Day 7: Vegetable omelette with mushrooms and cheese"
-        ]
-        context.context.meal_plan = meal_plan
-        return f"7-day keto/low-carb meal plan generated:\n" + "\n".join(meal_plan)
-    
-    else:
-        # General balanced meal plan
-        meal_plan = [
-            "Day 1: Oatmeal with berries and nuts",
-            "Day 2: Grilled chicken salad with quinoa",
-            "Day 3: Salmon with steamed vegetables",
-            "Day 4: Lentil soup with whole grain bread",
-            "Day 5: Greek yogurt with honey and granola",
-            "Day 6: Turkey and avocado sandwich",
-            "Day 7: Vegetable stir-fry with brown rice"
-        ]
-        context.context.meal_plan = meal_plan
-        return f"7-day balanced meal plan generated for {dietary_preferences} diet:\n" + "\n".join(meal_plan)
+    return plan_meals(context.context, dietary_preferences)
 
 @function_tool(
     name_override="workout_recommender_tool",
@@ -184,94 +226,80 @@ async def workout_recommender_tool(
     context: RunContextWrapper[UserSessionContext],
     experience_level: str
 ) -> str:
-    # Consider injury notes when creating workout plan
-    injury_notes = context.context.injury_notes or ""
-    injury_lower = injury_notes.lower()
-    
-    # Check for knee pain or other injuries
-    if "knee" in injury_lower or "knee pain" in injury_lower:
-        workout_plan = {
-            "type": "low_impact_strength_training",
-            "frequency": "3 times per week",
-            "duration": "45 minutes",
-            "notes": "Knee-friendly exercises focusing on upper body and core",
-            "exercises": [
-                "Seated shoulder press: 3 sets x 12 reps",
-                "Bicep curls: 3 sets x 12 reps",
-                "Tricep dips: 3 sets x 10 reps",
-                "Planks: 3 sets x 30 seconds",
-                "Seated leg extensions: 3 sets x 15 reps",
-                "Straight-leg raises: 3 sets x 12 reps each leg",
-                "Swimming or cycling (low-impact cardio): 20 minutes"
-            ],
-            "avoid": ["Squats", "Lunges", "Jumping exercises", "High-impact cardio"]
-        }
-    elif "back" in injury_lower or "back pain" in injury_lower:
-        workout_plan = {
-            "type": "core_focused_strength_training",
-            "frequency": "3 times per week",
-            "duration": "40 minutes",
-            "notes": "Back-friendly exercises with focus on core stability",
-            "exercises": [
-                "Bird dogs: 3 sets x 10 reps each side",
-                "Cat-cow stretches: 3 sets x 10 reps",
-                "Pelvic tilts: 3 sets x 15 reps",
-                "Wall push-ups: 3 sets x 12 reps",
-                "Seated rows: 3 sets x 12 reps",
-                "Gentle walking: 20 minutes",
-                "Yoga or stretching: 15 minutes"
-            ],
-            "avoid": ["Heavy lifting", "Twisting movements", "High-impact exercises"]
-        }
-    else:
-        # Standard workout based on experience level
-        if "beginner" in experience_level.lower():
-            workout_plan = {
-                "type": "beginner_strength_training",
-                "frequency": "3 times per week",
-                "duration": "30 minutes",
-                "notes": "Beginner-friendly exercises with proper form focus",
-                "exercises": [
-                    "Bodyweight squats: 3 sets x 10 reps",
-                    "Wall push-ups: 3 sets x 8 reps",
-                    "Planks: 3 sets x 20 seconds",
-                    "Walking: 20 minutes",
-                    "Stretching: 10 minutes"
-                ]
-            }
-        elif "advanced" in experience_level.lower():
-            workout_plan = {
-                "type": "advanced_strength_training",
-                "frequency": "4 times per week",
-                "duration": "60 minutes",
-                "notes": "Advanced exercises with progressive overload",
-                "exercises": [
-                    "Barbell squats: 4 sets x 8 reps",
-                    "Bench press: 4 sets x 8 reps",
-                    "Deadlifts: 3 sets x 6 reps",
-                    "Pull-ups: 3 sets x 8 reps",
-                    "Planks: 3 sets x 60 seconds",
-                    "Cardio intervals: 20 minutes"
-                ]
-            }
-        else:
-            # Intermediate level
-            workout_plan = {
-                "type": "intermediate_strength_training",
-                "frequency": "3 times per week",
-                "duration": "45 minutes",
-                "notes": "Balanced strength and cardio program",
-                "exercises": [
-                    "Squats: 3 sets x 12 reps",
-                    "Push-ups: 3 sets x 10 reps",
-                    "Planks: 3 sets x 30 seconds",
-                    "Lunges: 3 sets x 10 reps each leg",
-                    "Moderate cardio: 25 minutes"
-                ]
-            }
-    
-    context.context.workout_plan = workout_plan
-    return f"Workout plan for {experience_level} level:\n{json.dumps(workout_plan, indent=2)}"
+    return recommend_workout(context.context, experience_level)
+
+def _record_progress(ctx: UserSessionContext, kind: str, value: float, note: str = "") -> None:
+    """Keep a progress record in the context's recent window; it is stored when the turn is saved."""
+    ctx.record_progress(ProgressRecord(int(time.time()), kind, float(value), note))
+
+def schedule_checkin(ctx: UserSessionContext) -> str:
+    """Schedule this conversation's weekly progress check-in (once the turn is saved) and record it on the context."""
+    next_checkin = datetime.now() + timedelta(days=7)
+    ctx.queue_checkin(CheckinChange("schedule", int(next_checkin.timestamp())))
+    _record_progress(
+        ctx, "checkin_scheduled", next_checkin.timestamp(), note=f"next check-in {next_checkin.isoformat()}"
+    )
+    return f"Progress check-in scheduled for {next_checkin.strftime('%Y-%m-%d')}"
+
+def _user_checkin(checkin_id: str) -> Optional[Checkin]:
+    checkin = checkin_store.get(checkin_id)
+    return checkin if checkin is not None and checkin.conversation_id == current_conversation.get() else None
+
+def list_checkins(ctx: UserSessionContext) -> str:
+    """Describe the check-ins scheduled for this conversation."""
+    conversation_id = current_conversation.get()
+    checkins = checkin_store.for_conversation(conversation_id) if conversation_id is not None else []
+    if not checkins:
+        return "No check-ins are scheduled."
+    lines = []
+    for c in checkins:
+        when = datetime.fromtimestamp(c.due_at).strftime("%Y-%m-%d %H:%M")
+        repeat = f"every {c.interval // 86400} days" if c.interval else "once"
+        lines.append(f"{c.id}: next on {when}, {repeat}")
+    return "\n".join(lines)
+
+def reschedule_checkin(ctx: UserSessionContext, checkin_id: str, days_from_now: int) -> str:
+    """Move one of the user's check-ins to ``days_from_now`` days from now."""
+    if _user_checkin(checkin_id) is None:
+        return f"No check-in {checkin_id} found."
+    due = datetime.now() + timedelta(days=days_from_now)
+    ctx.queue_checkin(CheckinChange("reschedule", int(due.timestamp()), checkin_id))
+    return f"Check-in {checkin_id} moved to {due.strftime('%Y-%m-%d')}"
+
+def cancel_checkin(ctx: UserSessionContext, checkin_id: str) -> str:
+    """Cancel one of the user's check-ins."""
+    if _user_checkin(checkin_id) is None:
+        return f"No check-in {checkin_id} found."
+    ctx.queue_checkin(CheckinChange("cancel", checkin_id=checkin_id))
+    return f"Check-in {checkin_id} cancelled."
+
+def track_progress(ctx: UserSessionContext, progress_update: str, metric_value: float) -> str:
+    """Append a progress update to the context."""
+    _record_progress(ctx, "progress", metric_value, note=progress_update)
+    return f"Progress logged: {progress_update} - Value: {metric_value}"
+
+def summarize_progress(ctx: UserSessionContext) -> str:
+    """Describe weekly averages and the overall trend of logged progress."""
+    conversation_id = current_conversation.get()
+    if conversation_id is None:
+        return "No progress has been logged yet."
+    summary = progress_store.summary(conversation_id)
+    if not summary["count"]:
+        return "No progress has been logged yet."
+    lines = [f"{summary['count']} progress entries logged."]
+    for week in summary["weekly_averages"][-8:]:
+        week_start = datetime.fromtimestamp(week["week_start"]).strftime("%Y-%m-%d")
+        lines.append(f"Week of {week_start}: average {week['average']:g} over {week['count']} entries")
+    if summary["trend_per_week"] is not None:
+        lines.append(f"Trend: {summary['trend_per_week']:+.2f} per week")
+    return "\n".join(lines)
+
+def set_name(ctx: UserSessionContext, name: str) -> str:
+    """Store the user's name unless it is actually a greeting."""
+    if is_greeting(name):
+        return "I'm here to help you! Could you please tell me your actual name so I can personalize your experience?"
+    ctx.name = name
+    return f"Name set to {name}."
 
 @function_tool(
     name_override="checkin_scheduler_tool",
@@ -280,14 +308,37 @@ async def workout_recommender_tool(
 async def checkin_scheduler_tool(
     context: RunContextWrapper[UserSessionContext]
 ) -> str:
-    next_checkin = datetime.now() + timedelta(days=7)
-    log_entry = {
-        "date": datetime.now().isoformat(),
-        "type": "checkin_scheduled",
-        "next_checkin": next_checkin.isoformat()
-    }
-    context.context.progress_logs.append(log_entry)
-    return f"Progress check-in scheduled for {next_checkin.strftime('%Y-%m-%d')}"
+    return schedule_checkin(context.context)
+
+@function_tool(
+    name_override="list_checkins_tool",
+    description_override="List the user's scheduled progress check-ins with their ids."
+)
+async def list_checkins_tool(
+    context: RunContextWrapper[UserSessionContext]
+) -> str:
+    return list_checkins(context.context)
+
+@function_tool(
+    name_override="reschedule_checkin_tool",
+    description_override="Move a scheduled check-in (by id) to a number of days from now."
+)
+async def reschedule_checkin_tool(
+    context: RunContextWrapper[UserSessionContext],
+    checkin_id: str,
+    days_from_now: int
+) -> str:
+    return reschedule_checkin(context.context, checkin_id, days_from_now)
+
+@function_tool(
+    name_override="cancel_checkin_tool",
+    description_override="Cancel a scheduled check-in by id."
+)
+async def cancel_checkin_tool(
+    context: RunContextWrapper[UserSessionContext],
+    checkin_id: str
+) -> str:
+    return cancel_checkin(context.context, checkin_id)
 
 @function_tool(
     name_override="progress_tracker_tool",
@@ -298,13 +349,16 @@ async def progress_tracker_tool(
     progress_update: str,
     metric_value: float
 ) -> str:
-    log_entry = {
-        "date": datetime.now().isoformat(),
-        "update": progress_update,
-        "metric_value": metric_value
-    }
-    context.context.progress_logs.append(log_entry)
-    return f"Progress logged: {progress_update} - Value: {metric_value}"
+    return track_progress(context.context, progress_update, metric_value)
+
+@function_tool(
+    name_override="progress_summary_tool",
+    description_override="Summarize logged progress as weekly averages and an overall trend."
+)
+async def progress_summary_tool(
+    context: RunContextWrapper[UserSessionContext]
+) -> str:
+    return summarize_progress(context.context)
 
 @function_tool(
     name_override="set_user_name",
@@ -314,32 +368,24 @@ async def set_user_name(
     context: RunContextWrapper[UserSessionContext],
     name: str
 ) -> str:
-    greetings = [
-        "hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening",
-        "hy", "hii", "helo", "hey there"
-    ]
-    name_clean = name.strip().lower()
-    if name_clean in greetings or any(name_clean.startswith(g) for g in greetings):
-        return "I'm here to help you! Could you please tell me your actual name so I can personalize your experience?"
-    context.context.name = name
-    return f"Name set to {name}."
+    return set_name(context.context, name)
 
 # =========================
 # HOOKS
 # =========================
 
 async def on_nutrition_expert_handoff(context: RunContextWrapper[UserSessionContext]) -> None:
-    context.context.handoff_logs.append(f"Handed off to Nutrition Expert at {datetime.now().isoformat()}")
+    context.context.log_handoff(f"Handed off to Nutrition Expert at {datetime.now().isoformat()}")
     if not context.context.diet_preferences:
         context.context.diet_preferences = "general"
 
 async def on_injury_support_handoff(context: RunContextWrapper[UserSessionContext]) -> None:
-    context.context.handoff_logs.append(f"Handed off to Injury Support at {datetime.now().isoformat()}")
+    context.context.log_handoff(f"Handed off to Injury Support at {datetime.now().isoformat()}")
     if not context.context.injury_notes:
         context.context.injury_notes = "No specific injury noted"
 
 async def on_escalation_handoff(context: RunContextWrapper[UserSessionContext]) -> None:
-    context.context.handoff_logs.append(f"Escalated to human coach at {datetime.now().isoformat()}")
+    context.context.log_handoff(f"Escalated to human coach at {datetime.now().isoformat()}")
 
 # =========================
 # GUARDRAILS
@@ -370,12 +416,32 @@ goal_validation_agent = Agent(
     output_type=GoalValidationOutput,
 )
 
-@input_guardrail(name="Goal Validation Guardrail")
+def _last_user_message(input: str | list[TResponseInputItem]) -> str:
+    """Extract the text of the latest user message from guardrail input."""
+    if isinstance(input, str):
+        return input
+    if input and isinstance(input[-1], dict):
+        content = input[-1].get("content", "")
+        if isinstance(content, list):
+            return " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        return str(content)
+    return ""
+
+@input_guardrail(name="Goal Validation Guardrail", run_in_parallel=True)
 async def goal_validation_guardrail(
     context: RunContextWrapper[None], agent: Agent, input: str | list[TResponseInputItem]
 ) -> GuardrailFunctionOutput:
-    result = await Runner.run(goal_validation_agent, input, context=context.context)
-    final = result.final_output_as(GoalValidationOutput)
+    message = _last_user_message(input)
+    if not looks_like_goal(message):
+        return GuardrailFunctionOutput(
+            output_info=GoalValidationOutput(reasoning="No goal stated, validation skipped.", is_valid=False),
+            tripwire_triggered=False
+        )
+    final, embedding = await verdict_cache.get("goal_validation", message)
+    if final is None:
+        result = await Runner.run(goal_validation_agent, input, context=context.context, hooks=usage_hooks)
+        final = result.final_output_as(GoalValidationOutput)
+        await verdict_cache.put("goal_validation", message, final, embedding)
     # Do NOT tripwire, just provide info
     return GuardrailFunctionOutput(output_info=final, tripwire_triggered=False)
 
@@ -389,30 +455,25 @@ health_relevance_agent = Agent(
     output_type=HealthRelevanceOutput,
 )
 
-@input_guardrail(name="Health Relevance Guardrail")
+@input_guardrail(name="Health Relevance Guardrail", run_in_parallel=True)
 async def health_relevance_guardrail(
     context: RunContextWrapper[None], agent: Agent, input: str | list[TResponseInputItem]
 ) -> GuardrailFunctionOutput:
-    user_message = input if isinstance(input, str) else (input[-1]['content'] if input and isinstance(input[-1], dict) else "")
-    greetings = [
-        "hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening",
-        "hy", "hii", "helo", "hey there"
-    ]
-    onboarding_phrases = [
-        "my name is", "i am", "call me", "it's", "im ", "i’m "
-    ]
-    user_message_clean = user_message.strip().lower()
-    if (
-        any(user_message_clean.startswith(g) for g in greetings)
-        or any(user_message_clean.startswith(p) for p in onboarding_phrases)
-    ):
+    # Settle greetings, acknowledgements and clear-cut topics locally
+    message = _last_user_message(input)
+    verdict = classify_relevance(message)
+    if verdict is not None:
+        is_relevant, reasoning = verdict
         return GuardrailFunctionOutput(
-            output_info=HealthRelevanceOutput(reasoning="Greeting or onboarding message, always allowed.", is_relevant=True),
-            tripwire_triggered=False
+            output_info=HealthRelevanceOutput(reasoning=reasoning, is_relevant=is_relevant),
+            tripwire_triggered=not is_relevant
         )
-    # Otherwise, run the normal relevance check
-    result = await Runner.run(health_relevance_agent, input, context=context.context)
-    final = result.final_output_as(HealthRelevanceOutput)
+    # Otherwise, reuse a cached verdict or run the normal relevance check
+    final, embedding = await verdict_cache.get("health_relevance", message)
+    if final is None:
+        result = await Runner.run(health_relevance_agent, input, context=context.context, hooks=usage_hooks)
+        final = result.final_output_as(HealthRelevanceOutput)
+        await verdict_cache.put("health_relevance", message, final, embedding)
     return GuardrailFunctionOutput(output_info=final, tripwire_triggered=not final.is_relevant)
 
 # =========================
@@ -425,39 +486,53 @@ async def health_relevance_guardrail(
 # AGENTS
 # =========================
 
-# Handlers for handoffs
-async def on_nutrition_expert_handoff(context: RunContextWrapper[UserSessionContext]):
-    context.context.handoff_logs.append(f"Handed off to Nutrition Expert at {datetime.now().isoformat()}")
-    if not context.context.diet_preferences:
-        context.context.diet_preferences = "general"
+def memoized_instructions(*fields: str):
+    """Cache an instructions function on the session context until one of ``fields`` changes."""
 
-async def on_injury_support_handoff(context: RunContextWrapper[UserSessionContext]):
-    context.context.handoff_logs.append(f"Handed off to Injury Support at {datetime.now().isoformat()}")
-    if not context.context.injury_notes:
-        context.context.injury_notes = "No specific injury noted"
+    def decorator(fn: Callable[[RunContextWrapper[UserSessionContext], Agent[UserSessionContext]], str]):
+        @functools.wraps(fn)
+        def wrapper(run_context: RunContextWrapper[UserSessionContext], agent: Agent[UserSessionContext]) -> str:
+            return run_context.context.memoized(fn.__name__, fields, fn, run_context, agent)
+
+        return wrapper
+
+    return decorator
+
+# Scripted onboarding questions; fast_path.py answers greetings with them without calling the model
+WELCOME_PROMPT = "Welcome! What's your name?"
+GOAL_PROMPT = "What is your main fitness or health goal? (e.g., lose 5kg in 2 months, run a 5k, build muscle, etc.)"
 
-async def on_escalation_handoff(context: RunContextWrapper[UserSessionContext]):
-    context.context.handoff_logs.append(f"Escalated to human coach at {datetime.now().isoformat()}")
+# Static instructions come first and the per-user context last, so the shared
+# prefix stays byte-identical across users and the provider's prompt cache can hit.
+MAIN_PLANNER_PROMPT = f"""{RECOMMENDED_PROMPT_PREFIX}
+You are a Health & Wellness Planner Agent.
 
-def main_planner_instructions(run_context: RunContextWrapper[UserSessionContext], agent: Agent[UserSessionContext], last_user_message: str = None) -> str:
+Your role is to:
+1. Help users set and achieve health goals
+2. Provide personalized meal and workout plans
+3. Consider dietary restrictions and injuries
+4. Track progress and provide motivation
+5. Hand off to specialized agents when needed
+
+
+When a user mentions:
+- Dietary restrictions (diabetic, vegetarian, etc.) → Use meal_planner_tool
+- Injuries or pain → Consider injury_support_agent handoff
+- Complex nutrition needs → Consider nutrition_expert_agent handoff
+- Need for human trainer → Consider escalation_agent handoff
+
+Always maintain context continuity and provide personalized responses based on the user's specific situation.
+"""
+
+@memoized_instructions("name", "goal", "diet_preferences", "injury_notes", "workout_plan", "meal_plan")
+def main_planner_instructions(run_context: RunContextWrapper[UserSessionContext], agent: Agent[UserSessionContext]) -> str:
     ctx = run_context.context
-    greetings = [
-        "hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening",
-        "hy", "hii", "helo", "hey there"
-    ]
-    if not ctx.name and last_user_message and any(last_user_message.strip().lower().startswith(g) for g in greetings):
-        return (
-            "Hello! I'm your Health & Wellness Planner Agent. "
-            "I'll help you set and achieve your health and fitness goals. "
-            "Let's get started! What's your name?"
-        )
     if not ctx.name:
-        return "Welcome! What's your name?"
+        return WELCOME_PROMPT
     if not ctx.goal:
-        return f"Hi {ctx.name}! What is your main fitness or health goal? (e.g., lose 5kg in 2 months, run a 5k, build muscle, etc.)"
+        return f"Hi {ctx.name}! {GOAL_PROMPT}"
     # Build comprehensive context information
-    name = ctx.name or "User"
-    context_info = []
+    context_info = [f"User: {ctx.name}"]
     
     if ctx.goal:
         goal_info = f"Goal: {ctx.goal.get('objective', 'unknown')} - {ctx.goal.get('quantity', 0)} {ctx.goal.get('metric', 'units')} in {ctx.goal.get('duration', 'unknown time')}"
@@ -475,29 +550,11 @@ def main_planner_instructions(run_context: RunContextWrapper[UserSessionContext]
     if ctx.meal_plan:
         context_info.append(f"Meal plan: {len(ctx.meal_plan)} days planned")
     
-    context_summary = "\n".join(context_info) if context_info else "No specific context set yet"
+    context_summary = "\n".join(context_info)
     
-    return f"""{RECOMMENDED_PROMPT_PREFIX}
-You are a Health & Wellness Planner Agent for {name}.
-
+    return f"""{MAIN_PLANNER_PROMPT}
 Current Context:
 {context_summary}
-
-Your role is to:
-1. Help users set and achieve health goals
-2. Provide personalized meal and workout plans
-3. Consider dietary restrictions and injuries
-4. Track progress and provide motivation
-5. Hand off to specialized agents when needed
-
-
-When a user mentions:
-- Dietary restrictions (diabetic, vegetarian, etc.) → Use meal_planner_tool
-- Injuries or pain → Consider injury_support_agent handoff
-- Complex nutrition needs → Consider nutrition_expert_agent handoff
-- Need for human trainer → Consider escalation_agent handoff
-
-Always maintain context continuity and provide personalized responses based on the user's specific situation.
 """
 
 main_planner_agent = Agent[UserSessionContext](
@@ -505,21 +562,30 @@ main_planner_agent = Agent[UserSessionContext](
     model="gpt-4o",
     handoff_description="Helps users with goal setting, meal plans, workouts, and tracking.",
     instructions=main_planner_instructions,
-    tools=[set_user_name, goal_analyzer_tool,checkin_scheduler_tool, progress_tracker_tool],
+    tools=[
+        set_user_name, goal_analyzer_tool, checkin_scheduler_tool, list_checkins_tool, reschedule_checkin_tool,
+        cancel_checkin_tool, progress_tracker_tool, progress_summary_tool,
+    ],
     input_guardrails=[goal_validation_guardrail, health_relevance_guardrail],
 )
 
+@memoized_instructions("diet_preferences")
 def nutrition_expert_instructions(run_context: RunContextWrapper[UserSessionContext], agent: Agent[UserSessionContext]) -> str:
     ctx = run_context.context
-    return f"{RECOMMENDED_PROMPT_PREFIX}\nYou are a Nutrition Expert helping with dietary plans for {ctx.diet_preferences or 'general'} needs."
+    return (
+        f"{RECOMMENDED_PROMPT_PREFIX}\nYou are a Nutrition Expert helping with dietary plans.\n\n"
+        f"Dietary preferences: {ctx.diet_preferences or 'general'}"
+    )
 
+@memoized_instructions("injury_notes")
 def injury_support_instructions(run_context: RunContextWrapper[UserSessionContext], agent: Agent[UserSessionContext]) -> str:
     ctx = run_context.context
-    return f"{RECOMMENDED_PROMPT_PREFIX}\nYou are an Injury Support Agent. Notes: {ctx.injury_notes or 'none'}"
+    return f"{RECOMMENDED_PROMPT_PREFIX}\nYou are an Injury Support Agent.\n\nNotes: {ctx.injury_notes or 'none'}"
 
+@memoized_instructions("name")
 def escalation_agent_instructions(run_context: RunContextWrapper[UserSessionContext], agent: Agent[UserSessionContext]) -> str:
     ctx = run_context.context
-    return f"{RECOMMENDED_PROMPT_PREFIX}\nYou handle escalations to human trainers for {ctx.name}."
+    return f"{RECOMMENDED_PROMPT_PREFIX}\nYou handle escalations to human trainers.\n\nUser: {ctx.name}"
 
 nutrition_expert_agent = Agent[UserSessionContext](
     name="Nutrition Expert Agent",
@@ -548,12 +614,25 @@ escalation_agent = Agent[UserSessionContext](
     input_guardrails=[health_relevance_guardrail],
 )
 
+# Every handoff goes through the registry so its hook reports the route; see handoffs.py
 main_planner_agent.handoffs = [
-    handoff(agent=nutrition_expert_agent, on_handoff=on_nutrition_expert_handoff),
-    handoff(agent=injury_support_agent, on_handoff=on_injury_support_handoff),
-    handoff(agent=escalation_agent, on_handoff=on_escalation_handoff),
+    handoff_registry.register(main_planner_agent, nutrition_expert_agent, on_nutrition_expert_handoff),
+    handoff_registry.register(main_planner_agent, injury_support_agent, on_injury_support_handoff),
+    handoff_registry.register(main_planner_agent, escalation_agent, on_escalation_handoff),
 ]
 
-nutrition_expert_agent.handoffs = [main_planner_agent]
-injury_support_agent.handoffs = [main_planner_agent]
-escalation_agent.handoffs = [main_planner_agent]
+for specialist in (nutrition_expert_agent, injury_support_agent, escalation_agent):
+    specialist.handoffs = [handoff_registry.register(specialist, main_planner_agent)]
+
+# One pooled client for every agent and guardrail agent; see provider.py
+configure_openai([
+    main_planner_agent,
+    nutrition_expert_agent,
+    injury_support_agent,
+    escalation_agent,
+    goal_validation_agent,
+    health_relevance_agent,
+])
+
+# Easy turns go to a cheaper model; see routing.py
+configure_routing([main_planner_agent, nutrition_expert_agent, injury_support_agent, escalation_agent])
@@ -0,0 +1,68 @@
+from __future__ import annotations as _annotations
+
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+from fast_path import FastPathResult, ToolStep
+from main import UserSessionContext, analyze_goal, plan_meals, recommend_workout, set_name
+
+# =========================
+# PROFILE
+# =========================
+
+class OnboardingProfile(BaseModel):
+    """Everything the planner's onboarding dialogue would ask for, sent up front."""
+    name: str = Field(min_length=1, max_length=60)
+    goal: str = Field(min_length=1, max_length=500)
+    diet: Optional[str] = Field(default=None, max_length=200)
+    injuries: Optional[str] = Field(default=None, max_length=500)
+    experience: str = Field(default="beginner", max_length=60)
+
+    def to_message(self) -> str:
+        """The profile as the user message recorded in the transcript."""
+        parts = [f"My name is {self.name}.", f"My goal: {self.goal}."]
+        if self.diet:
+            parts.append(f"Diet: {self.diet}.")
+        if self.injuries:
+            parts.append(f"Injuries: {self.injuries}.")
+        parts.append(f"Experience: {self.experience}.")
+        return " ".join(parts)
+
+# =========================
+# PIPELINE
+# =========================
+
+def _reply(ctx: UserSessionContext) -> str:
+    goal = ctx.goal or {}
+    workout = (ctx.workout_plan or {}).get("type", "workout").replace("_", " ")
+    reply = (
+        f"Welcome, {ctx.name or 'there'}! I've set your goal: {goal.get('objective')} - "
+        f"{goal.get('quantity', 0):g} {goal.get('metric')} in {goal.get('duration')}. "
+        f"Your {len(ctx.meal_plan or [])}-day meal plan and {workout} plan are ready."
+    )
+    if ctx.injury_notes:
+        reply += " The workout plan works around your injury; tell me if anything hurts."
+    return reply + " Would you like me to schedule weekly check-ins?"
+
+def run_onboarding(profile: OnboardingProfile, state: Dict[str, Any]) -> FastPathResult:
+    """Fill the session context from ``profile`` with the planner's own tools, without calling the model.
+
+    Runs set_user_name, goal_analyzer_tool, meal_planner_tool and
+    workout_recommender_tool in the order the dialogue would, so the first
+    response already carries a meal and a workout plan.
+    """
+    ctx: UserSessionContext = state["context"]
+    steps = [ToolStep("set_user_name", {"name": profile.name}, set_name(ctx, profile.name))]
+    if profile.injuries:
+        # Recorded first so both plans account for it
+        ctx.injury_notes = profile.injuries
+    steps.append(ToolStep("goal_analyzer_tool", {"user_goal": profile.goal}, analyze_goal(ctx, profile.goal)))
+    diet = profile.diet or "general"
+    steps.append(ToolStep("meal_planner_tool", {"dietary_preferences": diet}, plan_meals(ctx, diet)))
+    steps.append(ToolStep(
+        "workout_recommender_tool",
+        {"experience_level": profile.experience},
+        recommend_workout(ctx, profile.experience),
+    ))
+    return FastPathResult(reply=_reply(ctx), agent=state["current_agent"], steps=steps)
@@ -0,0 +1,234 @@
+from __future__ import annotations as _annotations
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+# =========================
+# Records
+# =========================
+
+@dataclass(slots=True, frozen=True)
+class ProgressRecord:
+    ts: int
+    kind: str
+    value: float
+    note: str = ""
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"ts": self.ts, "kind": self.kind, "value": self.value, "note": self.note}
+
+def _kind(kind: str) -> str:
+    # A handful of kinds repeat across millions of records; share one string object each
+    return sys.intern(kind)
+
+def _trend(records: List[ProgressRecord]) -> Optional[float]:
+    """Least-squares slope of value over time, in units per week."""
+    if len(records) < 2:
+        return None
+    n = len(records)
+    mean_t = sum(r.ts for r in records) / n
+    mean_v = sum(r.value for r in records) / n
+    var_t = sum((r.ts - mean_t) ** 2 for r in records)
+    if var_t == 0:
+        return None
+    cov = sum((r.ts - mean_t) * (r.value - mean_v) for r in records)
+    return cov / var_t * WEEK_SECONDS
+
+# =========================
+# Stores
+# =========================
+
+class ProgressStore:
+    """Per-conversation progress time series with range queries and aggregates.
+
+    Series are keyed by conversation id, which is random, rather than by the
+    6-digit ``uid``: that can be guessed and two users can draw the same one.
+    """
+
+    def add(self, conversation_id: str, kind: str, value: float, note: str = "", ts: Optional[int] = None) -> ProgressRecord:
+        raise NotImplementedError
+
+    def extend(self, conversation_id: str, records: List[ProgressRecord]) -> None:
+        """Store records made during a turn, once the turn has been saved."""
+        for record in records:
+            self.add(conversation_id, record.kind, record.value, record.note, ts=record.ts)
+
+    def range(
+        self, conversation_id: str, start: Optional[int] = None, end: Optional[int] = None, kind: Optional[str] = None
+    ) -> List[ProgressRecord]:
+        """Records for a conversation with start <= ts <= end, oldest first."""
+        raise NotImplementedError
+
+    def weekly_averages(
+        self, conversation_id: str, kind: str = "progress", start: Optional[int] = None, end: Optional[int] = None
+    ) -> List[Tuple[int, float, int]]:
+        """Downsample to (week start ts, average value, count) buckets."""
+        buckets: Dict[int, List[float]] = defaultdict(list)
+        for r in self.range(conversation_id, start, end, kind):
+            buckets[r.ts - r.ts % WEEK_SECONDS].append(r.value)
+        return [(week, sum(values) / len(values), len(values)) for week, values in sorted(buckets.items())]
+
+    def trend(self, conversation_id: str, kind: str = "progress", start: Optional[int] = None) -> Optional[float]:
+        """Trend slope in value units per week, or None with fewer than two points."""
+        return _trend(self.range(conversation_id, start, None, kind))
+
+    def summary(self, conversation_id: str, kind: str = "progress") -> Dict[str, object]:
+        records = self.range(conversation_id, kind=kind)
+        return {
+            "count": len(records),
+            "latest": records[-1].to_dict() if records else None,
+            "trend_per_week": _trend(records),
+            "weekly_averages": [
+                {"week_start": week, "average": avg, "count": count}
+                for week, avg, count in self.weekly_averages(conversation_id, kind)
+            ],
+        }
+
+class InMemoryProgressStore(ProgressStore):
+    """Process-local store; each conversation's records are kept sorted by timestamp."""
+
+    def __init__(self):
+        self._timestamps: Dict[str, List[int]] = defaultdict(list)
+        self._records: Dict[str, List[ProgressRecord]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, conversation_id: str, kind: str, value: float, note: str = "", ts: Optional[int] = None) -> ProgressRecord:
+        record = ProgressRecord(int(ts if ts is not None else time.time()), _kind(kind), float(value), note)
+        with self._lock:
+            timestamps = self._timestamps[conversation_id]
+            idx = bisect_right(timestamps, record.ts)
+            timestamps.insert(idx, record.ts)
+            self._records[conversation_id].insert(idx, record)
+        return record
+
+    def range(
+        self, conversation_id: str, start: Optional[int] = None, end: Optional[int] = None, kind: Optional[str] = None
+    ) -> List[ProgressRecord]:
+        with self._lock:
+            timestamps = self._timestamps.get(conversation_id)
+            if not timestamps:
+                return []
+            lo = bisect_left(timestamps, start) if start is not None else 0
+            hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+            records = self._records[conversation_id][lo:hi]
+        if kind is not None:
+            records = [r for r in records if r.kind == kind]
+        return records
+
+class SQLiteProgressStore(ProgressStore):
+    """SQLite (WAL mode) store indexed by (conversation_id, ts)."""
+
+    def __init__(self, path: str = "progress.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Rows in the older uid-keyed "progress" table can't be attributed safely and are not read
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_progress ("
+            "conversation_id TEXT NOT NULL, ts INTEGER NOT NULL, kind TEXT NOT NULL, "
+            "value REAL NOT NULL, note TEXT NOT NULL DEFAULT '')"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS conversation_progress_ts ON conversation_progress(conversation_id, ts)"
+        )
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared across fork(); each process opens its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = self._connect()
+        return self._connection
+
+    def add(self, conversation_id: str, kind: str, value: float, note: str = "", ts: Optional[int] = None) -> ProgressRecord:
+        record = ProgressRecord(int(ts if ts is not None else time.time()), _kind(kind), float(value), note)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO conversation_progress (conversation_id, ts, kind, value, note) VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, record.ts, record.kind, record.value, record.note),
+            )
+        return record
+
+    def extend(self, conversation_id: str, records: List[ProgressRecord]) -> None:
+        if not records:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO conversation_progress (conversation_id, ts, kind, value, note) VALUES (?, ?, ?, ?, ?)",
+                [(conversation_id, r.ts, r.kind, r.value, r.note) for r in records],
+            )
+
+    def _where(self, conversation_id: str, start: Optional[int], end: Optional[int], kind: Optional[str]):
+        clauses, params = ["conversation_id = ?"], [conversation_id]
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(end)
+        if kind is not None:
+            clauses.append("kind = ?")
+            params.append(kind)
+        return " AND ".join(clauses), params
+
+    def range(
+        self, conversation_id: str, start: Optional[int] = None, end: Optional[int] = None, kind: Optional[str] = None
+    ) -> List[ProgressRecord]:
+        where, params = self._where(conversation_id, start, end, kind)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT ts, kind, value, note FROM conversation_progress WHERE {where} ORDER BY ts", params
+            ).fetchall()
+        return [ProgressRecord(ts, _kind(k), value, note) for ts, k, value, note in rows]
+
+    def weekly_averages(
+        self, conversation_id: str, kind: str = "progress", start: Optional[int] = None, end: Optional[int] = None
+    ) -> List[Tuple[int, float, int]]:
+        where, params = self._where(conversation_id, start, end, kind)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT ts - ts % {WEEK_SECONDS} AS week, AVG(value), COUNT(*) FROM conversation_progress "
+                f"WHERE {where} GROUP BY week ORDER BY week",
+                params,
+            ).fetchall()
+        return [(int(week), float(avg), int(count)) for week, avg, count in rows]
+
+# =========================
+# Configuration
+# =========================
+
+# Most recent progress entries kept inline on UserSessionContext.progress_logs
+PROGRESS_WINDOW = int(os.getenv("PROGRESS_WINDOW", 20))
+
+def create_progress_store() -> ProgressStore:
+    """Build the progress store selected by PROGRESS_STORE (memory or sqlite)."""
+    backend = os.getenv("PROGRESS_STORE", "memory").lower()
+    if backend == "sqlite":
+        store: ProgressStore = SQLiteProgressStore(os.getenv("PROGRESS_STORE_URL", "progress.db"))
+    elif backend == "memory":
+        store = InMemoryProgressStore()
+    else:
+        raise ValueError(f"Unknown PROGRESS_STORE backend: {backend}")
+    logger.info("Using %s progress store", type(store).__name__)
+    return store
+
+progress_store = create_progress_store()
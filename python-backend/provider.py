@@ -0,0 +1,143 @@
+from __future__ import annotations as _annotations
+
+import logging
+import os
+import threading
+from typing import Any, Iterable, Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from agents import Agent, Model, OpenAIProvider, set_default_openai_api, set_default_openai_client
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+#
+# OPENAI_API_MODE: ``responses`` (default) or ``chat_completions``.
+# OPENAI_BASE_URL: point every agent at a compatible endpoint (proxy, local stand-in).
+# OPENAI_TIMEOUT / OPENAI_CONNECT_TIMEOUT: request and connect timeouts, seconds.
+# OPENAI_MAX_RETRIES: retries with exponential backoff on 408/409/429/5xx and connection errors.
+# OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE: connection pool bounds per process.
+# OPENAI_KEEPALIVE_EXPIRY: seconds an idle pooled connection is kept open.
+# OPENAI_HTTP2: set to ``1`` to negotiate HTTP/2 (needs the ``h2`` package).
+
+OPENAI_API_MODE = os.getenv("OPENAI_API_MODE", "responses")
+
+# Set by configure_openai(); the client itself is built on first use (see _shared_provider)
+_configured = False
+_client: Optional[AsyncOpenAI] = None
+_provider: Optional[OpenAIProvider] = None
+_lock = threading.Lock()
+
+def _http2_enabled() -> bool:
+    if os.getenv("OPENAI_HTTP2", "0") != "1":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("OPENAI_HTTP2=1 but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+def create_openai_client() -> Optional[AsyncOpenAI]:
+    """Build an AsyncOpenAI client over one tuned, pooled httpx client.
+
+    Returns ``None`` when neither OPENAI_API_KEY nor OPENAI_BASE_URL is set,
+    leaving the SDK defaults (which fail on first use) in place.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    if not api_key and not base_url:
+        logger.warning("OPENAI_API_KEY is not set; model calls will fail")
+        return None
+
+    timeout = httpx.Timeout(
+        float(os.getenv("OPENAI_TIMEOUT", 60)),
+        connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5)),
+    )
+    http_client = DefaultAsyncHttpxClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 60)),
+        ),
+        http2=_http2_enabled(),
+    )
+    return AsyncOpenAI(
+        # A local stand-in usually doesn't check the key, but the client requires one
+        api_key=api_key or "unused",
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=int(os.getenv("OPENAI_MAX_RETRIES", 2)),
+        http_client=http_client,
+    )
+
+def _shared_provider() -> OpenAIProvider:
+    """The provider on the shared client, building both on first use.
+
+    Creating the client sets up the whole HTTP stack, which takes a
+    noticeable part of startup; it happens on the first model call or in
+    api.warmup(), not at import.
+    """
+    global _client, _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                _client = create_openai_client() if _configured else None
+                if _client is not None:
+                    set_default_openai_client(_client)
+                _provider = OpenAIProvider(openai_client=_client, use_responses=OPENAI_API_MODE == "responses")
+    return _provider
+
+def get_openai_client() -> Optional[AsyncOpenAI]:
+    """The shared client installed by configure_openai(), if any."""
+    if not _configured:
+        return None
+    _shared_provider()
+    return _client
+
+class LazyModel(Model):
+    """A model name bound to the shared client on its first call."""
+
+    def __init__(self, name: Optional[str]):
+        self.model = name
+        self._model: Optional[Model] = None
+
+    def resolve(self) -> Model:
+        if self._model is None:
+            self._model = _shared_provider().get_model(self.model)
+        return self._model
+
+    async def get_response(self, *args: Any, **kwargs: Any) -> Any:
+        return await self.resolve().get_response(*args, **kwargs)
+
+    def stream_response(self, *args: Any, **kwargs: Any) -> Any:
+        return self.resolve().stream_response(*args, **kwargs)
+
+    def get_retry_advice(self, request: Any) -> Any:
+        return self.resolve().get_retry_advice(request)
+
+    async def close(self) -> None:
+        if self._model is not None:
+            await self._model.close()
+
+def get_model(name: Optional[str]) -> Model:
+    """A model object for ``name`` on the shared client (SDK defaults before configure_openai())."""
+    return LazyModel(name)
+
+def configure_openai(agents: Iterable[Agent]) -> None:
+    """Make one shared client the SDK default and bind each agent's model to it.
+
+    Agents whose ``model`` is a name get a model object that uses the shared
+    client, so every run, guardrail agent included, reuses the same pool.
+    """
+    global _configured
+    set_default_openai_api(OPENAI_API_MODE)
+    _configured = True
+    for agent in agents:
+        if agent.model is None or isinstance(agent.model, str):
+            agent.model = LazyModel(agent.model)
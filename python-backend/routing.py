@@ -0,0 +1,203 @@
+from __future__ import annotations as _annotations
+
+import json
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from agents import Agent, Model, ModelResponse
+
+from classifier import classify_complexity
+from provider import get_model
+from telemetry import metrics
+from usage import current_turn
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+#
+# MODEL_ROUTING: set to ``0`` to always use each agent's own model.
+# ROUTER_CHEAP_MODEL: model for easy turns (default gpt-4o-mini).
+# MODEL_ROUTES: per-agent overrides as JSON, keyed by agent name, e.g.
+#   {"Escalation Agent": "off", "Nutrition Expert Agent": {"cheap": "gpt-4.1-mini", "strong": "gpt-4.1"}}
+#   ``strong`` defaults to the model in the agent's declaration.
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") != "0"
+ROUTER_CHEAP_MODEL = os.getenv("ROUTER_CHEAP_MODEL", "gpt-4o-mini")
+MODEL_ROUTES: Dict[str, Any] = json.loads(os.getenv("MODEL_ROUTES", "{}"))
+
+ROUTE_DECISIONS = metrics.counter(
+    "model_route_decisions_total", "Per-call model routing decisions.", labels=("agent", "tier")
+)
+ROUTE_ESCALATIONS = metrics.counter(
+    "model_route_escalations_total", "Cheap-model answers retried on the strong model.", labels=("agent", "reason")
+)
+ROUTE_SECONDS = metrics.histogram(
+    "model_route_call_duration_seconds", "Model call latency by routing tier.", labels=("agent", "tier")
+)
+
+# =========================
+# Decisions
+# =========================
+
+@dataclass
+class RouteDecision:
+    tier: str  # "cheap" or "strong"
+    reason: str
+
+_HEDGE_RE = re.compile(
+    r"\b(?:i'?m not sure|i am not sure|i don'?t know|i do not know|i'?m unable to|i cannot determine|"
+    r"hard to say|not certain)\b",
+    re.IGNORECASE,
+)
+
+def _last_user_message(input: Any) -> str:
+    if isinstance(input, str):
+        return input
+    for item in reversed(input or []):
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content", "")
+            if isinstance(content, list):
+                return " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+            return str(content)
+    return ""
+
+def decide(input: Any) -> RouteDecision:
+    strong, reason = classify_complexity(_last_user_message(input))
+    return RouteDecision("strong" if strong else "cheap", reason)
+
+def escalation_reason(response: ModelResponse, output_schema: Any, tool_names: Iterable[str]) -> Optional[str]:
+    """Why a cheap-model answer should be retried on the strong model, or ``None`` to keep it."""
+    texts: List[str] = []
+    calls = 0
+    for item in response.output:
+        kind = getattr(item, "type", None)
+        if kind == "message":
+            for part in item.content:
+                if part.type == "refusal":
+                    return "refusal"
+                if part.type == "output_text":
+                    texts.append(part.text)
+        elif kind == "function_call":
+            calls += 1
+            if item.name not in tool_names:
+                return "unknown_tool"
+            try:
+                json.loads(item.arguments or "{}")
+            except ValueError:
+                return "invalid_tool_arguments"
+    text = "".join(texts).strip()
+    if not calls and not text:
+        return "empty_output"
+    if output_schema is not None and not output_schema.is_plain_text() and not calls:
+        try:
+            output_schema.validate_json(text)
+        except Exception:
+            return "invalid_structured_output"
+    if text and _HEDGE_RE.search(text):
+        return "low_confidence"
+    return None
+
+# =========================
+# Routed model
+# =========================
+
+# Name of the model that served the latest call in this context, for usage attribution
+_served_by: ContextVar[Optional[str]] = ContextVar("routed_model_served_by", default=None)
+
+class RoutedModel(Model):
+    """Send each call to a cheap or a strong model.
+
+    Easy turns (see classifier.classify_complexity) go to the cheap model.
+    A cheap answer that is empty, refused, hedged, names an unknown tool or
+    fails the output schema is retried once on the strong model. Streamed
+    calls are routed up front only: tokens already sent can't be taken back.
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        cheap: str,
+        strong: str,
+        strong_model: Optional[Model] = None,
+        cheap_model: Optional[Model] = None,
+    ):
+        self.agent_name = agent_name
+        self.cheap_name, self.strong_name = cheap, strong
+        self.cheap = cheap_model or get_model(cheap)
+        self.strong = strong_model or get_model(strong)
+
+    @property
+    def model(self) -> str:
+        return _served_by.get() or self.strong_name
+
+    def _pick(self, tier: str) -> Model:
+        _served_by.set(self.cheap_name if tier == "cheap" else self.strong_name)
+        return self.cheap if tier == "cheap" else self.strong
+
+    def _log(self, decision: RouteDecision, started: float, escalated: Optional[str] = None) -> None:
+        elapsed = time.perf_counter() - started
+        tier = "escalated" if escalated else decision.tier
+        ROUTE_DECISIONS.inc(self.agent_name, tier)
+        ROUTE_SECONDS.observe(elapsed, self.agent_name, tier)
+        logger.info(
+            "route agent=%r tier=%s model=%s reason=%r escalated=%s elapsed_ms=%.0f",
+            self.agent_name, tier, self.model, decision.reason, escalated or "-", elapsed * 1000,
+        )
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> ModelResponse:
+        decision = decide(input)
+        started = time.perf_counter()
+        args = (system_instructions, input, model_settings, tools, output_schema, handoffs, tracing)
+        response = await self._pick(decision.tier).get_response(*args, **kwargs)
+        if decision.tier == "cheap":
+            names = [t.name for t in tools] + [h.tool_name for h in handoffs]
+            reason = escalation_reason(response, output_schema, names)
+            if reason is not None:
+                # The discarded answer was still paid for
+                usage = response.usage
+                current_turn().add(self.agent_name, self.cheap_name, usage.input_tokens, usage.output_tokens)
+                ROUTE_ESCALATIONS.inc(self.agent_name, reason)
+                response = await self._pick("strong").get_response(*args, **kwargs)
+                self._log(decision, started, escalated=reason)
+                return response
+        self._log(decision, started)
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        decision = decide(input)
+        started = time.perf_counter()
+        model = self._pick(decision.tier)
+        async for event in model.stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+        ):
+            yield event
+        self._log(decision, started)
+
+def _model_name(model: Any) -> Optional[str]:
+    if model is None or isinstance(model, str):
+        return model
+    return getattr(model, "model", None)
+
+def configure_routing(agents: Iterable[Agent]) -> None:
+    """Wrap each agent's model in a RoutedModel unless routing is off for it."""
+    if not MODEL_ROUTING:
+        return
+    for agent in agents:
+        route = MODEL_ROUTES.get(agent.name, {})
+        if route == "off":
+            continue
+        strong = route.get("strong") or _model_name(agent.model)
+        cheap = route.get("cheap") or ROUTER_CHEAP_MODEL
+        if not strong or strong == cheap:
+            continue
+        # Keep the agent's own model object (already bound to the shared client) when it is the strong one
+        strong_model = agent.model if not isinstance(agent.model, str) and "strong" not in route else None
+        agent.model = RoutedModel(agent.name, cheap, strong, strong_model)
+        logger.info("Routing %r: %s for easy turns, %s otherwise", agent.name, cheap, strong)
@@ -0,0 +1,145 @@
+from __future__ import annotations as _annotations
+
+import copy
+import json
+import logging
+import os
+import re
+from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Keyword matching
+# =========================
+
+class KeywordMatcher:
+    """Map text to the highest-priority label whose keywords occur in it.
+
+    Every keyword is compiled into one regex and the text is scanned once.
+    Keywords match as case-insensitive substrings; when several labels match,
+    the one listed first wins. Text matching nothing gets ``default``.
+    """
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], default: Optional[str] = None):
+        self.default = default
+        self._labels: Dict[str, Tuple[int, str]] = {}
+        for priority, rule in enumerate(rules):
+            for keyword in rule["keywords"]:
+                self._labels.setdefault(keyword.lower(), (priority, rule["label"]))
+        alternation = "|".join(re.escape(k) for k in sorted(self._labels, key=len, reverse=True))
+        # A lookahead so overlapping keywords are all seen in the same pass
+        self._re = re.compile(f"(?=({alternation}))") if alternation else None
+
+    def match(self, text: str) -> Optional[str]:
+        if self._re is None or not text:
+            return self.default
+        best: Optional[Tuple[int, str]] = None
+        for m in self._re.finditer(text.lower()):
+            hit = self._labels[m.group(1)]
+            if best is None or hit[0] < best[0]:
+                best = hit
+                if best[0] == 0:
+                    break
+        return best[1] if best is not None else self.default
+
+# =========================
+# Catalog
+# =========================
+
+WILDCARD = "*"
+KEY_FIELDS = ("diet", "injury", "experience")
+
+class Catalog:
+    """Plan templates indexed by (diet, injury, experience).
+
+    A field an entry leaves out matches anything. find() tries the most
+    specific key first, treating diet as the most significant field, then
+    injury, then experience; each probe is a dict lookup.
+    """
+
+    def __init__(self, entries: Sequence[Dict[str, Any]]):
+        self._index: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for entry in entries:
+            key = tuple(entry.get(field, WILDCARD) for field in KEY_FIELDS)
+            self._index.setdefault(key, entry)
+
+    def find(self, diet: str, injury: str, experience: str) -> Dict[str, Any]:
+        for key in product((diet, WILDCARD), (injury, WILDCARD), (experience, WILDCARD)):
+            entry = self._index.get(key)
+            if entry is not None:
+                return entry
+        raise LookupError(f"No catalog entry for diet={diet!r} injury={injury!r} experience={experience!r}")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+# =========================
+# Rules
+# =========================
+
+_QUANTITY_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|pounds|lbs|km|miles)")
+_DURATION_RE = re.compile(r"(\d+)\s*(month|week|day)s?")
+
+class PlanRules:
+    """Keyword rules and plan catalogs behind the goal, meal and workout tools."""
+
+    def __init__(self, data: Dict[str, Any]):
+        keywords, defaults = data["keywords"], data.get("defaults", {})
+        self.objective = KeywordMatcher(keywords["objective"], defaults.get("objective"))
+        self.diet = KeywordMatcher(keywords["diet"], defaults.get("diet"))
+        self.injury = KeywordMatcher(keywords["injury"], defaults.get("injury"))
+        self.experience = KeywordMatcher(keywords["experience"], defaults.get("experience"))
+        self.meals = Catalog(data["meal_plans"])
+        self.workouts = Catalog(data["workout_plans"])
+
+    def parse_goal(self, user_goal: str) -> Dict[str, Any]:
+        """Structure a free-text goal; missing parts default to 5 kg over 2 months."""
+        goal_lower = user_goal.lower()
+        quantity_match = _QUANTITY_RE.search(goal_lower)
+        if quantity_match:
+            quantity, metric = float(quantity_match.group(1)), quantity_match.group(2)
+        else:
+            quantity, metric = 5.0, "kg"
+        duration_match = _DURATION_RE.search(goal_lower)
+        if duration_match:
+            duration_num, duration_unit = int(duration_match.group(1)), duration_match.group(2)
+            duration = f"{duration_num} {duration_unit}{'s' if duration_num > 1 else ''}"
+        else:
+            duration = "2 months"
+        return {
+            "objective": self.objective.match(goal_lower),
+            "quantity": quantity,
+            "metric": metric,
+            "duration": duration,
+            "priority": "high",
+        }
+
+    def meal_plan(self, dietary_preferences: str, injury_notes: str = "") -> Tuple[str, List[str]]:
+        """The (summary, days) of the best-matching meal plan."""
+        entry = self.meals.find(
+            self.diet.match(dietary_preferences), self.injury.match(injury_notes), self.experience.default
+        )
+        return entry["summary"].format(preferences=dietary_preferences), list(entry["days"])
+
+    def workout_plan(self, experience_level: str, injury_notes: str = "", dietary_preferences: str = "") -> Dict[str, Any]:
+        """A copy of the best-matching workout plan; injuries take precedence over experience."""
+        entry = self.workouts.find(
+            self.diet.match(dietary_preferences), self.injury.match(injury_notes), self.experience.match(experience_level)
+        )
+        return copy.deepcopy(entry["plan"])
+
+# =========================
+# Loading
+# =========================
+
+PLAN_CATALOG_PATH = os.getenv("PLAN_CATALOG_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+def load_rules(path: str = PLAN_CATALOG_PATH) -> PlanRules:
+    with open(path, encoding="utf-8") as f:
+        rules = PlanRules(json.load(f))
+    logger.info("Loaded %d meal and %d workout plans from %s", len(rules.meals), len(rules.workouts), path)
+    return rules
+
+plan_rules = load_rules()
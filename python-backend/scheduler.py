@@ -0,0 +1,392 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+# Conversation the current turn belongs to; set by the API so tools can schedule against it
+current_conversation: ContextVar[Optional[str]] = ContextVar("current_conversation", default=None)
+
+CHECKINS_FIRED = metrics.counter("checkins_fired_total", "Check-in turns run by the scheduler.", labels=("status",))
+
+# =========================
+# Records
+# =========================
+
+@dataclass(slots=True, frozen=True)
+class Checkin:
+    id: str
+    conversation_id: str
+    due_at: int
+    # Seconds between recurrences; 0 fires once
+    interval: int = WEEK_SECONDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        # conversation_id stays server-side; it is the only credential a conversation has
+        return {
+            "id": self.id,
+            "due_at": self.due_at,
+            "interval": self.interval,
+        }
+
+@dataclass(slots=True, frozen=True)
+class CheckinChange:
+    """A check-in change made during a turn, applied once the turn is saved.
+
+    ``kind`` is "schedule" (the conversation's recurring check-in, created or
+    moved to ``due_at``), "reschedule" or "cancel" (of ``checkin_id``).
+    """
+    kind: str
+    due_at: Optional[int] = None
+    checkin_id: Optional[str] = None
+
+def _next_due(checkin: Checkin, now: int) -> Optional[int]:
+    """Next occurrence after ``now``, skipping periods missed while the worker was down."""
+    if not checkin.interval:
+        return None
+    missed = max(0, (now - checkin.due_at) // checkin.interval)
+    return checkin.due_at + (missed + 1) * checkin.interval
+
+# =========================
+# Stores
+# =========================
+
+class CheckinStore:
+    """Scheduled check-ins indexed by due time and by conversation."""
+
+    def schedule(self, conversation_id: str, due_at: int, interval: int = WEEK_SECONDS) -> Checkin:
+        raise NotImplementedError
+
+    def get(self, checkin_id: str) -> Optional[Checkin]:
+        raise NotImplementedError
+
+    def for_conversation(self, conversation_id: str) -> List[Checkin]:
+        """A conversation's check-ins, soonest first."""
+        raise NotImplementedError
+
+    def reschedule(self, checkin_id: str, due_at: int) -> Optional[Checkin]:
+        raise NotImplementedError
+
+    def cancel(self, checkin_id: str) -> bool:
+        raise NotImplementedError
+
+    def claim_due(self, now: int, limit: int, lease: int) -> List[Checkin]:
+        """Take up to ``limit`` check-ins due at ``now``, oldest first.
+
+        Claimed check-ins are pushed ``lease`` seconds out so no other worker
+        takes them; if the claimer dies they become due again after the lease.
+        The returned records carry their original due time.
+        """
+        raise NotImplementedError
+
+    def apply(self, conversation_id: str, changes: List[CheckinChange]) -> None:
+        """Apply a saved turn's check-in changes in order."""
+        for change in changes:
+            if change.kind == "schedule":
+                # One recurring check-in per conversation; asking again moves it
+                existing = [c for c in self.for_conversation(conversation_id) if c.interval]
+                if existing:
+                    self.reschedule(existing[0].id, change.due_at)
+                else:
+                    self.schedule(conversation_id, change.due_at)
+            elif change.kind == "reschedule":
+                self.reschedule(change.checkin_id, change.due_at)
+            elif change.kind == "cancel":
+                self.cancel(change.checkin_id)
+            else:
+                raise ValueError(f"Unknown check-in change {change.kind!r}")
+
+    def complete(self, checkin: Checkin, now: int) -> None:
+        """Schedule the next occurrence of a fired check-in, or drop a one-off."""
+        next_due = _next_due(checkin, now)
+        if next_due is None:
+            self.cancel(checkin.id)
+        else:
+            self.reschedule(checkin.id, next_due)
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+class InMemoryCheckinStore(CheckinStore):
+    """Process-local store: a min-heap on due time with lazy deletion."""
+
+    def __init__(self):
+        self._entries: Dict[str, Checkin] = {}
+        self._by_conversation: Dict[str, Set[str]] = {}
+        # (due_at, id); an entry is stale when the check-in is gone or its due time moved
+        self._heap: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def _push(self, checkin: Checkin) -> None:
+        self._entries[checkin.id] = checkin
+        heapq.heappush(self._heap, (checkin.due_at, checkin.id))
+        # Rebuild once stale entries outnumber live ones
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(c.due_at, c.id) for c in self._entries.values()]
+            heapq.heapify(self._heap)
+
+    def schedule(self, conversation_id: str, due_at: int, interval: int = WEEK_SECONDS) -> Checkin:
+        checkin = Checkin(uuid4().hex, conversation_id, int(due_at), int(interval))
+        with self._lock:
+            self._push(checkin)
+            self._by_conversation.setdefault(conversation_id, set()).add(checkin.id)
+        return checkin
+
+    def get(self, checkin_id: str) -> Optional[Checkin]:
+        with self._lock:
+            return self._entries.get(checkin_id)
+
+    def for_conversation(self, conversation_id: str) -> List[Checkin]:
+        with self._lock:
+            checkins = [self._entries[i] for i in self._by_conversation.get(conversation_id, ())]
+        return sorted(checkins, key=lambda c: c.due_at)
+
+    def reschedule(self, checkin_id: str, due_at: int) -> Optional[Checkin]:
+        with self._lock:
+            checkin = self._entries.get(checkin_id)
+            if checkin is None:
+                return None
+            checkin = replace(checkin, due_at=int(due_at))
+            self._push(checkin)
+        return checkin
+
+    def cancel(self, checkin_id: str) -> bool:
+        with self._lock:
+            checkin = self._entries.pop(checkin_id, None)
+            if checkin is None:
+                return False
+            ids = self._by_conversation.get(checkin.conversation_id)
+            if ids is not None:
+                ids.discard(checkin_id)
+                if not ids:
+                    del self._by_conversation[checkin.conversation_id]
+        return True
+
+    def claim_due(self, now: int, limit: int, lease: int) -> List[Checkin]:
+        claimed: List[Checkin] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(claimed) < limit:
+                due_at, checkin_id = heapq.heappop(self._heap)
+                checkin = self._entries.get(checkin_id)
+                if checkin is None or checkin.due_at != due_at:
+                    continue
+                claimed.append(checkin)
+                self._push(replace(checkin, due_at=now + lease))
+        return claimed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCheckinStore(CheckinStore):
+    """SQLite (WAL mode) store indexed by due time; claims are atomic across processes."""
+
+    def __init__(self, path: str = "checkins.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkins ("
+            "id TEXT PRIMARY KEY, conversation_id TEXT NOT NULL, "
+            "due_at INTEGER NOT NULL, interval INTEGER NOT NULL)"
+        )
+        if "uid" in {row[1] for row in conn.execute("PRAGMA table_info(checkins)")}:
+            # Older databases indexed check-ins by the user id, which is guessable
+            conn.execute("DROP INDEX IF EXISTS checkins_uid")
+            conn.execute("ALTER TABLE checkins DROP COLUMN uid")
+        conn.execute("CREATE INDEX IF NOT EXISTS checkins_due_at ON checkins(due_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS checkins_conversation ON checkins(conversation_id)")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared across fork(); each process opens its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = self._connect()
+        return self._connection
+
+    _COLUMNS = "id, conversation_id, due_at, interval"
+
+    def schedule(self, conversation_id: str, due_at: int, interval: int = WEEK_SECONDS) -> Checkin:
+        checkin = Checkin(uuid4().hex, conversation_id, int(due_at), int(interval))
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO checkins ({self._COLUMNS}) VALUES (?, ?, ?, ?)",
+                (checkin.id, checkin.conversation_id, checkin.due_at, checkin.interval),
+            )
+        return checkin
+
+    def get(self, checkin_id: str) -> Optional[Checkin]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM checkins WHERE id = ?", (checkin_id,)).fetchone()
+        return Checkin(*row) if row else None
+
+    def for_conversation(self, conversation_id: str) -> List[Checkin]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM checkins WHERE conversation_id = ? ORDER BY due_at", (conversation_id,)
+            ).fetchall()
+        return [Checkin(*row) for row in rows]
+
+    def reschedule(self, checkin_id: str, due_at: int) -> Optional[Checkin]:
+        with self._lock:
+            row = self._conn.execute(
+                f"UPDATE checkins SET due_at = ? WHERE id = ? RETURNING {self._COLUMNS}", (int(due_at), checkin_id)
+            ).fetchone()
+        return Checkin(*row) if row else None
+
+    def cancel(self, checkin_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM checkins WHERE id = ?", (checkin_id,)).rowcount > 0
+
+    def claim_due(self, now: int, limit: int, lease: int) -> List[Checkin]:
+        with self._lock:
+            conn = self._conn
+            # IMMEDIATE takes the write lock up front, so two workers never claim the same rows
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    f"SELECT {self._COLUMNS} FROM checkins WHERE due_at <= ? ORDER BY due_at LIMIT ?", (now, limit)
+                ).fetchall()
+                conn.executemany("UPDATE checkins SET due_at = ? WHERE id = ?", [(now + lease, row[0]) for row in rows])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [Checkin(*row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM checkins").fetchone()[0]
+
+# =========================
+# Worker
+# =========================
+
+# Runs chat request bodies and yields one result ({"index", "status", ...}) per item
+TurnRunner = Callable[[List[Dict[str, Any]]], AsyncIterator[Dict[str, Any]]]
+
+class CheckinWorker:
+    """Background task that runs due check-ins through the agent pipeline in batches.
+
+    Each due check-in becomes a chat turn with ``message`` in its
+    conversation. Successful check-ins are rescheduled for their next
+    occurrence; failed ones are retried once their claim lease runs out, and
+    check-ins whose conversation is gone (404) are cancelled.
+    """
+
+    def __init__(
+        self,
+        store: CheckinStore,
+        run_turns: TurnRunner,
+        message: str,
+        poll_interval: float = 30.0,
+        batch_size: int = 100,
+        lease: int = 900,
+    ):
+        self.store = store
+        self.run_turns = run_turns
+        self.message = message
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease = lease
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self, now: Optional[int] = None) -> int:
+        """Fire one batch of due check-ins; returns how many were claimed."""
+        now = int(now if now is not None else time.time())
+        due = self.store.claim_due(now, self.batch_size, self.lease)
+        if not due:
+            return 0
+        items = [{"conversation_id": c.conversation_id, "message": self.message} for c in due]
+        async for result in self.run_turns(items):
+            checkin, status = due[result["index"]], result["status"]
+            CHECKINS_FIRED.inc(str(status))
+            if status == 200:
+                self.store.complete(checkin, now)
+            elif status == 404:
+                self.store.cancel(checkin.id)
+            else:
+                logger.warning("Check-in %s failed with %s: %s", checkin.id, status, result.get("error"))
+        logger.info("Fired %d check-ins", len(due))
+        return len(due)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Check-in worker iteration failed")
+                claimed = 0
+            # A full batch means more are probably due; go again right away
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# =========================
+# Configuration
+# =========================
+
+CHECKIN_WORKER_ENABLED = os.getenv("CHECKIN_WORKER_ENABLED", "1") != "0"
+CHECKIN_MESSAGE = os.getenv(
+    "CHECKIN_MESSAGE", "It's time for my scheduled progress check-in. How am I doing against my goal?"
+)
+
+def create_checkin_store() -> CheckinStore:
+    """Build the check-in store selected by CHECKIN_STORE (memory or sqlite)."""
+    backend = os.getenv("CHECKIN_STORE", "memory").lower()
+    if backend == "sqlite":
+        store: CheckinStore = SQLiteCheckinStore(os.getenv("CHECKIN_STORE_URL", "checkins.db"))
+    elif backend == "memory":
+        store = InMemoryCheckinStore()
+    else:
+        raise ValueError(f"Unknown CHECKIN_STORE backend: {backend}")
+    logger.info("Using %s check-in store", type(store).__name__)
+    return store
+
+def create_checkin_worker(store: CheckinStore, run_turns: TurnRunner) -> CheckinWorker:
+    """Build the worker from CHECKIN_POLL_SECONDS, CHECKIN_BATCH_SIZE and CHECKIN_LEASE_SECONDS."""
+    return CheckinWorker(
+        store,
+        run_turns,
+        CHECKIN_MESSAGE,
+        poll_interval=float(os.getenv("CHECKIN_POLL_SECONDS", 30)),
+        batch_size=int(os.getenv("CHECKIN_BATCH_SIZE", 100)),
+        lease=int(os.getenv("CHECKIN_LEASE_SECONDS", 900)),
+    )
+
+checkin_store = create_checkin_store()
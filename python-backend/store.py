@@ -0,0 +1,670 @@
+from __future__ import annotations as _annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pydantic_core
+
+import codec
+from main import UserSessionContext
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Serialization
+# =========================
+
+# Tags of the JSON encoding used before codec.py; still readable, no longer written
+COMPRESS_THRESHOLD = 1024
+_RAW = b"j"
+_ZLIB = b"z"
+
+class ConversationState(dict):
+    """Conversation state whose transcript is loaded on first access.
+
+    Turns that only read the context (usage lookups, check-in routing,
+    conflict checks) never pay for loading ``input_items``. The items come
+    from an encoded section (``items``), which a save that never touched
+    them writes back as-is, or from ``load_items`` (the transcript log).
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        items: Optional[bytes] = None,
+        dictionary_id: int = codec.DICTIONARY_ID,
+        load_items: Optional[Callable[[], List[Any]]] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self._items = items
+        self._dictionary_id = dictionary_id
+        self._load_items = partial(codec.decode_section, items, dictionary_id) if items is not None else load_items
+
+    def __missing__(self, key: str) -> Any:
+        if key != "input_items" or self._load_items is None:
+            raise KeyError(key)
+        items = self._load_items()
+        self._items = self._load_items = None
+        self["input_items"] = items
+        return items
+
+    def __contains__(self, key: object) -> bool:
+        return super().__contains__(key) or (key == "input_items" and self._load_items is not None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items_loaded(self) -> bool:
+        return self._load_items is None
+
+    def encoded_items(self) -> Optional[bytes]:
+        """The stored transcript section, if it was never decoded and can be written back as-is."""
+        if self._items is not None and self._dictionary_id == codec.DICTIONARY_ID and not dict.__contains__(self, "input_items"):
+            return self._items
+        return None
+
+def serialize_state(state: Dict[str, Any]) -> bytes:
+    """Encode conversation state with codec.py; see the format notes there.
+
+    States with a transcript cursor (see Transcripts below) keep their items
+    in the store's transcript log, so only the cursor is written.
+    """
+    meta: Dict[str, Any] = {"current_agent": state.get("current_agent"), "schema": codec.SCHEMA_VERSION}
+    if state.get("usage"):
+        meta["usage"] = state["usage"]
+    sections = {
+        codec.SECTION_META: meta,
+        codec.SECTION_CONTEXT: state["context"].model_dump(exclude_defaults=True),
+    }
+    if "transcript" in state:
+        meta["transcript"] = state["transcript"]
+        return codec.encode(sections)
+    items = state.encoded_items() if isinstance(state, ConversationState) else None
+    if items is None:
+        sections[codec.SECTION_ITEMS] = state.get("input_items", [])
+        return codec.encode(sections)
+    return codec.encode(sections, {codec.SECTION_ITEMS: items})
+
+def _deserialize_legacy(data: bytes) -> Dict[str, Any]:
+    tag, body = data[:1], data[1:]
+    if tag == _ZLIB:
+        body = zlib.decompress(body)
+    elif tag != _RAW:
+        raise ValueError(f"Unknown conversation state encoding: {tag!r}")
+    payload = json.loads(body)
+    state = {
+        "current_agent": payload["current_agent"],
+        "context": UserSessionContext.model_validate(payload["context"]),
+        "input_items": payload["input_items"],
+    }
+    if "usage" in payload:
+        state["usage"] = payload["usage"]
+    return state
+
+def deserialize_state(data: bytes, read_transcript: Optional[Callable[[int, int], List[Any]]] = None) -> Dict[str, Any]:
+    """Decode bytes produced by serialize_state back into live conversation state.
+
+    ``read_transcript(start, end)`` reads the conversation's transcript log;
+    it is called on first access to ``input_items`` for the replay window.
+    """
+    if not codec.is_encoded(data):
+        return _deserialize_legacy(data)
+    dictionary_id, sections = codec.split(data)
+    meta = codec.decode_section(sections[codec.SECTION_META], dictionary_id)
+    context = codec.decode_section(sections[codec.SECTION_CONTEXT], dictionary_id)
+    codec.migrate(meta, context)
+    cursor = meta.get("transcript")
+    load_items = partial(_read_window, read_transcript, cursor) if cursor is not None and read_transcript else None
+    state = ConversationState(
+        current_agent=meta["current_agent"],
+        context=UserSessionContext.model_validate(context),
+        items=sections.get(codec.SECTION_ITEMS),
+        dictionary_id=dictionary_id,
+        load_items=load_items,
+    )
+    if "usage" in meta:
+        state["usage"] = meta["usage"]
+    if cursor is not None:
+        state["transcript"] = cursor
+    elif codec.SECTION_ITEMS not in sections:
+        state["input_items"] = []
+    return state
+
+# =========================
+# Transcripts
+# =========================
+#
+# Every item a turn adds to ``input_items`` is appended to a per-conversation
+# log in the store, once, and never rewritten. The saved state only keeps a
+# cursor: how many items the log holds (``length``), where the window
+# replayed to the model starts (``start``) and the compaction summary that
+# stands in for everything before it. ``input_items`` is that window:
+#
+#   [summary] + log[start:length] + items added since the last save
+#
+# so a save appends the trailing new items and the size of what is written
+# per turn does not depend on how long the conversation is.
+
+def _cursor(state: Dict[str, Any]) -> Dict[str, Any]:
+    # States saved before the log existed start with their whole window unlogged
+    return state.setdefault("transcript", {"length": 0, "start": 0, "summary": None})
+
+def _read_window(read_transcript: Callable[[int, int], List[Any]], cursor: Dict[str, Any]) -> List[Any]:
+    window = read_transcript(cursor["start"], cursor["length"])
+    return [cursor["summary"], *window] if cursor["summary"] is not None else window
+
+def fold_transcript(state: Dict[str, Any], compacted: List[Any]) -> None:
+    """Replace the window with ``compacted``: a summary item followed by a suffix of the current window."""
+    items = state["input_items"]
+    if compacted is items:
+        return
+    cursor = _cursor(state)
+    verbatim = items[1:] if cursor["summary"] is not None else items
+    folded = len(verbatim) - (len(compacted) - 1)
+    logged = cursor["length"] - cursor["start"]
+    if folded <= logged:
+        cursor["start"] += folded
+    else:
+        # Items added this turn were folded before being logged; the next save still logs them
+        state.setdefault("transcript_folded", []).extend(verbatim[logged:folded])
+        cursor["start"] = cursor["length"]
+    cursor["summary"] = compacted[0]
+    state["input_items"] = compacted
+
+def _take_new_items(state: Dict[str, Any]) -> Tuple[int, List[Any]]:
+    """Move the cursor past the items added since the last save; returns (log position, items) to append."""
+    if isinstance(state, ConversationState) and not state.items_loaded() and "transcript" in state:
+        return state["transcript"]["length"], []
+    cursor = _cursor(state)
+    folded = state.pop("transcript_folded", [])
+    items = state.get("input_items", [])
+    verbatim = items[1:] if cursor["summary"] is not None else items
+    new = folded + verbatim[cursor["length"] - cursor["start"]:]
+    position = cursor["length"]
+    cursor["length"] += len(new)
+    cursor["start"] = cursor["length"] - len(verbatim)
+    return position, new
+
+# =========================
+# Stores
+# =========================
+
+# (UTC day, agent, model, counts) aggregates kept by every store; see ConversationStore.add_usage
+UsageRow = Tuple[str, str, str, Dict[str, float]]
+
+_USAGE_SEP = "\x1f"
+
+def _usage_rows(rows) -> List[UsageRow]:
+    """Group (day, agent, model, metric, value) rows into UsageRows."""
+    grouped: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+    for day, agent, model, metric, value in rows:
+        grouped.setdefault((day, agent, model), {})[metric] = value
+    return [(day, agent, model, counts) for (day, agent, model), counts in grouped.items()]
+
+class StateConflictError(Exception):
+    """Raised by save() when the stored revision no longer matches the expected one."""
+
+    def __init__(self, conversation_id: str, expected: int, actual: int):
+        super().__init__(
+            f"Conversation {conversation_id} was updated concurrently "
+            f"(expected revision {expected}, found {actual})"
+        )
+        self.conversation_id = conversation_id
+        self.expected = expected
+        self.actual = actual
+
+class ConversationStore:
+    """Conversation state keyed by id.
+
+    Every successful save() bumps ``state["revision"]``. Passing
+    ``expected_revision`` turns the save into a compare-and-swap: it raises
+    StateConflictError unless the stored revision still equals the one the
+    state was loaded with (0 for a conversation that must not exist yet).
+    A save also appends the turn's new transcript items to the
+    conversation's log, which read_transcript() pages through.
+
+    The store also keeps usage aggregates per (UTC day, agent, model), so
+    every worker sharing it reports the same totals. They don't expire with
+    conversations.
+    """
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    def save(self, conversation_id: str, state: Dict[str, Any], expected_revision: Optional[int] = None):
+        pass
+
+    def delete(self, conversation_id: str):
+        pass
+
+    def read_transcript(self, conversation_id: str, start: int = 0, end: Optional[int] = None) -> List[Any]:
+        pass
+
+    def add_usage(self, day: str, counts: Dict[Tuple[str, str], Dict[str, float]]) -> None:
+        """Add counts keyed by (agent, model) to ``day``'s aggregates."""
+        pass
+
+    def usage(self) -> List[UsageRow]:
+        """Every aggregate as (day, agent, model, counts)."""
+        pass
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy that can be changed without touching the original.
+
+    Containers one level down are copied (turns append items and update the
+    cursor and usage in place); transcript items are never modified and are
+    shared. The context is rebuilt from its fields, as the serializing stores
+    do, so per-turn bookkeeping such as queued progress is not carried over.
+    """
+    copied = {key: value.copy() if isinstance(value, (dict, list)) else value for key, value in state.items()}
+    copied["context"] = UserSessionContext.model_validate(state["context"].model_dump())
+    return copied
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local store bounded by LRU size and idle TTL.
+
+    States are copied on the way in and out, so each caller gets its own and
+    compare-and-swap behaves as it does in the shared stores.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: Optional[float] = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._conversations: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._transcripts: Dict[str, List[Any]] = {}
+        self._usage: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is None:
+                return None
+            saved_at, revision, state = entry
+            if self.ttl_seconds is not None and time.time() - saved_at > self.ttl_seconds:
+                del self._conversations[conversation_id]
+                self._transcripts.pop(conversation_id, None)
+                return None
+            self._conversations.move_to_end(conversation_id)
+            state = _copy_state(state)
+        state["revision"] = revision
+        return state
+
+    def save(self, conversation_id: str, state: Dict[str, Any], expected_revision: Optional[int] = None):
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            current = entry[1] if entry is not None else 0
+            if expected_revision is not None and current != expected_revision:
+                raise StateConflictError(conversation_id, expected_revision, current)
+            position, items = _take_new_items(state)
+            transcript = self._transcripts.setdefault(conversation_id, [])
+            del transcript[position:]
+            transcript.extend(items)
+            state["revision"] = current + 1
+            self._conversations[conversation_id] = (time.time(), current + 1, _copy_state(state))
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self.max_entries:
+                evicted, _ = self._conversations.popitem(last=False)
+                self._transcripts.pop(evicted, None)
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+            self._transcripts.pop(conversation_id, None)
+
+    def read_transcript(self, conversation_id: str, start: int = 0, end: Optional[int] = None) -> List[Any]:
+        with self._lock:
+            return self._transcripts.get(conversation_id, [])[start:end]
+
+    def add_usage(self, day: str, counts: Dict[Tuple[str, str], Dict[str, float]]) -> None:
+        with self._lock:
+            for (agent, model), values in counts.items():
+                totals = self._usage.setdefault((day, agent, model), {})
+                for metric, value in values.items():
+                    totals[metric] = totals.get(metric, 0) + value
+
+    def usage(self) -> List[UsageRow]:
+        with self._lock:
+            return [(day, agent, model, dict(totals)) for (day, agent, model), totals in self._usage.items()]
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite (WAL mode) store shared by every worker on the same host."""
+
+    # Expired rows are purged at most this often, piggybacking on save().
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self, path: str = "conversations.db", ttl_seconds: Optional[float] = 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._pid = os.getpid()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL, "
+            "revision INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+        if "revision" not in columns:
+            conn.execute("ALTER TABLE conversations ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations(updated_at)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcript_items ("
+            "conversation_id TEXT NOT NULL, seq INTEGER NOT NULL, item BLOB NOT NULL, "
+            "PRIMARY KEY (conversation_id, seq)) WITHOUT ROWID"
+        )
+        # No type on value, so integer counts stay integers
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_totals ("
+            "day TEXT NOT NULL, agent TEXT NOT NULL, model TEXT NOT NULL, metric TEXT NOT NULL, value NOT NULL, "
+            "PRIMARY KEY (day, agent, model, metric)) WITHOUT ROWID"
+        )
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # A connection inherited through fork() (gunicorn --preload) must not be reused by the child
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = self._connect()
+        return self._connection
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at, revision FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob, updated_at, revision = row
+        if self.ttl_seconds is not None and time.time() - updated_at > self.ttl_seconds:
+            self.delete(conversation_id)
+            return None
+        state = deserialize_state(blob, partial(self.read_transcript, conversation_id))
+        state["revision"] = revision
+        return state
+
+    def read_transcript(self, conversation_id: str, start: int = 0, end: Optional[int] = None) -> List[Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item FROM transcript_items WHERE conversation_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (conversation_id, start, end if end is not None else 2 ** 63 - 1),
+            ).fetchall()
+        return [pydantic_core.from_json(row[0]) for row in rows]
+
+    def _current_revision(self, conversation_id: str) -> int:
+        row = self._conn.execute(
+            "SELECT revision FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def save(self, conversation_id: str, state: Dict[str, Any], expected_revision: Optional[int] = None):
+        position, items = _take_new_items(state)
+        blob = serialize_state(state)
+        rows = [(conversation_id, position + i, pydantic_core.to_json(item, fallback=str)) for i, item in enumerate(items)]
+        now = time.time()
+        with self._lock:
+            # The state and its new transcript items commit together
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                revision = self._write_state(conversation_id, blob, now, expected_revision)
+                self._conn.execute(
+                    "DELETE FROM transcript_items WHERE conversation_id = ? AND seq >= ?", (conversation_id, position)
+                )
+                self._conn.executemany("INSERT INTO transcript_items (conversation_id, seq, item) VALUES (?, ?, ?)", rows)
+                if self.ttl_seconds is not None and now - self._last_purge > self.PURGE_INTERVAL:
+                    self._last_purge = now
+                    self._purge(now - self.ttl_seconds)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            state["revision"] = revision
+
+    def _write_state(self, conversation_id: str, blob: bytes, now: float, expected_revision: Optional[int]) -> int:
+        if expected_revision is None:
+            return self._conn.execute(
+                "INSERT INTO conversations (id, state, updated_at, revision) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at, "
+                "revision = conversations.revision + 1 RETURNING revision",
+                (conversation_id, blob, now),
+            ).fetchone()[0]
+        if expected_revision == 0:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO conversations (id, state, updated_at, revision) VALUES (?, ?, ?, 1)",
+                (conversation_id, blob, now),
+            )
+        else:
+            cursor = self._conn.execute(
+                "UPDATE conversations SET state = ?, updated_at = ?, revision = revision + 1 "
+                "WHERE id = ? AND revision = ?",
+                (blob, now, conversation_id, expected_revision),
+            )
+        if cursor.rowcount != 1:
+            raise StateConflictError(conversation_id, expected_revision, self._current_revision(conversation_id))
+        return expected_revision + 1
+
+    def _purge(self, cutoff: float) -> None:
+        self._conn.execute(
+            "DELETE FROM transcript_items WHERE conversation_id IN (SELECT id FROM conversations WHERE updated_at < ?)",
+            (cutoff,),
+        )
+        self._conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,))
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM transcript_items WHERE conversation_id = ?", (conversation_id,))
+
+    def add_usage(self, day: str, counts: Dict[Tuple[str, str], Dict[str, float]]) -> None:
+        rows = [
+            (day, agent, model, metric, value)
+            for (agent, model), values in counts.items()
+            for metric, value in values.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO usage_totals (day, agent, model, metric, value) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(day, agent, model, metric) DO UPDATE SET value = value + excluded.value",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def usage(self) -> List[UsageRow]:
+        with self._lock:
+            rows = self._conn.execute("SELECT day, agent, model, metric, value FROM usage_totals").fetchall()
+        return _usage_rows((day, agent, model, metric, value) for day, agent, model, metric, value in rows)
+
+class RedisConversationStore(ConversationStore):
+    """Store for any Redis-protocol server (Redis, Valkey, KeyDB, fakeredis...).
+
+    Pass ``client`` to use an existing connection or a local stand-in; it only
+    needs ``get``, ``delete``, ``lrange``, the usage set/hash commands and
+    ``pipeline()`` with WATCH/MULTI support. ``watch_error`` is the exception
+    its EXEC raises when a watched key changed (redis.WatchError by default);
+    the redis package is only needed to build the default client. Values are the serialized state prefixed with an 8-byte revision,
+    which compare-and-swap saves check under WATCH. Transcripts are lists
+    under ``transcript_prefix``, appended to in the same transaction. Usage
+    aggregates are one hash per day under ``usage_prefix``.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        ttl_seconds: Optional[float] = 24 * 3600,
+        prefix: str = "conversation:",
+        client: Any = None,
+        transcript_prefix: str = "transcript:",
+        usage_prefix: str = "usage:",
+        watch_error: Optional[type] = None,
+    ):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "RedisConversationStore requires the 'redis' package: pip install redis"
+                ) from e
+            client = redis.Redis.from_url(url)
+            watch_error = watch_error or redis.WatchError
+        elif watch_error is None:
+            try:
+                from redis import WatchError as watch_error
+            except ImportError:
+                # A stand-in without redis installed; pass watch_error if its EXEC can fail
+                watch_error = ()
+
+        self._watch_error = watch_error
+        self._client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.transcript_prefix = transcript_prefix
+        self.usage_prefix = usage_prefix
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.prefix}{conversation_id}"
+
+    def _transcript_key(self, conversation_id: str) -> str:
+        return f"{self.transcript_prefix}{conversation_id}"
+
+    @staticmethod
+    def _unpack(value: Optional[bytes]) -> Tuple[int, Optional[bytes]]:
+        if value is None:
+            return 0, None
+        if value[:1] in (_RAW, _ZLIB):
+            # Written before revisions were stored
+            return 0, value
+        return int.from_bytes(value[:8], "big"), value[8:]
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        revision, blob = self._unpack(self._client.get(self._key(conversation_id)))
+        if blob is None:
+            return None
+        state = deserialize_state(blob, partial(self.read_transcript, conversation_id))
+        state["revision"] = revision
+        return state
+
+    def read_transcript(self, conversation_id: str, start: int = 0, end: Optional[int] = None) -> List[Any]:
+        if end is not None and end <= start:
+            return []
+        values = self._client.lrange(self._transcript_key(conversation_id), start, -1 if end is None else end - 1)
+        return [pydantic_core.from_json(value) for value in values]
+
+    def save(self, conversation_id: str, state: Dict[str, Any], expected_revision: Optional[int] = None):
+        key = self._key(conversation_id)
+        transcript_key = self._transcript_key(conversation_id)
+        position, items = _take_new_items(state)
+        blob = serialize_state(state)
+        values = [pydantic_core.to_json(item, fallback=str) for item in items]
+        ex = int(self.ttl_seconds) if self.ttl_seconds else None
+        while True:
+            with self._client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    current, _ = self._unpack(pipe.get(key))
+                    if expected_revision is not None and current != expected_revision:
+                        raise StateConflictError(conversation_id, expected_revision, current)
+                    pipe.multi()
+                    pipe.set(key, (current + 1).to_bytes(8, "big") + blob, ex=ex)
+                    if position == 0:
+                        pipe.delete(transcript_key)
+                    else:
+                        pipe.ltrim(transcript_key, 0, position - 1)
+                    if values:
+                        pipe.rpush(transcript_key, *values)
+                    if ex is not None:
+                        pipe.expire(transcript_key, ex)
+                    pipe.execute()
+                except self._watch_error:
+                    # Another worker wrote between WATCH and EXEC; unconditional saves retry
+                    if expected_revision is None:
+                        continue
+                    current, _ = self._unpack(self._client.get(key))
+                    raise StateConflictError(conversation_id, expected_revision, current) from None
+            state["revision"] = current + 1
+            return
+
+    def delete(self, conversation_id: str):
+        self._client.delete(self._key(conversation_id), self._transcript_key(conversation_id))
+
+    def add_usage(self, day: str, counts: Dict[Tuple[str, str], Dict[str, float]]) -> None:
+        key = f"{self.usage_prefix}{day}"
+        with self._client.pipeline() as pipe:
+            pipe.sadd(f"{self.usage_prefix}days", day)
+            for (agent, model), values in counts.items():
+                for metric, value in values.items():
+                    field = _USAGE_SEP.join((agent, model, metric))
+                    if isinstance(value, int):
+                        pipe.hincrby(key, field, value)
+                    else:
+                        pipe.hincrbyfloat(key, field, value)
+            pipe.execute()
+
+    def usage(self) -> List[UsageRow]:
+        members = self._client.smembers(f"{self.usage_prefix}days")
+        days = sorted(d.decode() if isinstance(d, bytes) else d for d in members)
+        rows = []
+        for day in days:
+            for field, value in self._client.hgetall(f"{self.usage_prefix}{day}").items():
+                field = field.decode() if isinstance(field, bytes) else field
+                value = value.decode() if isinstance(value, bytes) else value
+                agent, model, metric = field.split(_USAGE_SEP)
+                rows.append((day, agent, model, metric, float(value) if "." in value else int(value)))
+        return _usage_rows(rows)
+
+# =========================
+# Configuration
+# =========================
+
+def create_conversation_store() -> ConversationStore:
+    """Build the conversation store selected by environment variables.
+
+    CONVERSATION_STORE: ``memory`` (default), ``sqlite`` or ``redis``.
+    CONVERSATION_STORE_URL: SQLite file path or Redis URL.
+    CONVERSATION_TTL_SECONDS: idle lifetime of a conversation (0 disables expiry).
+    CONVERSATION_MAX_ENTRIES: LRU bound for the in-memory store.
+    """
+    backend = os.getenv("CONVERSATION_STORE", "memory").lower()
+    url = os.getenv("CONVERSATION_STORE_URL")
+    ttl = float(os.getenv("CONVERSATION_TTL_SECONDS", 24 * 3600)) or None
+
+    if backend == "sqlite":
+        store: ConversationStore = SQLiteConversationStore(url or "conversations.db", ttl_seconds=ttl)
+    elif backend == "redis":
+        store = RedisConversationStore(url or "redis://localhost:6379/0", ttl_seconds=ttl)
+    elif backend == "memory":
+        max_entries = int(os.getenv("CONVERSATION_MAX_ENTRIES", 10_000))
+        store = InMemoryConversationStore(max_entries=max_entries, ttl_seconds=ttl)
+    else:
+        raise ValueError(f"Unknown CONVERSATION_STORE backend: {backend}")
+
+    logger.info("Using %s conversation store", type(store).__name__)
+    return store
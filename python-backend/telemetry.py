@@ -0,0 +1,308 @@
+from __future__ import annotations as _annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from agents import TracingProcessor, custom_span, set_trace_processors
+from agents.tracing.processor_interface import TracingExporter
+from agents.tracing.processors import BatchTraceProcessor, default_processor
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Metrics
+# =========================
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = _labels(self.label_names, labels, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.label_names, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:g}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry (per process)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "agent_stage_duration_seconds",
+    "Duration of agent run stages (agent, guardrail, generation, function, handoff, custom).",
+    labels=("stage", "name"),
+)
+STAGE_ERRORS = metrics.counter("agent_stage_errors_total", "Agent run stages that ended with an error.", labels=("stage", "name"))
+HTTP_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", labels=("method", "path", "status")
+)
+LOCK_WAIT_SECONDS = metrics.histogram("conversation_lock_wait_seconds", "Time spent waiting for a conversation lock.")
+CHAT_TURNS = metrics.counter("chat_turns_total", "Chat turns by outcome.", labels=("outcome",))
+
+# =========================
+# Span processing
+# =========================
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def span_name(span: Any) -> str:
+    data = span.span_data
+    if data.type == "handoff":
+        return f"{data.from_agent} -> {data.to_agent}"
+    if data.type == "generation":
+        return str(data.model or "")
+    if data.type == "response":
+        response = getattr(data, "response", None)
+        return str(getattr(response, "model", "") or "")
+    return str(getattr(data, "name", "") or "")
+
+class MetricsProcessor(TracingProcessor):
+    """Feeds span durations into the Prometheus histograms.
+
+    Also keeps a per-trace breakdown so a request can report where its own
+    time went (see turn_timings()); breakdowns are dropped when the trace ends.
+    """
+
+    def __init__(self):
+        self._turns: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def on_trace_start(self, trace: Any) -> None:
+        pass
+
+    def on_trace_end(self, trace: Any) -> None:
+        with self._lock:
+            self._turns.pop(trace.trace_id, None)
+
+    def on_span_start(self, span: Any) -> None:
+        pass
+
+    def on_span_end(self, span: Any) -> None:
+        start, end = _timestamp(span.started_at), _timestamp(span.ended_at)
+        if start is None or end is None:
+            return
+        stage, name = span.span_data.type, span_name(span)
+        STAGE_SECONDS.observe(end - start, stage, name)
+        if span.error:
+            STAGE_ERRORS.inc(stage, name)
+        key = f"{stage}:{name}" if name else stage
+        with self._lock:
+            turn = self._turns.setdefault(span.trace_id, defaultdict(float))
+            turn[key] += end - start
+
+    def turn_timings(self, trace_id: str) -> Dict[str, float]:
+        """Milliseconds per stage recorded so far for a trace."""
+        with self._lock:
+            turn = dict(self._turns.get(trace_id, {}))
+        return {key: round(seconds * 1000, 1) for key, seconds in sorted(turn.items())}
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+metrics_processor = MetricsProcessor()
+
+def traced_hook(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Run a handoff hook inside a custom span named after it."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with custom_span(fn.__name__):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+# =========================
+# Exporters
+# =========================
+
+class FileSpanExporter(TracingExporter):
+    """Append traces and spans as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, items: list) -> None:
+        lines = [json.dumps(item.export(), default=str) for item in items if item.export()]
+        if not lines:
+            return
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+def _unix_nanos(value: Optional[str]) -> str:
+    ts = _timestamp(value)
+    return str(int(ts * 1e9)) if ts is not None else "0"
+
+def _otlp_id(value: Optional[str], length: int) -> str:
+    # SDK ids look like "trace_<hex>" / "span_<hex>"; OTLP wants fixed-width hex
+    raw = (value or "").split("_", 1)[-1]
+    return raw[:length].rjust(length, "0") if raw else ""
+
+def _otlp_attributes(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    attributes = []
+    for key, value in data.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            wrapped = {"boolValue": value}
+        elif isinstance(value, int):
+            wrapped = {"intValue": str(value)}
+        elif isinstance(value, float):
+            wrapped = {"doubleValue": value}
+        elif isinstance(value, str):
+            wrapped = {"stringValue": value}
+        else:
+            wrapped = {"stringValue": json.dumps(value, default=str)}
+        attributes.append({"key": f"agents.{key}", "value": wrapped})
+    return attributes
+
+class OtlpHttpExporter(TracingExporter):
+    """Send spans to an OpenTelemetry collector over OTLP/HTTP (JSON encoding)."""
+
+    def __init__(self, endpoint: str, service_name: str = "health-wellness-planner", timeout: float = 5.0):
+        import httpx
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(timeout=timeout)
+
+    def _span(self, exported: Dict[str, Any]) -> Dict[str, Any]:
+        data = exported.get("span_data") or {}
+        name = data.get("name") or data.get("type", "span")
+        span: Dict[str, Any] = {
+            "traceId": _otlp_id(exported.get("trace_id"), 32),
+            "spanId": _otlp_id(exported.get("id"), 16),
+            "name": f"{data.get('type', 'span')} {name}" if data.get("name") else name,
+            "kind": 1,
+            "startTimeUnixNano": _unix_nanos(exported.get("started_at")),
+            "endTimeUnixNano": _unix_nanos(exported.get("ended_at")),
+            "attributes": _otlp_attributes(data),
+        }
+        if exported.get("parent_id"):
+            span["parentSpanId"] = _otlp_id(exported["parent_id"], 16)
+        if exported.get("error"):
+            span["status"] = {"code": 2, "message": str(exported["error"].get("message", ""))}
+        return span
+
+    def export(self, items: list) -> None:
+        spans = []
+        for item in items:
+            exported = item.export()
+            if exported and exported.get("object") == "trace.span":
+                spans.append(self._span(exported))
+        if not spans:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "openai-agents"}, "spans": spans}],
+            }]
+        }
+        try:
+            self._client.post(self.endpoint, json=payload).raise_for_status()
+        except Exception:
+            logger.warning("Exporting %d spans to %s failed", len(spans), self.endpoint, exc_info=True)
+
+# =========================
+# Configuration
+# =========================
+
+def configure_tracing() -> None:
+    """Install trace processors selected by TRACE_EXPORT.
+
+    TRACE_EXPORT: ``openai`` (default, the SDK's trace dashboard), ``file``,
+    ``otlp`` or ``none``. Metrics are recorded in every mode.
+    TRACE_EXPORT_PATH: JSON-lines file for ``file`` (default traces.jsonl).
+    TRACE_OTLP_ENDPOINT: collector URL for ``otlp`` (default http://localhost:4318/v1/traces).
+    """
+    mode = os.getenv("TRACE_EXPORT", "openai").lower()
+    processors: List[TracingProcessor] = [metrics_processor]
+    if mode == "openai":
+        processors.append(default_processor())
+    elif mode == "file":
+        processors.append(BatchTraceProcessor(FileSpanExporter(os.getenv("TRACE_EXPORT_PATH", "traces.jsonl"))))
+    elif mode == "otlp":
+        endpoint = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+        processors.append(BatchTraceProcessor(OtlpHttpExporter(endpoint)))
+    elif mode != "none":
+        raise ValueError(f"Unknown TRACE_EXPORT mode: {mode}")
+    set_trace_processors(processors)
+    logger.info("Trace export: %s", mode)
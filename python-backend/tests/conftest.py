@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+# Importing main builds the agents' clients; tests never make requests
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("TRACE_EXPORT", "none")
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Point the agents at bench fake models and turn the fast path off.
+
+    Returns ``install(relevant=True, guardrail_latency=0.0, latency=0.0)``.
+    ``guardrail_latency`` delays the relevance guardrail's verdict, which
+    then lands after the planner has answered and run its tools.
+    """
+    import fast_path
+    import main
+    from bench.fake_model import FakeModel
+
+    def install(relevant: bool = True, guardrail_latency: float = 0.0, latency: float = 0.0) -> FakeModel:
+        model = FakeModel(latency=latency, jitter=0)
+        for agent in (
+            main.main_planner_agent,
+            main.nutrition_expert_agent,
+            main.injury_support_agent,
+            main.escalation_agent,
+            main.goal_validation_agent,
+        ):
+            monkeypatch.setattr(agent, "model", model)
+        guardrail = FakeModel(latency=guardrail_latency, jitter=0, relevant=relevant)
+        monkeypatch.setattr(main.health_relevance_agent, "model", guardrail)
+        monkeypatch.setattr(fast_path, "FAST_PATH_ENABLED", False)
+        return model
+
+    return install
@@ -0,0 +1,101 @@
+from typing import Any, Callable, Dict, List, Optional
+
+class FakeWatchError(Exception):
+    pass
+
+class FakePipeline:
+    """MULTI/EXEC with WATCH: commands run immediately after watch() and are queued after multi()."""
+
+    def __init__(self, client: "FakeRedis"):
+        self._client = client
+        self._watched: Dict[str, int] = {}
+        self._immediate = False
+        self._queued: List[Any] = []
+
+    def __enter__(self) -> "FakePipeline":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._watched.clear()
+        self._queued.clear()
+
+    def watch(self, *keys: str) -> None:
+        self._immediate = True
+        self._watched = {key: self._client.versions.get(key, 0) for key in keys}
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    def execute(self) -> List[Any]:
+        if self._client.before_exec is not None:
+            self._client.before_exec()
+        if any(self._client.versions.get(key, 0) != version for key, version in self._watched.items()):
+            raise FakeWatchError()
+        return [fn(*args, **kwargs) for fn, args, kwargs in self._queued]
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        command = getattr(self._client, name)
+        if self._immediate:
+            return command
+        return lambda *args, **kwargs: self._queued.append((command, args, kwargs))
+
+class FakeRedis:
+    """The subset of redis.Redis that RedisConversationStore uses, in memory."""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        # key -> write count, for WATCH
+        self.versions: Dict[str, int] = {}
+        # Called at the start of every EXEC; lets a test write in between WATCH and EXEC
+        self.before_exec: Optional[Callable[[], None]] = None
+
+    def _write(self, key: str) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline(self)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.data.get(key)
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        self.data[key] = value
+        self._write(key)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                self._write(key)
+
+    def expire(self, key: str, seconds: int) -> None:
+        pass
+
+    def rpush(self, key: str, *values: bytes) -> None:
+        self.data.setdefault(key, []).extend(values)
+        self._write(key)
+
+    def lrange(self, key: str, start: int, end: int) -> List[bytes]:
+        values = self.data.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def ltrim(self, key: str, start: int, end: int) -> None:
+        if key in self.data:
+            self.data[key] = self.data[key][start:] if end == -1 else self.data[key][start:end + 1]
+            self._write(key)
+
+    def sadd(self, key: str, *members: str) -> None:
+        self.data.setdefault(key, set()).update(members)
+
+    def smembers(self, key: str) -> set:
+        return {member.encode() for member in self.data.get(key, set())}
+
+    def hincrby(self, key: str, field: str, amount: int) -> None:
+        fields = self.data.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, "0")) + amount)
+
+    def hincrbyfloat(self, key: str, field: str, amount: float) -> None:
+        fields = self.data.setdefault(key, {})
+        fields[field] = repr(float(fields.get(field, "0")) + amount)
+
+    def hgetall(self, key: str) -> Dict[bytes, bytes]:
+        return {field.encode(): value.encode() for field, value in self.data.get(key, {}).items()}
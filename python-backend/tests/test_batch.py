@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import api
+from batch import RateLimiter, run_batch
+
+def _collect(items, handler, **kwargs):
+    async def run():
+        return [result async for result in run_batch(items, handler, **kwargs)]
+
+    return asyncio.run(run())
+
+def test_failing_items_dont_affect_the_others():
+    async def handler(item):
+        if item["message"] == "bad":
+            raise RuntimeError("boom")
+        return 200, {"echo": item["message"]}
+
+    items = [{"message": m} for m in ("a", "bad", "c")]
+    results = sorted(_collect(items, handler), key=lambda r: r["index"])
+    assert [r["status"] for r in results] == [200, 500, 200]
+    assert results[1]["error"] == "boom"
+    assert [r.get("echo") for r in results] == ["a", None, "c"]
+
+def test_concurrency_is_bounded():
+    running, peak = 0, 0
+
+    async def handler(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return 200, {}
+
+    results = _collect([{"message": str(i)} for i in range(10)], handler, concurrency=3)
+    assert len(results) == 10
+    assert peak == 3
+
+def test_results_stream_as_they_finish_with_their_index():
+    async def handler(item):
+        await asyncio.sleep(item["delay"])
+        return 200, {}
+
+    items = [{"delay": 0.1}, {"delay": 0.0}, {"delay": 0.05}]
+    assert [r["index"] for r in _collect(items, handler, concurrency=3)] == [1, 2, 0]
+
+def test_one_conversation_runs_in_input_order():
+    log = []
+
+    async def handler(item):
+        log.append(("start", item["message"]))
+        await asyncio.sleep(0.01)
+        log.append(("end", item["message"]))
+        return 200, {}
+
+    items = [{"conversation_id": "a", "message": str(i)} for i in range(3)] + [{"message": "new"}]
+    _collect(items, handler, concurrency=4)
+    turns = [entry for entry in log if entry[1] != "new"]
+    assert turns == [(step, str(i)) for i in range(3) for step in ("start", "end")]
+
+def test_rate_limiter_spaces_out_acquisitions():
+    limiter = RateLimiter(rate=50, burst=1)
+
+    async def run():
+        started = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    # The first is free; the next two wait 1/50 s each
+    assert asyncio.run(run()) >= 0.035
+
+def _lines(response):
+    return sorted((json.loads(line) for line in response.text.splitlines() if line), key=lambda r: r["index"])
+
+def test_batch_endpoint_reports_each_item(fake_models):
+    fake_models()
+    client = TestClient(api.app)
+    cid = client.post("/chat", json={"message": ""}).json()["conversation_id"]
+    items = [
+        {"conversation_id": cid, "message": "what should I eat after a long walk"},
+        {"conversation_id": cid},
+        {"message": "thanks!"},
+    ]
+    results = _lines(client.post("/chat/batch", json={"items": items, "concurrency": 2}))
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert [r["status"] for r in results] == [200, 422, 200]
+    assert results[0]["conversation_id"] == cid
+    assert results[0]["response"]["messages"]
+    assert results[2]["conversation_id"] != cid
+
+def test_batch_endpoint_limits_the_batch_size(monkeypatch):
+    monkeypatch.setattr(api, "BATCH_MAX_ITEMS", 2)
+    response = TestClient(api.app).post("/chat/batch", json={"items": [{"message": "hi"}] * 3})
+    assert response.status_code == 413
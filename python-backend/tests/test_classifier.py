@@ -0,0 +1,35 @@
+import pytest
+
+from classifier import classify_relevance
+
+@pytest.mark.parametrize("message", [
+    "back up my laptop",
+    "what's the water level in the reservoir",
+    "set a goal for my sales team",
+    "I need a coach for my chess game",
+    "reduce the weight of my docker image",
+    "exercise caution when deploying on friday",
+    "my gym bag zipper is broken",
+    "binge-watching a marathon of my favourite show",
+])
+def test_everyday_words_alone_defer_to_the_model(message):
+    assert classify_relevance(message) is None
+
+@pytest.mark.parametrize("message", ["how do I run a python script", "what's the bitcoin price"])
+def test_off_topic_requests_are_refused(message):
+    relevant, _ = classify_relevance(message)
+    assert relevant is False
+
+@pytest.mark.parametrize("message", [
+    "my back hurts after running",
+    "I want to run 5km",
+    "can you make me a vegetarian meal plan",
+    "how much protein should I eat",
+    "my knee is sore",
+    "I want to lose weight",
+    "what exercises help a sore shoulder",
+    "I weigh 80 kg and want to get fit",
+])
+def test_health_messages_are_allowed(message):
+    relevant, _ = classify_relevance(message)
+    assert relevant is True
@@ -0,0 +1,141 @@
+import json
+import zlib
+
+import pytest
+
+import codec
+from main import create_initial_context
+from store import ConversationState, deserialize_state, serialize_state
+
+ITEMS = [
+    {"role": "user", "content": "I want to lose 5kg in 2 months"},
+    {"id": "msg_1", "type": "message", "role": "assistant", "status": "completed",
+     "content": [{"type": "output_text", "text": "Here is a plan. " * 20, "annotations": [], "logprobs": []}]},
+]
+
+@pytest.fixture(params=["msgpack", "json"])
+def body_format(request, monkeypatch):
+    if request.param == "msgpack":
+        if codec.msgpack is None:
+            pytest.skip("msgpack is not installed")
+    else:
+        monkeypatch.setattr(codec, "msgpack", None)
+    return request.param
+
+def _state():
+    context = create_initial_context()
+    context.name = "Sam"
+    context.goal = {"objective": "weight loss", "quantity": 5.0, "metric": "kg", "duration": "2 months"}
+    context.progress_logs.append({"date": "2026-10-01", "type": "weight", "value": 80.0})
+    return {
+        "current_agent": "Nutrition Expert Agent",
+        "context": context,
+        "input_items": list(ITEMS),
+        "usage": {"requests": 2, "input_tokens": 1200, "output_tokens": 90, "cached_tokens": 0, "cost_usd": 0.01},
+    }
+
+def _assert_same(loaded, state):
+    assert loaded["current_agent"] == state["current_agent"]
+    assert loaded["context"].model_dump() == state["context"].model_dump()
+    assert loaded["input_items"] == state["input_items"]
+    assert loaded.get("usage") == state.get("usage")
+
+def test_section_round_trip(body_format):
+    blob = codec.encode({codec.SECTION_META: {"current_agent": "x"}, codec.SECTION_ITEMS: ITEMS})
+    assert codec.is_encoded(blob)
+    dictionary_id, sections = codec.split(blob)
+    assert dictionary_id == codec.DICTIONARY_ID
+    assert codec.decode_section(sections[codec.SECTION_META], dictionary_id) == {"current_agent": "x"}
+    assert codec.decode_section(sections[codec.SECTION_ITEMS], dictionary_id) == ITEMS
+
+def test_small_sections_are_not_deflated(body_format):
+    framed = codec.encode_section(codec.SECTION_META, {"a": 1})
+    assert not framed[1] & codec._FLAG_DEFLATE
+    assert codec.encode_section(codec.SECTION_ITEMS, ITEMS)[1] & codec._FLAG_DEFLATE
+
+def test_state_round_trip(body_format):
+    state = _state()
+    _assert_same(deserialize_state(serialize_state(state)), state)
+
+def test_reads_blobs_written_without_msgpack():
+    if codec.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    state = _state()
+    msgpack = codec.msgpack
+    codec.msgpack = None
+    try:
+        blob = serialize_state(state)
+    finally:
+        codec.msgpack = msgpack
+    _assert_same(deserialize_state(blob), state)
+
+def test_msgpack_blob_without_msgpack_installed_says_so(monkeypatch):
+    framed = codec._SECTION.pack(codec.SECTION_META, codec._FLAG_MSGPACK, 1) + b"\x80"
+    monkeypatch.setattr(codec, "msgpack", None)
+    with pytest.raises(RuntimeError, match="pip install msgpack"):
+        codec.decode_section(framed, codec.DICTIONARY_ID)
+
+@pytest.mark.parametrize("tag, compress", [(b"j", lambda body: body), (b"z", zlib.compress)])
+def test_reads_legacy_blobs(tag, compress):
+    state = _state()
+    payload = {
+        "current_agent": state["current_agent"],
+        "context": state["context"].model_dump(),
+        "input_items": state["input_items"],
+        "usage": state["usage"],
+    }
+    _assert_same(deserialize_state(tag + compress(json.dumps(payload).encode("utf-8"))), state)
+
+def test_unknown_legacy_tag_is_rejected():
+    with pytest.raises(ValueError, match="Unknown conversation state encoding"):
+        deserialize_state(b"x{}")
+
+def test_untouched_items_are_written_back_byte_identical(body_format):
+    blob = serialize_state(_state())
+    loaded = deserialize_state(blob)
+    assert isinstance(loaded, ConversationState)
+    loaded["context"].name = "Alex"
+    assert not loaded.items_loaded()
+    resaved = serialize_state(loaded)
+    assert codec.split(resaved)[1][codec.SECTION_ITEMS] == codec.split(blob)[1][codec.SECTION_ITEMS]
+    assert deserialize_state(resaved)["context"].name == "Alex"
+
+def test_loaded_items_are_re_encoded(body_format):
+    loaded = deserialize_state(serialize_state(_state()))
+    loaded["input_items"].append({"role": "user", "content": "thanks"})
+    assert deserialize_state(serialize_state(loaded))["input_items"][-1] == {"role": "user", "content": "thanks"}
+
+def test_newer_format_is_rejected():
+    blob = bytearray(serialize_state(_state()))
+    blob[1] = codec.FORMAT_VERSION + 1
+    with pytest.raises(ValueError, match="newer than this code"):
+        deserialize_state(bytes(blob))
+
+def test_unknown_dictionary_is_rejected():
+    blob = bytearray(serialize_state(_state()))
+    blob[2] = max(codec._DICTIONARIES) + 1
+    with pytest.raises(ValueError, match="Unknown conversation state dictionary"):
+        deserialize_state(bytes(blob))
+
+def test_migrations_run_in_order(monkeypatch):
+    monkeypatch.setattr(codec, "SCHEMA_VERSION", 3)
+    monkeypatch.setattr(codec, "_MIGRATIONS", {})
+
+    @codec.migration(1)
+    def rename_notes(meta, context):
+        context["injury_notes"] = context.pop("notes", "")
+
+    @codec.migration(2)
+    def default_agent(meta, context):
+        meta.setdefault("current_agent", "Health & Wellness Planner")
+
+    meta, context = {"schema": 1}, {"notes": "sore knee"}
+    codec.migrate(meta, context)
+    assert meta == {"schema": 3, "current_agent": "Health & Wellness Planner"}
+    assert context == {"injury_notes": "sore knee"}
+
+def test_missing_migration_is_an_error(monkeypatch):
+    monkeypatch.setattr(codec, "SCHEMA_VERSION", 2)
+    monkeypatch.setattr(codec, "_MIGRATIONS", {})
+    with pytest.raises(ValueError, match="No migration from conversation schema 1"):
+        codec.migrate({"schema": 1}, {})
@@ -0,0 +1,75 @@
+from compaction import MAX_REQUEST_CHARS, MAX_SUMMARY_REQUESTS, SUMMARY_MARKER, _split_turns, compact_input_items
+from main import create_initial_context
+
+def _turn(n, tool=None):
+    """A user message, optionally a tool call and its output, then the reply."""
+    items = [{"role": "user", "content": f"request {n}"}]
+    if tool:
+        items += [
+            {"type": "function_call", "call_id": f"call_{n}", "name": tool, "arguments": "{}"},
+            {"type": "function_call_output", "call_id": f"call_{n}", "output": "x" * 200},
+        ]
+    return items + [{"role": "assistant", "content": f"reply {n} " + "y" * 200}]
+
+def _conversation(turns, tool="meal_planner_tool"):
+    return [item for n in range(turns) for item in _turn(n, tool if n % 2 else None)]
+
+def _requests(items):
+    return [item["content"] for item in items if item.get("role") == "user"]
+
+def test_under_the_budget_nothing_changes():
+    items = _conversation(6)
+    assert compact_input_items(items, create_initial_context(), token_budget=100_000) is items
+
+def test_turns_keep_tool_calls_with_their_outputs():
+    turns = _split_turns(_conversation(4))
+    assert [len(turn) for turn in turns] == [2, 4, 2, 4]
+    assert [turn[1].get("type") for turn in turns if len(turn) == 4] == ["function_call", "function_call"]
+    assert all(turn[2]["call_id"] == turn[1]["call_id"] for turn in turns if len(turn) == 4)
+
+def test_folds_whole_turns_until_it_fits():
+    items = _conversation(10)
+    compacted = compact_input_items(items, create_initial_context(), token_budget=1000, keep_turns=2)
+    summary, recent = compacted[0], compacted[1:]
+    assert summary["role"] == "system" and summary["content"].startswith(SUMMARY_MARKER)
+    # What's left is an unchanged suffix that starts at a user message
+    assert recent == items[len(items) - len(recent):]
+    assert recent[0]["role"] == "user"
+    assert sum(len(str(i)) for i in recent) < sum(len(str(i)) for i in items)
+
+def test_keep_turns_wins_over_the_budget():
+    items = _conversation(10)
+    compacted = compact_input_items(items, create_initial_context(), token_budget=1, keep_turns=3)
+    assert _requests(compacted[1:]) == ["request 7", "request 8", "request 9"]
+    assert compact_input_items(items[:6], create_initial_context(), token_budget=1, keep_turns=3) == items[:6]
+
+def test_summary_describes_folded_turns_and_the_context():
+    ctx = create_initial_context()
+    ctx.name = "Sam"
+    ctx.goal = {"objective": "weight loss", "quantity": 5, "metric": "kg", "duration": "2 months"}
+    items = _conversation(6)
+    content = compact_input_items(items, ctx, token_budget=1, keep_turns=2)[0]["content"]
+    assert "User name: Sam" in content
+    assert "Goal: weight loss - 5 kg in 2 months" in content
+    assert "Tools already used: meal_planner_tool" in content
+    assert [line for line in content.splitlines() if line.startswith("- ")] == [f"- request {n}" for n in range(4)]
+
+def test_summary_carries_forward_across_compactions():
+    ctx = create_initial_context()
+    first = compact_input_items(_conversation(6), ctx, token_budget=1, keep_turns=2)
+    later = first + [item for n in range(6, 9) for item in _turn(n, "workout_recommender_tool")]
+    second = compact_input_items(later, ctx, token_budget=1, keep_turns=2)
+    content = second[0]["content"]
+    # One summary, not a summary of a summary
+    assert content.count(SUMMARY_MARKER) == 1
+    assert [line for line in content.splitlines() if line.startswith("- ")] == [f"- request {n}" for n in range(7)]
+    assert "Tools already used: meal_planner_tool, workout_recommender_tool" in content
+    assert _requests(second[1:]) == ["request 7", "request 8"]
+
+def test_summary_keeps_the_latest_requests_trimmed():
+    items = [{"role": "user", "content": f"{n} " + "z" * 500} for n in range(MAX_SUMMARY_REQUESTS + 5)]
+    content = compact_input_items(items, create_initial_context(), token_budget=1, keep_turns=1)[0]["content"]
+    requests = [line[2:] for line in content.splitlines() if line.startswith("- ")]
+    assert len(requests) == MAX_SUMMARY_REQUESTS
+    assert requests[0].startswith("4 ")
+    assert all(len(r) == MAX_REQUEST_CHARS for r in requests)
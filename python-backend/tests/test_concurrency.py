@@ -0,0 +1,132 @@
+import asyncio
+
+import httpx
+import pytest
+
+import api
+from concurrency import ConversationBusyError, ConversationLocks, TurnCoalescer
+
+def test_turns_on_one_conversation_run_one_at_a_time():
+    locks = ConversationLocks()
+    log = []
+
+    async def turn(name, conversation_id="c"):
+        async with locks.hold(conversation_id):
+            log.append(f"{name} start")
+            await asyncio.sleep(0.02)
+            log.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(turn("a"), turn("b"), turn("other", "d"))
+
+    asyncio.run(run())
+    assert log.index("a end") < log.index("b start")
+    # Another conversation doesn't wait
+    assert log.index("other start") < log.index("a end")
+    assert len(locks) == 0
+
+def test_full_queue_is_rejected():
+    locks = ConversationLocks(max_waiters=1)
+
+    async def hold(release):
+        async with locks.hold("c"):
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        running = [asyncio.create_task(hold(release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ConversationBusyError, match="too many pending requests"):
+            async with locks.hold("c"):
+                pass
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(run())
+    assert len(locks) == 0
+
+def test_wait_times_out():
+    locks = ConversationLocks(wait_timeout=0.02)
+
+    async def run():
+        async with locks.hold("c"):
+            with pytest.raises(ConversationBusyError, match="Timed out"):
+                async with locks.hold("c"):
+                    pass
+
+    asyncio.run(run())
+    assert len(locks) == 0
+
+def test_new_conversations_never_wait():
+    locks = ConversationLocks(max_waiters=0, wait_timeout=0.01)
+
+    async def run():
+        async with locks.hold(None):
+            async with locks.hold(None):
+                return True
+
+    assert asyncio.run(run())
+
+def test_identical_requests_share_one_run():
+    coalescer = TurnCoalescer()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(coalescer.run("k", work), coalescer.run("k", work), coalescer.run(None, work))
+
+    assert asyncio.run(run()) == ["result"] * 3
+    # The None key is never coalesced
+    assert len(calls) == 2
+    assert coalescer.stats() == {"in_flight": 0, "coalesced": 1}
+
+def test_coalesced_requests_share_the_error():
+    coalescer = TurnCoalescer()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(coalescer.run("k", work), coalescer.run("k", work), return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(run())] == ["boom", "boom"]
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test")
+
+def test_chat_waiting_too_long_gets_429(monkeypatch):
+    locks = ConversationLocks(wait_timeout=0.02)
+    monkeypatch.setattr(api, "conversation_locks", locks)
+
+    async def run():
+        async with _client() as client:
+            cid = (await client.post("/chat", json={"message": ""})).json()["conversation_id"]
+            async with locks.hold(cid):
+                return await client.post("/chat", json={"conversation_id": cid, "message": "hi"})
+
+    response = asyncio.run(run())
+    assert response.status_code == 429
+    assert "Timed out" in response.json()["error"]
+
+def test_duplicate_chat_submits_run_the_model_once(monkeypatch, fake_models):
+    model = fake_models(latency=0.05)
+    monkeypatch.setattr(api, "turn_coalescer", TurnCoalescer())
+    body = {"message": "what should I eat after a long walk"}
+
+    async def run():
+        async with _client() as client:
+            body["conversation_id"] = (await client.post("/chat", json={"message": ""})).json()["conversation_id"]
+            calls = model.calls
+            first, second = await asyncio.gather(client.post("/chat", json=body), client.post("/chat", json=body))
+            return first.json(), second.json(), model.calls - calls
+
+    first, second, calls = asyncio.run(run())
+    assert first == second
+    # Not a goal, so the planner's answer is the only call
+    assert calls == 1
+    assert api.turn_coalescer.stats()["coalesced"] == 1
@@ -0,0 +1,82 @@
+from fastapi.testclient import TestClient
+
+import api
+from main import PROGRESS_WINDOW, create_initial_context, track_progress
+
+def test_commit_reports_only_what_changed():
+    ctx = create_initial_context()
+    ctx.commit()
+    ctx.name = "Sam"
+    ctx.diet_preferences = None  # assigned, but unchanged
+    ctx.log_handoff("Handed off to Nutrition Expert Agent")
+    changes, appends = ctx.commit()
+    assert changes == {"name": "Sam"}
+    assert appends == {"handoff_logs": ["Handed off to Nutrition Expert Agent"]}
+    assert ctx.version == 2
+    # Nothing since the last commit
+    assert ctx.commit() == ({}, {})
+    assert ctx.version == 2
+
+def test_reassigning_an_appended_log_reports_the_whole_field():
+    ctx = create_initial_context()
+    ctx.commit()
+    ctx.log_handoff("first")
+    ctx.handoff_logs = ctx.handoff_logs[-1:]
+    changes, appends = ctx.commit()
+    assert changes == {"handoff_logs": ["first"]}
+    assert appends == {}
+
+def test_rollback_restores_fields_and_logs():
+    ctx = create_initial_context()
+    ctx.name = "Sam"
+    ctx.goal = {"objective": "weight loss"}
+    ctx.log_handoff("kept")
+    ctx.commit()
+    ctx.name = "Alex"
+    ctx.goal = None
+    ctx.meal_plan = ["Day 1: oats"]
+    ctx.log_handoff("dropped")
+    track_progress(ctx, "Weight 80kg", 80)
+    ctx.rollback()
+    assert (ctx.name, ctx.goal, ctx.meal_plan) == ("Sam", {"objective": "weight loss"}, None)
+    assert ctx.handoff_logs == ["kept"]
+    assert ctx.progress_logs == []
+    assert ctx.take_progress() == []
+    assert ctx.commit() == ({}, {})
+
+def test_rollback_restores_a_full_progress_window():
+    ctx = create_initial_context()
+    for value in range(PROGRESS_WINDOW):
+        track_progress(ctx, "Weight", value)
+    ctx.commit()
+    before = list(ctx.progress_logs)
+    # A full window is reassigned, not appended to
+    track_progress(ctx, "Weight", 99)
+    assert ctx.progress_logs[-1]["value"] == 99
+    ctx.rollback()
+    assert ctx.progress_logs == before
+
+def test_response_carries_a_delta_for_the_clients_version():
+    client = TestClient(api.app)
+    start = client.post("/chat", json={"message": ""}).json()
+    cid, version = start["conversation_id"], start["context_version"]
+    body = client.post("/chat", json={"conversation_id": cid, "message": "call me Sam", "context_version": version}).json()
+    assert body["context_delta"] == {"name": "Sam"}
+    assert body["context"] is None
+    assert body["context_version"] == version + 1
+    # A client on an older version, or none, gets the full context
+    body = client.post("/chat", json={"conversation_id": cid, "message": "my name is Alex", "context_version": version}).json()
+    assert body["context"]["name"] == "Alex"
+    assert body["context_version"] == version + 2
+
+def test_refused_turn_rolls_back_tool_changes(fake_models):
+    # The planner calls set_user_name before the guardrail trips
+    fake_models(relevant=False, guardrail_latency=0.2)
+    client = TestClient(api.app)
+    start = client.post("/chat", json={"message": ""}).json()
+    cid, version = start["conversation_id"], start["context_version"]
+    body = client.post("/chat", json={"conversation_id": cid, "message": "i'm sam", "context_version": version}).json()
+    assert not all(check["passed"] for check in body["guardrails"])
+    assert body["context_delta"] == {}
+    assert body["context_version"] == version
+    assert api.conversation_store.get(cid)["context"].name is None
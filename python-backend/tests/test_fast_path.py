@@ -0,0 +1,76 @@
+import pytest
+
+from fast_path import route_intent
+from main import WELCOME_PROMPT, create_initial_context, main_planner_agent
+
+def _state(asked_for_name: bool = False):
+    items = [{"role": "assistant", "content": WELCOME_PROMPT}] if asked_for_name else []
+    return {"current_agent": main_planner_agent.name, "context": create_initial_context(), "input_items": items}
+
+@pytest.mark.parametrize("message", [
+    "is it safe to lose 20kg in 1 week?",
+    "I don't want to lose 5kg in 2 months",
+    "I never said I want to lose 5kg in 2 months",
+    "how would I lose 5kg in 2 months",
+    "should I lose 5kg in 2 months",
+])
+def test_goal_questions_and_negations_go_to_the_model(message):
+    state = _state()
+    assert route_intent(message, state) is None
+    assert not state["context"].goal
+
+@pytest.mark.parametrize("message", [
+    "I want to lose 5kg in 2 months and I have diabetes, make me a meal plan",
+    "My wife wants to lose 5kg in 2 months",
+    "Last year I managed to lose 10kg in 3 months",
+    "I want to lose 5kg in 2 months. Also, tell me about bitcoin",
+    "lose 5kg in 2 months",
+])
+def test_goals_with_anything_else_go_to_the_model(message):
+    state = _state()
+    assert route_intent(message, state) is None
+    assert not state["context"].goal
+
+@pytest.mark.parametrize("message", ["I want to lose 5kg in 2 months", "I'm going to run 10 km within 8 weeks!"])
+def test_goal_statement_is_set_locally(message):
+    state = _state()
+    result = route_intent(message, state)
+    assert result is not None and "I've set your goal" in result.reply
+    assert state["context"].goal
+
+@pytest.mark.parametrize("message", ["call me later", "call me maybe", "my name is not Sam"])
+def test_name_phrases_that_are_not_names(message):
+    state = _state()
+    assert route_intent(message, state) is None
+    assert state["context"].name is None
+
+@pytest.mark.parametrize("message", ["No thanks", "Later", "Running", "Help", "Pizza", "Sam"])
+def test_bare_replies_to_the_name_prompt_go_to_the_model(message):
+    state = _state(asked_for_name=True)
+    assert route_intent(message, state) is None
+    assert state["context"].name is None
+
+@pytest.mark.parametrize("message,name", [("call me sam", "Sam"), ("my name is Jo Ann", "Jo Ann")])
+def test_names_are_set_locally(message, name):
+    state = _state(asked_for_name=True)
+    result = route_intent(message, state)
+    assert result is not None and result.steps[0].tool_name == "set_user_name"
+    assert state["context"].name == name
+
+@pytest.mark.parametrize("message", ["log 80kg?", "don't log 80kg", "schedule a check-in?"])
+def test_hedged_tool_intents_go_to_the_model(message):
+    state = _state()
+    assert route_intent(message, state) is None
+    assert not state["context"].progress_logs
+
+@pytest.mark.parametrize("message", ["log 80", "I weigh 90", "track my progress at 12"])
+def test_progress_without_a_unit_goes_to_the_model(message):
+    state = _state()
+    assert route_intent(message, state) is None
+    assert not state["context"].progress_logs
+
+@pytest.mark.parametrize("message,value", [("log 80kg", 80), ("I weigh 90.5 lbs today", 90.5), ("track 8000 steps", 8000)])
+def test_progress_with_a_unit_is_logged_locally(message, value):
+    state = _state()
+    result = route_intent(message, state)
+    assert result is not None and result.steps[0].arguments["metric_value"] == value
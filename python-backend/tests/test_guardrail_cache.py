@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import guardrail_cache
+from guardrail_cache import VerdictCache
+from main import HealthRelevanceOutput
+
+VECTORS = {
+    "how much protein do i need": [1.0, 0.0, 0.0],
+    "how much protein should i eat": [0.99, 0.1, 0.0],
+    "what is the capital of france": [0.0, 0.0, 1.0],
+}
+
+@pytest.fixture(params=["numpy", "python"])
+def cache(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(guardrail_cache, "np", None)
+    elif guardrail_cache.np is None:
+        pytest.skip("numpy is not installed")
+    calls = []
+
+    async def embed(text):
+        calls.append(text)
+        return VECTORS[text]
+
+    cache = VerdictCache(embedder=embed, max_semantic_entries=2)
+    cache.calls = calls
+    return cache
+
+def _verdict(relevant=True):
+    return HealthRelevanceOutput(reasoning="test", is_relevant=relevant)
+
+def test_miss_embeds_once_and_similar_message_hits(cache):
+    async def run():
+        verdict, vector = await cache.get("relevance", "How much protein do I need?")
+        assert verdict is None and vector is not None
+        await cache.put("relevance", "How much protein do I need?", _verdict(), vector)
+        assert cache.calls == ["how much protein do i need"]
+        return await cache.get("relevance", "how much protein should I eat")
+
+    verdict, _ = asyncio.run(run())
+    assert verdict is not None and verdict.is_relevant
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_dissimilar_message_and_other_kind_miss(cache):
+    async def run():
+        _, vector = await cache.get("relevance", "how much protein do i need")
+        await cache.put("relevance", "how much protein do i need", _verdict(), vector)
+        other_kind, _ = await cache.get("goal", "how much protein should i eat")
+        dissimilar, _ = await cache.get("relevance", "what is the capital of france")
+        return other_kind, dissimilar
+
+    assert asyncio.run(run()) == (None, None)
+
+def test_semantic_tier_evicts_least_recently_embedded(cache):
+    async def run():
+        for text in VECTORS:
+            _, vector = await cache.get("relevance", text)
+            await cache.put("relevance", text, _verdict(), vector)
+        cache._entries.clear()
+        # The first message's vector was evicted, so only the near-duplicate can match
+        return await cache._nearest("relevance", guardrail_cache._unit(VECTORS["how much protein do i need"]))
+
+    best_text, score = asyncio.run(run())
+    assert best_text == "how much protein should i eat" and score > 0.95
+    assert cache.stats()["semantic_size"] == 2
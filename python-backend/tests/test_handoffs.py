@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from agents import RunContextWrapper
+
+from api import _handoff_events
+from handoffs import handoff_events
+from main import create_initial_context, main_planner_agent, nutrition_expert_agent
+
+def _invoke(source, target, context):
+    ho = next(h for h in source.handoffs if h.agent_name == target.name)
+    return ho.on_invoke_handoff(context, "")
+
+def _item(source, target):
+    return SimpleNamespace(source_agent=source, target_agent=target)
+
+def test_each_handoff_item_takes_its_own_route():
+    async def turn():
+        handoff_events.start_turn()
+        context = RunContextWrapper(create_initial_context())
+        # Runner.run fires both hooks before any item is turned into events
+        await _invoke(main_planner_agent, nutrition_expert_agent, context)
+        await _invoke(nutrition_expert_agent, main_planner_agent, context)
+        first = _handoff_events(_item(main_planner_agent, nutrition_expert_agent))
+        second = _handoff_events(_item(nutrition_expert_agent, main_planner_agent))
+        return first, second
+
+    first, second = asyncio.run(turn())
+    assert [(e.type, e.content) for e in first] == [
+        ("handoff", f"{main_planner_agent.name} -> {nutrition_expert_agent.name}"),
+        ("tool_call", "on_nutrition_expert_handoff"),
+    ]
+    assert [(e.type, e.content) for e in second] == [
+        ("handoff", f"{nutrition_expert_agent.name} -> {main_planner_agent.name}"),
+    ]
+
+def test_unpublished_handoff_falls_back_to_the_registry():
+    async def turn():
+        handoff_events.start_turn()
+        return _handoff_events(_item(main_planner_agent, nutrition_expert_agent))
+
+    events = asyncio.run(turn())
+    assert [e.type for e in events] == ["handoff", "tool_call"]
+    assert events[1].content == "on_nutrition_expert_handoff"
@@ -0,0 +1,84 @@
+from agents import RunContextWrapper
+
+from main import (
+    GOAL_PROMPT,
+    WELCOME_PROMPT,
+    create_initial_context,
+    escalation_agent,
+    escalation_agent_instructions,
+    main_planner_agent,
+    main_planner_instructions,
+    memoized_instructions,
+)
+
+def _counting(*fields):
+    calls = []
+
+    @memoized_instructions(*fields)
+    def instructions(run_context, agent):
+        calls.append(1)
+        return f"name={run_context.context.name} goal={run_context.context.goal}"
+
+    return instructions, calls
+
+def test_unchanged_context_reuses_the_rendered_text():
+    instructions, calls = _counting("name")
+    wrapper = RunContextWrapper(context=create_initial_context())
+    first = instructions(wrapper, None)
+    assert instructions(wrapper, None) is first
+    assert len(calls) == 1
+
+def test_a_listed_field_change_renders_again():
+    instructions, calls = _counting("name", "goal")
+    ctx = create_initial_context()
+    wrapper = RunContextWrapper(context=ctx)
+    instructions(wrapper, None)
+    ctx.name = "Sam"
+    assert instructions(wrapper, None) == "name=Sam goal=None"
+    ctx.goal = {"objective": "weight loss"}
+    assert instructions(wrapper, None) == "name=Sam goal={'objective': 'weight loss'}"
+    assert len(calls) == 3
+
+def test_other_fields_dont_invalidate():
+    instructions, calls = _counting("name")
+    ctx = create_initial_context()
+    wrapper = RunContextWrapper(context=ctx)
+    instructions(wrapper, None)
+    ctx.diet_preferences = "vegan"
+    ctx.log_handoff("Handed off to Nutrition Expert Agent")
+    instructions(wrapper, None)
+    assert len(calls) == 1
+
+def test_each_context_keeps_its_own_cache():
+    instructions, calls = _counting("name")
+    sam, alex = create_initial_context(), create_initial_context()
+    sam.name, alex.name = "Sam", "Alex"
+    assert instructions(RunContextWrapper(context=sam), None) == "name=Sam goal=None"
+    assert instructions(RunContextWrapper(context=alex), None) == "name=Alex goal=None"
+    assert len(calls) == 2
+
+def test_rollback_invalidates():
+    ctx = create_initial_context()
+    ctx.name = "Sam"
+    ctx.commit()
+    wrapper = RunContextWrapper(context=ctx)
+    ctx.name = "Alex"
+    assert "User: Alex" in escalation_agent_instructions(wrapper, escalation_agent)
+    ctx.rollback()
+    assert "User: Sam" in escalation_agent_instructions(wrapper, escalation_agent)
+
+def test_planner_instructions_follow_profile_edits():
+    ctx = create_initial_context()
+    wrapper = RunContextWrapper(context=ctx)
+    assert main_planner_instructions(wrapper, main_planner_agent) == WELCOME_PROMPT
+    ctx.name = "Sam"
+    assert main_planner_instructions(wrapper, main_planner_agent) == f"Hi Sam! {GOAL_PROMPT}"
+    ctx.goal = {"objective": "weight loss", "quantity": 5, "metric": "kg", "duration": "2 months"}
+    text = main_planner_instructions(wrapper, main_planner_agent)
+    assert "User: Sam" in text
+    assert "Goal: weight loss - 5 kg in 2 months" in text
+    ctx.injury_notes = "sore knee"
+    text = main_planner_instructions(wrapper, main_planner_agent)
+    assert "Injury considerations: sore knee" in text
+    ctx.name = "Alex"
+    assert "User: Alex" in main_planner_instructions(wrapper, main_planner_agent)
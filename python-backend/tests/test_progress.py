@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from main import create_initial_context, track_progress
+from progress_store import InMemoryProgressStore, SQLiteProgressStore
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "progress_store", InMemoryProgressStore())
+    return TestClient(api.app)
+
+def test_progress_is_stored_when_the_turn_is_saved(client):
+    cid = client.post("/chat", json={"message": ""}).json()["conversation_id"]
+    client.post("/chat", json={"conversation_id": cid, "message": "log 80kg"})
+    client.post("/chat", json={"conversation_id": cid, "message": "log 79.5kg"})
+    history = client.get(f"/progress/{cid}").json()
+    assert [r["value"] for r in history] == [80.0, 79.5]
+    assert client.get(f"/progress/{cid}/summary").json()["count"] == 2
+    assert client.get(f"/progress/{api.uuid4().hex}").json() == []
+
+def test_rolled_back_turn_leaves_no_history():
+    ctx = create_initial_context()
+    track_progress(ctx, "Weight 80kg", 80)
+    ctx.rollback()
+    assert ctx.take_progress() == []
+    assert ctx.progress_logs == []
+
+def test_pending_progress_survives_commit_until_taken():
+    ctx = create_initial_context()
+    track_progress(ctx, "Weight 80kg", 80)
+    ctx.commit()
+    assert [r.value for r in ctx.take_progress()] == [80.0]
+    assert ctx.take_progress() == []
+
+def test_sqlite_store_keys_by_conversation(tmp_path):
+    store = SQLiteProgressStore(str(tmp_path / "progress.db"))
+    ctx = create_initial_context()
+    track_progress(ctx, "Weight 80kg", 80)
+    track_progress(ctx, "Weight 79kg", 79)
+    store.extend("a" * 32, ctx.take_progress())
+    assert [r.value for r in store.range("a" * 32)] == [80.0, 79.0]
+    assert store.range("b" * 32) == []
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from agents import AgentOutputSchema, ModelResponse, Usage
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputRefusal, ResponseOutputText
+from pydantic import BaseModel
+
+import main
+from bench.fake_model import FakeModel, install_fake_model
+from routing import RoutedModel, escalation_reason
+from usage import current_turn, start_turn
+
+TOOLS = ["meal_planner_tool"]
+
+class Verdict(BaseModel):
+    is_relevant: bool
+
+def _message(*parts):
+    return ResponseOutputMessage(id="msg_1", type="message", role="assistant", status="completed", content=list(parts))
+
+def _text(text):
+    return _message(ResponseOutputText(type="output_text", text=text, annotations=[]))
+
+def _call(name="meal_planner_tool", arguments="{}"):
+    return ResponseFunctionToolCall(id="fc_1", call_id="call_1", type="function_call", name=name, arguments=arguments)
+
+def _response(*output):
+    return ModelResponse(output=list(output), usage=Usage(requests=1, input_tokens=100, output_tokens=10), response_id=None)
+
+@pytest.mark.parametrize("output, schema, reason", [
+    ([_message(ResponseOutputRefusal(type="refusal", refusal="I can't help with that."))], None, "refusal"),
+    ([_call("made_up_tool")], None, "unknown_tool"),
+    ([_call(arguments="{not json")], None, "invalid_tool_arguments"),
+    ([], None, "empty_output"),
+    ([_text("   ")], None, "empty_output"),
+    ([_text("definitely relevant")], AgentOutputSchema(Verdict), "invalid_structured_output"),
+    ([_text("I'm not sure, it's hard to say.")], None, "low_confidence"),
+])
+def test_escalation_reasons(output, schema, reason):
+    assert escalation_reason(_response(*output), schema, TOOLS) == reason
+
+@pytest.mark.parametrize("output, schema", [
+    ([_text("Drink water and sleep well.")], None),
+    ([_call(arguments='{"dietary_preferences": "vegan"}')], None),
+    ([_text('{"is_relevant": true}')], AgentOutputSchema(Verdict)),
+])
+def test_good_cheap_answers_are_kept(output, schema):
+    assert escalation_reason(_response(*output), schema, TOOLS) is None
+
+class ScriptedModel(FakeModel):
+    """Answers every call with the same text and counts calls."""
+
+    def __init__(self, text):
+        super().__init__(latency=0, jitter=0)
+        self.text = text
+
+    def _decide(self, input, tools, output_schema, handoffs):
+        return [_text(self.text)]
+
+def _routed(cheap_text="Sounds good!", strong_text="Here's a detailed answer."):
+    cheap, strong = ScriptedModel(cheap_text), ScriptedModel(strong_text)
+    return RoutedModel("Planner", "cheap-model", "strong-model", strong_model=strong, cheap_model=cheap), cheap, strong
+
+def _ask(routed, message):
+    async def run():
+        start_turn()
+        response = await routed.get_response(None, [{"role": "user", "content": message}], None, [], None, [], None)
+        return response, current_turn()
+
+    return asyncio.run(run())
+
+def _answer(response):
+    return response.output[0].content[0].text
+
+def test_easy_turn_stays_on_the_cheap_model():
+    routed, cheap, strong = _routed()
+    response, _ = _ask(routed, "thanks!")
+    assert _answer(response) == "Sounds good!"
+    assert (cheap.calls, strong.calls) == (1, 0)
+
+def test_hard_turn_goes_straight_to_the_strong_model():
+    routed, cheap, strong = _routed()
+    response, _ = _ask(routed, "can you make me a meal plan")
+    assert _answer(response) == "Here's a detailed answer."
+    assert (cheap.calls, strong.calls) == (0, 1)
+
+def test_weak_cheap_answer_is_retried_on_the_strong_model():
+    routed, cheap, strong = _routed(cheap_text="I don't know.")
+    response, turn = _ask(routed, "thanks!")
+    assert _answer(response) == "Here's a detailed answer."
+    assert (cheap.calls, strong.calls) == (1, 1)
+    # The discarded cheap answer is still billed, to the cheap model
+    assert [(call["agent"], call["model"]) for call in turn.calls] == [("Planner", "cheap-model")]
+
+def test_bench_fake_model_keeps_agents_routed(monkeypatch):
+    routed = main.main_planner_agent.model
+    if not isinstance(routed, RoutedModel):
+        pytest.skip("model routing is off")
+    # Restored after the test
+    for agent in (
+        main.main_planner_agent,
+        main.nutrition_expert_agent,
+        main.injury_support_agent,
+        main.escalation_agent,
+        main.goal_validation_agent,
+        main.health_relevance_agent,
+    ):
+        monkeypatch.setattr(agent, "model", agent.model)
+    model = FakeModel(latency=0, jitter=0)
+    install_fake_model(model)
+    wrapped = main.main_planner_agent.model
+    assert isinstance(wrapped, RoutedModel)
+    assert (wrapped.cheap, wrapped.strong) == (model, model)
+    assert (wrapped.cheap_name, wrapped.strong_name) == (routed.cheap_name, routed.strong_name)
+    assert main.goal_validation_agent.model is model
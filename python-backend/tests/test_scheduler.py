@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import main
+from main import cancel_checkin, create_initial_context, schedule_checkin
+from scheduler import (
+    WEEK_SECONDS,
+    CheckinChange,
+    CheckinWorker,
+    InMemoryCheckinStore,
+    SQLiteCheckinStore,
+    current_conversation,
+)
+from store import StateConflictError
+
+@pytest.fixture
+def checkins(monkeypatch):
+    store = InMemoryCheckinStore()
+    monkeypatch.setattr(api, "checkin_store", store)
+    monkeypatch.setattr(main, "checkin_store", store)
+    return store
+
+@pytest.mark.parametrize("relevant", [True, False])
+def test_tripped_turn_leaves_no_checkin(fake_models, checkins, relevant):
+    # The guardrail decides only after the planner has run checkin_scheduler_tool
+    fake_models(relevant=relevant, guardrail_latency=0.3)
+    client = TestClient(api.app)
+    cid = client.post("/chat", json={"message": ""}).json()["conversation_id"]
+    body = client.post("/chat", json={"conversation_id": cid, "message": f"set up my check-in ({relevant})"}).json()
+    assert all(check["passed"] for check in body["guardrails"]) is relevant
+    assert len(client.get(f"/checkins/{cid}").json()) == (1 if relevant else 0)
+
+def test_conflicting_save_leaves_no_checkin(checkins):
+    conversation_id, state, _ = api._load_conversation(api.ChatRequest(message="hi"))
+    api._save_conversation(conversation_id, state)
+    stale = api.conversation_store.get(conversation_id)
+    api._save_conversation(conversation_id, api.conversation_store.get(conversation_id))
+    schedule_checkin(stale["context"])
+    with pytest.raises(StateConflictError):
+        api._save_conversation(conversation_id, stale)
+    assert checkins.for_conversation(conversation_id) == []
+
+def test_rollback_drops_queued_checkins(checkins):
+    ctx = create_initial_context()
+    schedule_checkin(ctx)
+    ctx.rollback()
+    assert ctx.take_checkins() == []
+
+def test_changes_apply_in_order(checkins):
+    checkins.apply("c", [CheckinChange("schedule", 100), CheckinChange("schedule", 200)])
+    # Scheduling again moves the recurring check-in rather than adding one
+    (checkin,) = checkins.for_conversation("c")
+    assert checkin.due_at == 200
+    token = current_conversation.set("c")
+    try:
+        ctx = create_initial_context()
+        assert cancel_checkin(ctx, checkin.id) == f"Check-in {checkin.id} cancelled."
+        assert checkins.get(checkin.id) is not None
+        checkins.apply("c", ctx.take_checkins())
+    finally:
+        current_conversation.reset(token)
+    assert checkins.get(checkin.id) is None
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCheckinStore(str(tmp_path / "checkins.db"))
+    return InMemoryCheckinStore()
+
+def test_due_checkins_are_claimed_oldest_first(store):
+    late = store.schedule("a", 300)
+    early = store.schedule("b", 100)
+    middle = store.schedule("c", 200)
+    store.schedule("d", 1000)
+    assert [c.id for c in store.claim_due(250, limit=10, lease=60)] == [early.id, middle.id]
+    # Claimed ones are leased out; the rest stay put
+    assert [c.id for c in store.claim_due(300, limit=10, lease=60)] == [late.id]
+    # ...until the lease runs out
+    assert {c.id for c in store.claim_due(310, limit=10, lease=60)} == {early.id, middle.id}
+
+def test_claims_respect_the_limit(store):
+    for due in range(5):
+        store.schedule("a", due)
+    assert len(store.claim_due(10, limit=3, lease=60)) == 3
+    assert len(store.claim_due(10, limit=3, lease=60)) == 2
+    assert store.claim_due(10, limit=3, lease=60) == []
+
+def test_reschedule_and_cancel(store):
+    first = store.schedule("a", 100)
+    second = store.schedule("a", 200)
+    assert store.reschedule(first.id, 300).due_at == 300
+    assert [c.id for c in store.for_conversation("a")] == [second.id, first.id]
+    assert [c.id for c in store.claim_due(250, limit=10, lease=60)] == [second.id]
+    assert store.cancel(second.id)
+    assert not store.cancel(second.id)
+    assert store.reschedule(second.id, 400) is None
+    assert [c.id for c in store.for_conversation("a")] == [first.id]
+    assert store.claim_due(1000, limit=10, lease=60)[0].id == first.id
+    assert len(store) == 1
+
+def test_complete_rearms_recurring_checkins(store):
+    weekly = store.schedule("a", 100)
+    once = store.schedule("a", 100, interval=0)
+    # The worker was down for two and a half weeks; missed periods are skipped
+    now = 100 + int(2.5 * WEEK_SECONDS)
+    for checkin in store.claim_due(now, limit=10, lease=60):
+        store.complete(checkin, now)
+    assert store.get(weekly.id).due_at == 100 + 3 * WEEK_SECONDS
+    assert store.get(once.id) is None
+
+def test_sqlite_checkins_survive_a_restart(tmp_path):
+    path = str(tmp_path / "checkins.db")
+    checkin = SQLiteCheckinStore(path).schedule("a", 100)
+    reopened = SQLiteCheckinStore(path)
+    assert reopened.get(checkin.id) == checkin
+    assert reopened.for_conversation("a") == [checkin]
+    assert [c.id for c in reopened.claim_due(100, limit=10, lease=60)] == [checkin.id]
+
+def _worker(store, statuses):
+    fired = []
+
+    async def run_turns(items):
+        for index, item in enumerate(items):
+            fired.append(item["conversation_id"])
+            yield {"index": index, "status": statuses.get(item["conversation_id"], 200), "error": "failed"}
+
+    return CheckinWorker(store, run_turns, "check-in", batch_size=10, lease=60), fired
+
+def test_worker_fires_due_checkins_and_handles_each_status(store):
+    ok, gone, failing = store.schedule("ok", 100), store.schedule("gone", 100), store.schedule("failing", 100)
+    store.schedule("later", 10_000)
+    worker, fired = _worker(store, {"gone": 404, "failing": 500})
+    assert asyncio.run(worker.run_once(now=200)) == 3
+    assert sorted(fired) == ["failing", "gone", "ok"]
+    assert store.get(ok.id).due_at == 100 + WEEK_SECONDS
+    assert store.get(gone.id) is None
+    # Retried once the lease runs out
+    assert store.get(failing.id).due_at == 200 + 60
+    assert asyncio.run(worker.run_once(now=200)) == 0
@@ -0,0 +1,94 @@
+import pytest
+
+from fake_redis import FakeRedis, FakeWatchError
+from main import create_initial_context
+from store import InMemoryConversationStore, RedisConversationStore, SQLiteConversationStore, StateConflictError
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteConversationStore(str(tmp_path / "conversations.db"))
+    if request.param == "redis":
+        return RedisConversationStore(client=FakeRedis(), watch_error=FakeWatchError)
+    return InMemoryConversationStore()
+
+def _new_state():
+    return {"current_agent": "Health & Wellness Planner", "context": create_initial_context(), "input_items": []}
+
+def test_save_bumps_revision(store):
+    state = _new_state()
+    store.save("c1", state, expected_revision=0)
+    assert state["revision"] == 1
+    loaded = store.get("c1")
+    assert loaded["revision"] == 1
+    store.save("c1", loaded, expected_revision=1)
+    assert store.get("c1")["revision"] == 2
+
+def test_concurrent_save_conflicts(store):
+    store.save("c1", _new_state(), expected_revision=0)
+    first, second = store.get("c1"), store.get("c1")
+    first["context"].name = "Sam"
+    store.save("c1", first, expected_revision=first["revision"])
+    second["context"].name = "Alex"
+    with pytest.raises(StateConflictError) as excinfo:
+        store.save("c1", second, expected_revision=second["revision"])
+    assert (excinfo.value.expected, excinfo.value.actual) == (1, 2)
+    # The losing write changed nothing
+    assert store.get("c1")["context"].name == "Sam"
+    assert store.get("c1")["revision"] == 2
+
+def test_creating_an_existing_conversation_conflicts(store):
+    store.save("c1", _new_state(), expected_revision=0)
+    with pytest.raises(StateConflictError) as excinfo:
+        store.save("c1", _new_state(), expected_revision=0)
+    assert (excinfo.value.expected, excinfo.value.actual) == (0, 1)
+
+def test_conflict_leaves_the_transcript_alone(store):
+    state = _new_state()
+    state["input_items"].append({"role": "user", "content": "hi"})
+    store.save("c1", state, expected_revision=0)
+    stale = store.get("c1")
+    stale["input_items"].append({"role": "assistant", "content": "hello"})
+    store.save("c1", store.get("c1"), expected_revision=1)
+    with pytest.raises(StateConflictError):
+        store.save("c1", stale, expected_revision=1)
+    assert store.read_transcript("c1") == [{"role": "user", "content": "hi"}]
+
+def test_unconditional_save_always_wins(store):
+    store.save("c1", _new_state(), expected_revision=0)
+    stale = store.get("c1")
+    store.save("c1", store.get("c1"), expected_revision=1)
+    store.save("c1", stale)
+    assert store.get("c1")["revision"] == 3
+
+def _redis_store():
+    client = FakeRedis()
+    return client, RedisConversationStore(client=client, watch_error=FakeWatchError)
+
+def test_redis_write_between_watch_and_exec_conflicts():
+    client, store = _redis_store()
+    store.save("c1", _new_state(), expected_revision=0)
+    loaded = store.get("c1")
+    # Another worker saves after this one checked the revision but before EXEC
+    client.before_exec = lambda: (setattr(client, "before_exec", None), store.save("c1", store.get("c1")))
+    with pytest.raises(StateConflictError) as excinfo:
+        store.save("c1", loaded, expected_revision=1)
+    assert (excinfo.value.expected, excinfo.value.actual) == (1, 2)
+
+def test_redis_unconditional_save_retries_a_lost_watch():
+    client, store = _redis_store()
+    store.save("c1", _new_state(), expected_revision=0)
+    loaded = store.get("c1")
+    loaded["context"].name = "Sam"
+    client.before_exec = lambda: (setattr(client, "before_exec", None), store.save("c1", store.get("c1")))
+    store.save("c1", loaded)
+    assert store.get("c1")["revision"] == 3
+    assert store.get("c1")["context"].name == "Sam"
+
+def test_redis_stand_in_client_needs_no_redis_package():
+    # Without watch_error the stand-in works whether or not redis is installed
+    store = RedisConversationStore(client=FakeRedis())
+    state = _new_state()
+    state["input_items"].append({"role": "user", "content": "hi"})
+    store.save("c1", state, expected_revision=0)
+    assert store.read_transcript("c1") == [{"role": "user", "content": "hi"}]
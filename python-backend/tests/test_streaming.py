@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+@pytest.fixture
+def client():
+    return TestClient(api.app)
+
+def _frames(client, message, conversation_id=None):
+    body = {"message": message, "conversation_id": conversation_id}
+    with client.stream("POST", "/chat/stream", json=body) as response:
+        text = "".join(response.iter_text())
+    frames = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        frames.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return frames
+
+def _start(client):
+    return client.post("/chat", json={"message": ""}).json()["conversation_id"]
+
+def test_refused_turn_streams_only_the_refusal(client, fake_models):
+    # The planner answers and runs a tool well before the guardrail trips
+    fake_models(relevant=False, guardrail_latency=0.2)
+    frames = _frames(client, "set up my check-in and tell me something (refused)", _start(client))
+    types = [event for event, _ in frames]
+    assert "message_delta" not in types and "tool_call" not in types and "tool_output" not in types
+    assert types[0] == "conversation" and types[-1] == "done"
+    assert any(event == "guardrail" and not data["passed"] for event, data in frames)
+    assert [m["content"] for m in frames[-1][1]["messages"]] == [api.REFUSAL_MESSAGE]
+
+def test_passing_turn_streams_held_output_once_guardrails_pass(client, fake_models):
+    fake_models(relevant=True, guardrail_latency=0.2)
+    frames = _frames(client, "set up my check-in (allowed)", _start(client))
+    types = [event for event, _ in frames]
+    assert types[0] == "conversation" and types[-1] == "done"
+    assert "tool_call" in types and "message_delta" in types
+    # Model output first, then the guardrail verdicts, then the final response
+    assert types.index("tool_call") < types.index("guardrail")
+    assert max(i for i, t in enumerate(types) if t == "message_delta") < types.index("guardrail")
+    assert all(data["passed"] for event, data in frames if event == "guardrail")
+    reply = "".join(data["delta"] for event, data in frames if event == "message_delta")
+    assert reply.strip() == frames[-1][1]["messages"][-1]["content"]
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from fake_redis import FakeRedis, FakeWatchError
+from main import create_initial_context
+from store import (
+    InMemoryConversationStore,
+    RedisConversationStore,
+    SQLiteConversationStore,
+    deserialize_state,
+    fold_transcript,
+)
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryConversationStore()
+    if request.param == "redis":
+        return RedisConversationStore(client=FakeRedis(), watch_error=FakeWatchError)
+    return SQLiteConversationStore(str(tmp_path / "conversations.db"))
+
+def _msg(text):
+    return {"role": "user", "content": text}
+
+def _summary(text):
+    return {"role": "system", "content": f"Summary: {text}"}
+
+def _turn(store, cid, *texts):
+    """Load the conversation (or start it), add ``texts`` and return the state without saving."""
+    state = store.get(cid) or {"current_agent": "Health & Wellness Planner", "context": create_initial_context(), "input_items": []}
+    state["input_items"].extend(_msg(text) for text in texts)
+    return state
+
+def _window(store, cid):
+    state = store.get(cid)
+    cursor = state["transcript"]
+    log = store.read_transcript(cid)
+    assert cursor["length"] == len(log)
+    assert state["input_items"] == ([cursor["summary"]] if cursor["summary"] else []) + log[cursor["start"]:]
+    return state["input_items"], log
+
+def _texts(items):
+    return [item["content"] for item in items]
+
+def test_log_holds_every_item_without_compaction(store):
+    store.save("c", _turn(store, "c", "a", "b"))
+    store.save("c", _turn(store, "c", "c"))
+    window, log = _window(store, "c")
+    assert _texts(log) == _texts(window) == ["a", "b", "c"]
+    assert _texts(store.read_transcript("c", 1, 2)) == ["b"]
+
+def test_folding_logged_items_moves_the_window_start(store):
+    store.save("c", _turn(store, "c", "a", "b", "c", "d"))
+    state = _turn(store, "c", "e")
+    fold_transcript(state, [_summary("a b"), *state["input_items"][2:]])
+    store.save("c", state)
+    window, log = _window(store, "c")
+    assert _texts(log) == ["a", "b", "c", "d", "e"]
+    assert _texts(window) == ["Summary: a b", "c", "d", "e"]
+    assert store.get("c")["transcript"] == {"length": 5, "start": 2, "summary": _summary("a b")}
+
+def test_items_folded_before_they_were_logged_are_still_logged(store):
+    store.save("c", _turn(store, "c", "a", "b"))
+    state = _turn(store, "c", "c", "d", "e")
+    # Folds both logged items and "c", which this turn added and nothing has logged yet
+    fold_transcript(state, [_summary("a b c"), *state["input_items"][3:]])
+    assert _texts(state["transcript_folded"]) == ["c"]
+    store.save("c", state)
+    window, log = _window(store, "c")
+    assert _texts(log) == ["a", "b", "c", "d", "e"]
+    assert _texts(window) == ["Summary: a b c", "d", "e"]
+
+def test_refolding_replaces_the_summary(store):
+    store.save("c", _turn(store, "c", "a", "b", "c"))
+    state = _turn(store, "c")
+    fold_transcript(state, [_summary("a"), *state["input_items"][1:]])
+    store.save("c", state)
+    state = _turn(store, "c", "d")
+    # The previous summary is folded into the new one along with "b"
+    fold_transcript(state, [_summary("a b"), *state["input_items"][2:]])
+    store.save("c", state)
+    window, log = _window(store, "c")
+    assert _texts(log) == ["a", "b", "c", "d"]
+    assert _texts(window) == ["Summary: a b", "c", "d"]
+
+def test_fold_without_changes_is_a_no_op(store):
+    store.save("c", _turn(store, "c", "a"))
+    state = _turn(store, "c")
+    cursor = dict(state["transcript"])
+    fold_transcript(state, state["input_items"])
+    assert state["transcript"] == cursor
+
+def test_context_only_turns_leave_the_log_alone(store):
+    store.save("c", _turn(store, "c", "a", "b"))
+    state = store.get("c")
+    state["context"].name = "Sam"
+    store.save("c", state)
+    window, log = _window(store, "c")
+    assert _texts(log) == _texts(window) == ["a", "b"]
+    assert store.get("c")["context"].name == "Sam"
+
+def test_state_saved_before_the_log_existed_is_logged_whole(store):
+    payload = {
+        "current_agent": "Health & Wellness Planner",
+        "context": create_initial_context().model_dump(),
+        "input_items": [_msg("a"), _msg("b")],
+    }
+    state = deserialize_state(b"j" + json.dumps(payload).encode("utf-8"))
+    assert "transcript" not in state
+    state["input_items"].append(_msg("c"))
+    store.save("c", state)
+    window, log = _window(store, "c")
+    assert _texts(log) == _texts(window) == ["a", "b", "c"]
+
+def test_delete_drops_the_log(store):
+    store.save("c", _turn(store, "c", "a"))
+    store.delete("c")
+    assert store.get("c") is None
+    assert store.read_transcript("c") == []
@@ -0,0 +1,44 @@
+import pytest
+
+from fake_redis import FakeRedis, FakeWatchError
+from store import InMemoryConversationStore, RedisConversationStore, SQLiteConversationStore
+from usage import TurnUsage, UsageLedger
+
+def _turn():
+    turn = TurnUsage()
+    turn.add("Health & Wellness Planner", "gpt-4o", 1000, 100, cached_tokens=600)
+    turn.add("Health Relevance Guardrail", "gpt-4o-mini", 200, 20)
+    turn.add("Health & Wellness Planner", "gpt-4o", 500, 50)
+    return turn
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_workers_sharing_a_store_report_the_same_totals(tmp_path, backend):
+    path, client = str(tmp_path / "conversations.db"), FakeRedis()
+    # One ledger per worker process, all on the same file or server
+    workers = [
+        UsageLedger(
+            SQLiteConversationStore(path) if backend == "sqlite"
+            else RedisConversationStore(client=client, watch_error=FakeWatchError)
+        )
+        for _ in range(3)
+    ]
+    for ledger in workers:
+        ledger.record(_turn())
+    summaries = [ledger.summary() for ledger in workers]
+    assert summaries[0] == summaries[1] == summaries[2]
+    summary = summaries[0]
+    assert summary["total"]["requests"] == 9
+    assert summary["by_agent"]["Health & Wellness Planner"]["input_tokens"] == 4500
+    assert summary["by_model"]["gpt-4o-mini"]["output_tokens"] == 60
+    assert summary["by_model"]["gpt-4o"]["cached_tokens"] == 1800
+    assert summary["total"]["cost_usd"] == pytest.approx(sum(c["cost_usd"] for c in _turn().calls) * 3)
+    (day, totals), = summary["by_day"].items()
+    assert totals == summary["total"]
+    assert isinstance(summary["total"]["input_tokens"], int)
+
+def test_memory_store_ledger_and_empty_turn():
+    ledger = UsageLedger(InMemoryConversationStore())
+    ledger.record(TurnUsage())
+    assert ledger.summary()["total"]["requests"] == 0
+    ledger.record(_turn())
+    assert ledger.summary()["by_agent"]["Health Relevance Guardrail"]["requests"] == 1
@@ -0,0 +1,173 @@
+from __future__ import annotations as _annotations
+
+import json
+import os
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import Agent, ModelResponse, RunContextWrapper, RunHooks
+
+# =========================
+# Prices
+# =========================
+
+# USD per 1M tokens (input, output). Override or extend with MODEL_PRICES='{"model": [in, out]}'.
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("MODEL_PRICES", "{}")).items()})
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimated USD cost of a call; 0.0 for models without a known price."""
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+def model_name(agent: Agent) -> str:
+    model = agent.model
+    if model is None:
+        return "default"
+    return model if isinstance(model, str) else str(getattr(model, "model", type(model).__name__))
+
+# =========================
+# Per-turn usage
+# =========================
+
+def _empty() -> Dict[str, Any]:
+    return {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cost_usd": 0.0}
+
+def _add(totals: Dict[str, Any], other: Dict[str, Any]) -> None:
+    for key, value in other.items():
+        totals[key] = totals.get(key, 0) + value
+
+class TurnUsage:
+    """Model calls made while serving one chat turn, guardrail sub-runs included."""
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+
+    def add(self, agent: str, model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> None:
+        self.calls.append({
+            "agent": agent,
+            "model": model,
+            "requests": 1,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": cached_tokens,
+            "cost_usd": estimate_cost(model, input_tokens, output_tokens),
+        })
+
+    def totals(self) -> Dict[str, Any]:
+        totals = _empty()
+        for call in self.calls:
+            _add(totals, {k: v for k, v in call.items() if k not in ("agent", "model")})
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        by_agent: Dict[str, Dict[str, Any]] = defaultdict(_empty)
+        for call in self.calls:
+            _add(by_agent[call["agent"]], {k: v for k, v in call.items() if k not in ("agent", "model")})
+        return {**self.totals(), "by_agent": dict(by_agent)}
+
+_current_turn: ContextVar[Optional[TurnUsage]] = ContextVar("current_turn_usage", default=None)
+
+def start_turn() -> TurnUsage:
+    """Begin collecting usage for the turn running in this context."""
+    turn = TurnUsage()
+    _current_turn.set(turn)
+    return turn
+
+def current_turn() -> TurnUsage:
+    """Usage collected so far for the current turn (empty outside a turn)."""
+    return _current_turn.get() or TurnUsage()
+
+class UsageHooks(RunHooks):
+    """Run hooks that attribute each model response to the current turn.
+
+    ``model`` names the model a RunConfig override sent the run to, when it
+    differs from the agents' own models.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+
+    async def on_llm_end(self, context: RunContextWrapper, agent: Agent, response: ModelResponse) -> None:
+        turn = _current_turn.get()
+        if turn is None:
+            return
+        usage = response.usage
+        details = getattr(usage, "input_tokens_details", None)
+        turn.add(
+            agent.name,
+            self.model or model_name(agent),
+            usage.input_tokens,
+            usage.output_tokens,
+            getattr(details, "cached_tokens", 0) or 0,
+        )
+
+usage_hooks = UsageHooks()
+
+# =========================
+# Aggregates
+# =========================
+
+class UsageLedger:
+    """Usage totals by agent, model and UTC day, kept in the shared conversation store.
+
+    Every worker adds to the same aggregates, so summary() is the same on
+    whichever worker answers (per process only with the in-memory store).
+    """
+
+    def __init__(self, store: Any):
+        self.store = store
+
+    def record(self, turn: TurnUsage) -> None:
+        if not turn.calls:
+            return
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        by_call: Dict[Tuple[str, str], Dict[str, Any]] = defaultdict(_empty)
+        for call in turn.calls:
+            _add(by_call[(call["agent"], call["model"])], {k: v for k, v in call.items() if k not in ("agent", "model")})
+        self.store.add_usage(day, dict(by_call))
+
+    def summary(self) -> Dict[str, Any]:
+        total = _empty()
+        by_agent: Dict[str, Dict[str, Any]] = defaultdict(_empty)
+        by_model: Dict[str, Dict[str, Any]] = defaultdict(_empty)
+        by_day: Dict[str, Dict[str, Any]] = defaultdict(_empty)
+        for day, agent, model, counts in self.store.usage():
+            for totals in (total, by_agent[agent], by_model[model], by_day[day]):
+                _add(totals, counts)
+        return {
+            "total": total,
+            "by_agent": dict(by_agent),
+            "by_model": dict(by_model),
+            "by_day": dict(sorted(by_day.items())),
+        }
+
+# =========================
+# Budgets
+# =========================
+
+# Tokens (input + output) a conversation may use before it is switched to
+# BUDGET_FALLBACK_MODEL and compacted harder; 0 disables budgets.
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", 0))
+BUDGET_FALLBACK_MODEL = os.getenv("BUDGET_FALLBACK_MODEL", "gpt-4o-mini")
+BUDGET_TRANSCRIPT_TOKENS = int(os.getenv("BUDGET_TRANSCRIPT_TOKENS", 2000))
+
+def add_conversation_usage(state: Dict[str, Any], turn: TurnUsage) -> Dict[str, Any]:
+    """Fold a turn into the conversation's running totals kept in its state."""
+    totals = state.setdefault("usage", _empty())
+    _add(totals, turn.totals())
+    return totals
+
+def over_budget(state: Dict[str, Any]) -> bool:
+    if not CONVERSATION_TOKEN_BUDGET:
+        return False
+    totals = state.get("usage") or {}
+    return totals.get("input_tokens", 0) + totals.get("output_tokens", 0) >= CONVERSATION_TOKEN_BUDGET
@@ -18,11 +18,28 @@ export default function Home() {
   const [conversationId, setConversationId] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const msgCounter = useRef(0);
+  const contextVersion = useRef<number | undefined>(undefined);
+
+  // Apply either a full context snapshot or a delta against the version we hold
+  const applyContext = (data: any) => {
+    if (data.context) {
+      setContext(data.context);
+    } else {
+      setContext((prev) => {
+        const next = { ...prev, ...(data.context_delta || {}) };
+        for (const [key, items] of Object.entries(data.context_appends || {})) {
+          next[key] = [...(prev[key] || []), ...(items as any[])];
+        }
+        return next;
+      });
+    }
+    contextVersion.current = data.context_version;
+  };
 
   // Boot the conversation
   useEffect(() => {
     (async () => {
-      const data = await callChatAPI("", conversationId ?? "");
+      const data = await callChatAPI("", conversationId ?? "", true);
       if (!data) {
         console.error("No data returned from chat API");
         return;
@@ -30,7 +47,7 @@ export default function Home() {
 
       if (!conversationId) setConversationId(data.conversation_id);
       setCurrentAgent(data.current_agent);
-      setContext(data.context);
+      applyContext(data);
       const initialEvents = (data.events || []).map((e: any, idx: number) => ({
         ...e,
         id: e.id || idx.toString(),
@@ -65,7 +82,12 @@ export default function Home() {
     setMessages((prev) => [...prev, userMsg]);
     setIsLoading(true);
 
-    const data = await callChatAPI(content, conversationId ?? "");
+    const data = await callChatAPI(
+      content,
+      conversationId ?? "",
+      false,
+      contextVersion.current
+    );
     if (!data) {
       console.error("No data returned from chat API");
       setIsLoading(false);
@@ -74,7 +96,7 @@ export default function Home() {
 
     if (!conversationId) setConversationId(data.conversation_id);
     setCurrentAgent(data.current_agent);
-    setContext(data.context);
+    applyContext(data);
 
     if (data.events) {
       const stamped = data.events.map((e: any, idx: number) => ({
@@ -85,7 +107,7 @@ export default function Home() {
       setEvents((prev) => [...prev, ...stamped]);
     }
 
-    if (data.agents) setAgents(data.agents);
+    if (data.agents?.length) setAgents(data.agents);
     if (data.guardrails) setGuardrails(data.guardrails);
 
     if (data.messages) {
@@ -1,11 +1,25 @@
 // lib/api.ts
 
-export async function callChatAPI(message: string, conversationId: string) {
+export async function callChatAPI(
+  message: string,
+  conversationId: string,
+  includeAgents = false,
+  contextVersion?: number
+) {
   try {
     const res = await fetch("/chat", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ conversation_id: conversationId, message }),
+      headers: {
+        "Content-Type": "application/json",
+        // Lets a load balancer route a conversation to the same replica
+        ...(conversationId ? { "X-Conversation-Id": conversationId } : {}),
+      },
+      body: JSON.stringify({
+        conversation_id: conversationId,
+        message,
+        include_agents: includeAgents,
+        context_version: contextVersion,
+      }),
     });
 
     if (!res.ok) {
@@ -32,6 +32,7 @@ export interface AgentEvent {
     context_key?: string
     context_value?: any
     changes?: Record<string, any>
+    appended?: Record<string, any[]>
   }
 }
 
@@ -4,10 +4,15 @@ const nextConfig = {
   output: 'standalone',
   // Proxy /chat requests to the backend server
   async rewrites() {
+    const backend = process.env.BACKEND_URL || "http://127.0.0.1:8000/chat";
     return [
       {
         source: "/chat",
-        destination: process.env.BACKEND_URL || "http://127.0.0.1:8000/chat",
+        destination: backend,
+      },
+      {
+        source: "/chat/stream",
+        destination: `${backend}/stream`,
       },
     ];
   },